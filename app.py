@@ -4,8 +4,13 @@ from pathlib import Path
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-import json
-import base64
+
+import ativos
+import cache_figuras
+import esbocos
+import pacote_dados
+
+MAX_FIGURAS_CACHE = 128  # entradas do cache LRU de figuras (compartilhado entre as sessões)
 
 # --- CONFIGURAÇÃO DA PÁGINA ---
 st.set_page_config(
@@ -15,13 +20,30 @@ st.set_page_config(
 )
 
 # --- FUNÇÃO DE CARREGAMENTO DE DADOS (COM CACHE) ---
-@st.cache_data
-def carregar_dados_agregados():
+def versao_dados():
+    """Hash do pacote de dados do app (só o manifesto é lido); None sem pacote ou com pacote inválido."""
+    try:
+        return pacote_dados.versao(Path(__file__).parent / "app_data" / pacote_dados.NOME_ARQUIVO)
+    except ValueError:
+        return None
+
+
+# Recurso e não cache_data: as tabelas apontam para o pacote mapeado em memória, sem cópias por rerun.
+# `versao` (hash do pacote) é a chave: um pacote novo é relido e o anterior sai do cache.
+@st.cache_resource(max_entries=1)
+def carregar_dados_agregados(versao=None):
     """Carrega os arquivos de resumo pré-calculados de forma robusta."""
     try:
         diretorio_script = Path(__file__).parent
         caminho_app_data = diretorio_script / "app_data"
 
+        caminho_pacote = caminho_app_data / pacote_dados.NOME_ARQUIVO
+        if caminho_pacote.exists():
+            # Pacote único: tipos já gravados (textos em category, anomes como data)
+            tabelas = pacote_dados.ler_pacote(caminho_pacote)
+            return tuple(tabelas[nome] for nome in pacote_dados.TABELAS)
+
+        # Formato antigo: sete CSVs
         df_filtros = pd.read_csv(caminho_app_data / "dados_agregados_filtros.csv")
         df_mapa = pd.read_csv(caminho_app_data / "dados_mapa_uf.csv")
         df_dist = pd.read_csv(caminho_app_data / "distribuicao_diversificacao.csv")
@@ -39,9 +61,183 @@ def carregar_dados_agregados():
             f"Certifique-se de que a pasta 'app_data' existe e contém todos os CSVs. Detalhe: {e}"
         )
         return None, None, None, None, None, None, None
+    except (KeyError, ValueError, ImportError) as e:
+        st.error(f"ERRO: O pacote de dados do app ('{pacote_dados.NOME_ARQUIVO}') não pôde ser lido. Detalhe: {e}")
+        return None, None, None, None, None, None, None
+
+def versao_estimativas():
+    """Hash do pacote das estimativas por subgrupo; None se a grade não foi estimada (ou o arquivo é inválido)."""
+    try:
+        return pacote_dados.versao(Path(__file__).parent / "app_data" / pacote_dados.NOME_GRADE)
+    except ValueError:
+        return None
+
+
+@st.cache_resource(max_entries=1)
+def carregar_estimativas_subgrupos(versao=None):
+    """Coeficientes da grade de subgrupos, estimados no notebook (nenhum modelo é ajustado no app)."""
+    if versao is None:
+        return None
+    caminho = Path(__file__).parent / "app_data" / pacote_dados.NOME_GRADE
+    return pacote_dados.ler_pacote(caminho, [pacote_dados.TABELA_GRADE])[pacote_dados.TABELA_GRADE]
+
+
+@st.cache_data
+def carregar_esbocos_clientes():
+    """Carrega os esboços HyperLogLog de clientes distintos (None se o arquivo não existir)."""
+    caminho = Path(__file__).parent / "app_data" / "esbocos_clientes.npz"
+    if not caminho.exists():
+        return None, None
+    return esbocos.carregar(caminho)
+
+
+@st.cache_resource
+def carregar_geojson_estados():
+    """GeoJSON simplificado dos estados, lido uma vez por processo e compartilhado entre as sessões."""
+    return ativos.carregar_geojson()
+
+
+@st.cache_resource
+def publicar_dissertacao():
+    """URL estática da dissertação (copiada para `static/` uma vez por processo)."""
+    return ativos.publicar_estatico(ativos.PASTA_MATERIAIS / "DISSERTAÇÃO_Vinicios.pdf", "dissertacao.pdf")
+
+
+@st.cache_resource
+def carregar_material(nome):
+    """Bytes de um arquivo da pasta `materiais`, lidos uma vez por processo."""
+    return ativos.ler_bytes(ativos.PASTA_MATERIAIS / nome)
+
+
+def estimar_clientes(dim_esbocos, registros, regioes, faixas, perfis, ocupacoes):
+    """Clientes distintos na combinação de filtros: une os esboços das células selecionadas."""
+    mascara = (
+        dim_esbocos['regiao'].isin(regioes) & dim_esbocos['faixa_renda'].isin(faixas) &
+        dim_esbocos['perfil_grupo'].isin(perfis) & dim_esbocos['grupo_ocupacao'].isin(ocupacoes)
+    ).to_numpy()
+    return esbocos.estimar(esbocos.unir(registros[mascara]))
+
+
+@st.cache_resource(max_entries=1)
+def obter_cache_figuras(versao=None):
+    """Cache LRU de figuras do processo (uma instância por versão dos dados, para todas as sessões)."""
+    return cache_figuras.CacheLRU(MAX_FIGURAS_CACHE)
+
+
+# --- CONSTRUÇÃO DAS FIGURAS (chamadas só nas faltas do cache) ---
+def calcular_kpis(df_filtros, regioes, faixas):
+    """Médias da seleção de região e faixa de renda (None se a seleção estiver vazia)."""
+    df_kpis_filtrado = df_filtros[
+        (df_filtros['regiao'].isin(regioes)) &
+        (df_filtros['faixa_renda'].isin(faixas))
+    ]
+    if df_kpis_filtrado.empty:
+        return None
+    return {
+        'diversificacao_media': df_kpis_filtrado['diversificacao_media'].mean(),
+        'renda_media': df_kpis_filtrado['renda_media'].mean(),
+        'proporcao_complex': df_kpis_filtrado['proporcao_complex'].mean(),
+    }
+
+
+def figura_distribuicao(df_dist):
+    return px.bar(df_dist, x='faixa_diversificacao', y='percentual', labels={'faixa_diversificacao': 'Nível de Diversificação (0 a 1)', 'percentual': 'Percentual de Observações'})
+
+
+def figura_mapa(df_mapa, geojson_brasil, metrica_selecionada, coluna_cor):
+    fig_mapa = px.choropleth(
+        df_mapa, geojson=geojson_brasil, locations='UF_CADASTRO',
+        featureidkey="id", color=coluna_cor,
+        color_continuous_scale="Viridis", hover_name='UF_CADASTRO',
+        hover_data={'diversificacao_media': ':.2%', 'renda_media': ':,.2f'},
+        labels={'diversificacao_media': 'Diversificação Média', 'renda_media': 'Renda Média (R$)'},
+        projection="mercator"
+    )
+    fig_mapa.update_geos(fitbounds="locations", visible=False)
+    fig_mapa.update_layout(title_text=f"{metrica_selecionada} por Estado", margin={"r":0,"t":40,"l":0,"b":0})
+    return fig_mapa
+
+
+def figura_temporal(df_temporal, regioes):
+    df_temporal_filtrado = df_temporal[df_temporal['regiao'].isin(regioes)]
+    return px.line(
+        df_temporal_filtrado, x='anomes', y='diver', color='regiao',
+        title='Média de Diversificação por Região ao Longo do Tempo',
+        labels={'anomes': 'Data', 'diver': 'Diversificação Média', 'regiao': 'Região'}
+    )
+
+
+def figuras_perfil(df_perfil, perfis):
+    """Barras de diversificação e de adoção de complexos dos perfis selecionados."""
+    df_perfil_filtrado = df_perfil[df_perfil['perfil_grupo'].isin(perfis)]
+    df_perfil_vis = df_perfil_filtrado.sort_values(by='diversificacao_media', ascending=False)
+    fig_perfil_diver = px.bar(df_perfil_vis, x='perfil_grupo', y='diversificacao_media', text_auto='.2%')
+    fig_perfil_complex = px.bar(df_perfil_vis, x='perfil_grupo', y='proporcao_complex', text_auto='.2%')
+    return fig_perfil_diver, fig_perfil_complex
+
+
+def figura_ocupacao(df_ocupacao, ocupacoes):
+    df_ocupacao_filtrada = df_ocupacao[df_ocupacao['grupo_ocupacao'].isin(ocupacoes)]
+    df_ocupacao_vis = df_ocupacao_filtrada.sort_values(by='diversificacao_media', ascending=False)
+    fig_ocup_diver = px.bar(
+        df_ocupacao_vis, x='diversificacao_media', y='grupo_ocupacao',
+        orientation='h', text_auto='.2%',
+        labels={'grupo_ocupacao': 'Grupo de Ocupação', 'diversificacao_media': 'Diversificação Média'}
+    )
+    fig_ocup_diver.update_layout(yaxis={'categoryorder':'total ascending'})
+    return fig_ocup_diver
+
+
+def figura_composicao(df_interacao):
+    return px.bar(
+        df_interacao, x="faixa_renda", y="total_clientes", color="complex",
+        title="Divisão entre Carteiras Simples vs. Complexas por Faixa de Renda",
+        labels={"faixa_renda": "Faixa de Renda", "total_clientes": "Número de Clientes", "complex": "Tipo de Carteira"},
+        text_auto=True
+    )
+
+ROTULOS_DIMENSOES = {'regiao': 'Região', 'faixa_renda': 'Faixa de Renda', 'perfil_grupo': 'Perfil'}
+
+
+def rotulo_recorte(recorte):
+    """Texto de um valor da coluna `dimensoes` (ex.: 'regiao+faixa_renda' -> 'Região × Faixa de Renda')."""
+    if recorte == 'amostra_completa':
+        return 'Amostra Completa'
+    return ' × '.join(ROTULOS_DIMENSOES.get(d, d) for d in recorte.split('+'))
+
+
+def estimativas_selecionadas(df_est, modelo, variavel, recorte, regioes, faixas, perfis):
+    """Células do recorte dentro da seleção da barra lateral, com o coeficiente da variável no modelo."""
+    fixas = [] if recorte == 'amostra_completa' else recorte.split('+')
+    mascara = ((df_est['modelo'] == modelo) & (df_est['variavel'] == variavel) &
+               (df_est['dimensoes'] == recorte)).to_numpy()
+    for coluna, valores in (('regiao', regioes), ('faixa_renda', faixas), ('perfil_grupo', perfis)):
+        if coluna in fixas:
+            mascara &= df_est[coluna].isin(valores).to_numpy()
+    dados = df_est[mascara].copy()
+    dados['celula'] = dados[fixas].astype(str).agg(' · '.join, axis=1) if fixas else 'Amostra Completa'
+    return dados
+
+
+def figura_estimativas(dados, variavel):
+    """Coeficiente de cada célula com o intervalo de 95% (±1,96 erro-padrão)."""
+    estimadas = dados[dados['status'] == 'ok'].sort_values('coef')
+    fig = px.scatter(
+        estimadas, x='coef', y='celula', error_x=1.96 * estimadas['erro_padrao'],
+        hover_data={'p_valor': ':.3f', 'n_obs': ':,', 'n_entidades': ':,', 'celula': False},
+        labels={'coef': f'Coeficiente de {variavel}', 'celula': 'Subgrupo', 'p_valor': 'p-valor',
+                'n_obs': 'Observações', 'n_entidades': 'Clientes'}
+    )
+    fig.add_vline(x=0, line_dash='dash', line_color='gray')
+    fig.update_layout(height=max(300, 28 * len(estimadas) + 120))
+    return fig
 
 # --- CARREGANDO OS DADOS ---
-df_filtros, df_mapa, df_dist, df_temporal, df_perfil, df_ocupacao, df_interacao = carregar_dados_agregados()
+versao_pacote = versao_dados()
+df_filtros, df_mapa, df_dist, df_temporal, df_perfil, df_ocupacao, df_interacao = carregar_dados_agregados(versao_pacote)
+dim_esbocos, registros_esbocos = carregar_esbocos_clientes()
+versao_grade = versao_estimativas()
+df_estimativas = carregar_estimativas_subgrupos(versao_grade)
 
 # --- TÍTULO E INTRODUÇÃO ---
 st.title("Decisões Sob Risco: Uma Análise Interativa do Investidor Brasileiro")
@@ -95,47 +291,53 @@ if all(df is not None for df in [df_filtros, df_mapa, df_dist, df_temporal, df_p
     )
 
     # --- LÓGICA DE FILTRAGEM ---
-    # Aplica os filtros aos dataframes que serão usados nas abas
-    df_kpis_filtrado = df_filtros[
-        (df_filtros['regiao'].isin(regioes_selecionadas)) &
-        (df_filtros['faixa_renda'].isin(faixas_renda_selecionadas))
-    ]
-    df_temporal_filtrado = df_temporal[df_temporal['regiao'].isin(regioes_selecionadas)]
-    df_perfil_filtrado = df_perfil[df_perfil['perfil_grupo'].isin(perfis_selecionados)]
-    df_ocupacao_filtrada = df_ocupacao[df_ocupacao['grupo_ocupacao'].isin(ocupacoes_selecionadas)]
+    # Seleção normalizada (a ordem no multiselect não importa): cada figura é chaveada só pelos
+    # filtros de que depende, e filtros + figura só são refeitos quando essa chave muda
+    cache = obter_cache_figuras(versao_pacote)
+    sel_regioes = cache_figuras.normalizar(regioes_selecionadas)
+    sel_faixas = cache_figuras.normalizar(faixas_renda_selecionadas)
+    sel_perfis = cache_figuras.normalizar(perfis_selecionados)
+    sel_ocupacoes = cache_figuras.normalizar(ocupacoes_selecionadas)
 
 
     # --- ABAS COM AS ANÁLISES ---
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs([
+    tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
         "📊 Visão Geral", "🌍 Análise Geográfica", "📈 Análise Temporal", "👤 Análise por Perfil",
-        "💼 Análise por Ocupação", "💡 Renda vs. Complexidade", "📜 Dissertação e Materiais"
+        "💼 Análise por Ocupação", "💡 Renda vs. Complexidade", "🧮 Estimativas por Subgrupo",
+        "📜 Dissertação e Materiais"
     ])
 
     with tab1:
         st.header("Estatísticas Descritivas da Seleção")
-        if not df_kpis_filtrado.empty:
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Diversificação Média", f"{df_kpis_filtrado['diversificacao_media'].mean():.2%}")
-            col2.metric("Renda Média", f"R$ {df_kpis_filtrado['renda_media'].mean():,.2f}")
-            col3.metric("Proporção com Ativos Complexos", f"{df_kpis_filtrado['proporcao_complex'].mean():.2%}")
+        kpis = cache.obter(('kpis', sel_regioes, sel_faixas),
+                           lambda: calcular_kpis(df_filtros, sel_regioes, sel_faixas))
+        if kpis is not None:
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Diversificação Média", f"{kpis['diversificacao_media']:.2%}")
+            col2.metric("Renda Média", f"R$ {kpis['renda_media']:,.2f}")
+            col3.metric("Proporção com Ativos Complexos", f"{kpis['proporcao_complex']:.2%}")
+            if registros_esbocos is not None:
+                # Contagem distinta correta para qualquer combinação de filtros (erro típico ~1,6%)
+                total_clientes = cache.obter(
+                    ('clientes', sel_regioes, sel_faixas, sel_perfis, sel_ocupacoes),
+                    lambda: estimar_clientes(dim_esbocos, registros_esbocos, sel_regioes, sel_faixas,
+                                             sel_perfis, sel_ocupacoes)
+                )
+                col4.metric("Clientes Distintos (estimativa)", f"{total_clientes:,.0f}".replace(",", "."))
         else:
             st.warning("Nenhum dado disponível para a seleção de filtros atual.")
 
         st.markdown("---")
         st.subheader("Distribuição Geral da Diversificação na Amostra Completa")
-        fig_dist = px.bar(df_dist, x='faixa_diversificacao', y='percentual', labels={'faixa_diversificacao': 'Nível de Diversificação (0 a 1)', 'percentual': 'Percentual de Observações'})
+        fig_dist = cache.obter(('distribuicao',), lambda: figura_distribuicao(df_dist))
         st.plotly_chart(fig_dist, use_container_width=True)
 
     with tab2:
         st.header("Análise Geográfica do Investidor Brasileiro")
         st.markdown("Explore como as métricas financeiras se distribuem pelo território nacional.")
-        
-        diretorio_script = Path(__file__).parent
-        caminho_geojson = diretorio_script / "brasil_estados.json"
 
         try:
-            with open(caminho_geojson, 'r', encoding='utf-8') as f:
-                geojson_brasil = json.load(f)
+            geojson_brasil = carregar_geojson_estados()
 
             metrica_selecionada = st.selectbox(
                 "Selecione a Métrica para Visualizar no Mapa:",
@@ -143,57 +345,41 @@ if all(df is not None for df in [df_filtros, df_mapa, df_dist, df_temporal, df_p
             )
             coluna_cor = 'diversificacao_media' if metrica_selecionada == 'Diversificação Média' else 'renda_media'
 
-            fig_mapa = px.choropleth(
-                df_mapa, geojson=geojson_brasil, locations='UF_CADASTRO',
-                featureidkey="id", color=coluna_cor,
-                color_continuous_scale="Viridis", hover_name='UF_CADASTRO',
-                hover_data={'diversificacao_media': ':.2%', 'renda_media': ':,.2f'},
-                labels={'diversificacao_media': 'Diversificação Média', 'renda_media': 'Renda Média (R$)'},
-                projection="mercator"
-            )
-            fig_mapa.update_geos(fitbounds="locations", visible=False)
-            fig_mapa.update_layout(title_text=f"{metrica_selecionada} por Estado", margin={"r":0,"t":40,"l":0,"b":0})
+            fig_mapa = cache.obter(('mapa', coluna_cor),
+                                   lambda: figura_mapa(df_mapa, geojson_brasil, metrica_selecionada, coluna_cor))
             st.plotly_chart(fig_mapa, use_container_width=True)
             
         except FileNotFoundError:
-            st.error(f"ERRO: Arquivo `brasil_estados.json` não encontrado. Verifique se ele está na pasta raiz do projeto.")
+            st.error(
+                "ERRO: Arquivo `brasil_estados.json` não encontrado (nem sua versão simplificada em "
+                "`app_data/`). Verifique se ele está na pasta raiz do projeto."
+            )
 
     with tab3:
         st.header("Evolução Temporal da Diversificação")
-        fig_temporal = px.line(
-            df_temporal_filtrado, x='anomes', y='diver', color='regiao',
-            title='Média de Diversificação por Região ao Longo do Tempo',
-            labels={'anomes': 'Data', 'diver': 'Diversificação Média', 'regiao': 'Região'}
-        )
+        fig_temporal = cache.obter(('temporal', sel_regioes), lambda: figura_temporal(df_temporal, sel_regioes))
         st.plotly_chart(fig_temporal, use_container_width=True)
 
     with tab4:
         st.header("Análise por Perfil de Investidor (API)")
         st.markdown("Explore a diversificação e a adoção de produtos complexos por perfil de risco.")
-        
-        df_perfil_vis = df_perfil_filtrado.sort_values(by='diversificacao_media', ascending=False)
+
+        fig_perfil_diver, fig_perfil_complex = cache.obter(('perfil', sel_perfis),
+                                                           lambda: figuras_perfil(df_perfil, sel_perfis))
         col1, col2 = st.columns(2)
         with col1:
             st.subheader("Diversificação Média")
-            fig_perfil_diver = px.bar(df_perfil_vis, x='perfil_grupo', y='diversificacao_media', text_auto='.2%')
             st.plotly_chart(fig_perfil_diver, use_container_width=True)
         with col2:
             st.subheader("Adoção de Produtos Complexos")
-            fig_perfil_complex = px.bar(df_perfil_vis, x='perfil_grupo', y='proporcao_complex', text_auto='.2%')
             st.plotly_chart(fig_perfil_complex, use_container_width=True)
 
     with tab5:
         st.header("Análise por Grupo de Ocupação")
         st.markdown("Como a diversificação do portfólio se distribui entre diferentes áreas profissionais?")
-        
-        df_ocupacao_vis = df_ocupacao_filtrada.sort_values(by='diversificacao_media', ascending=False)
+
         st.subheader("Diversificação Média por Ocupação")
-        fig_ocup_diver = px.bar(
-            df_ocupacao_vis, x='diversificacao_media', y='grupo_ocupacao',
-            orientation='h', text_auto='.2%',
-            labels={'grupo_ocupacao': 'Grupo de Ocupação', 'diversificacao_media': 'Diversificação Média'}
-        )
-        fig_ocup_diver.update_layout(yaxis={'categoryorder':'total ascending'})
+        fig_ocup_diver = cache.obter(('ocupacao', sel_ocupacoes), lambda: figura_ocupacao(df_ocupacao, sel_ocupacoes))
         st.plotly_chart(fig_ocup_diver, use_container_width=True)
 
     with tab6:
@@ -208,28 +394,60 @@ if all(df is not None for df in [df_filtros, df_mapa, df_dist, df_temporal, df_p
 
         st.markdown("---")
         st.subheader("Composição de Investidores por Faixa de Renda")
-        fig_composicao = px.bar(
-            df_interacao, x="faixa_renda", y="total_clientes", color="complex",
-            title="Divisão entre Carteiras Simples vs. Complexas por Faixa de Renda",
-            labels={"faixa_renda": "Faixa de Renda", "total_clientes": "Número de Clientes", "complex": "Tipo de Carteira"},
-            text_auto=True
-        )
+        fig_composicao = cache.obter(('composicao',), lambda: figura_composicao(df_interacao))
         st.plotly_chart(fig_composicao, use_container_width=True)
 
     with tab7:
+        st.header("Estimativas dos Modelos por Subgrupo")
+        st.markdown("Coeficientes das hipóteses H1, H2 e H3 (efeitos fixos por cliente, erros agrupados por cliente) "
+                    "reestimados em cada subgrupo. Os modelos são estimados na preparação dos dados, não no app.")
+        if df_estimativas is None:
+            st.info("As estimativas por subgrupo ainda não foram geradas. Rode o notebook com "
+                    "`GRADE_SUBGRUPOS = True` (ou `python pipeline.py --etapas grade`) para criar "
+                    f"`app_data/{pacote_dados.NOME_GRADE}`.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            modelo = col1.selectbox("Modelo", options=list(pd.unique(df_estimativas['modelo'].astype(str))))
+            variaveis = df_estimativas.loc[(df_estimativas['modelo'] == modelo).to_numpy(), 'variavel']
+            variavel = col2.selectbox("Variável", options=list(pd.unique(variaveis.astype(str))))
+            recorte = col3.selectbox("Subgrupos por", options=list(pd.unique(df_estimativas['dimensoes'].astype(str))),
+                                     index=1 if df_estimativas['dimensoes'].nunique() > 1 else 0,
+                                     format_func=rotulo_recorte)
+            st.caption("Região, faixa de renda e perfil seguem os filtros da barra lateral.")
+
+            # as seleções de filtros só entram na chave quando a dimensão faz parte do recorte
+            chave = ('subgrupos', versao_grade, modelo, variavel, recorte,
+                     sel_regioes if 'regiao' in recorte else None,
+                     sel_faixas if 'faixa_renda' in recorte else None,
+                     sel_perfis if 'perfil_grupo' in recorte else None)
+            dados_est = cache.obter(chave + ('dados',), lambda: estimativas_selecionadas(
+                df_estimativas, modelo, variavel, recorte, sel_regioes, sel_faixas, sel_perfis))
+            if (dados_est['status'] == 'ok').any():
+                fig_est = cache.obter(chave + ('figura',), lambda: figura_estimativas(dados_est, variavel))
+                st.plotly_chart(fig_est, use_container_width=True)
+            else:
+                st.warning("Nenhuma estimativa disponível para esta combinação de modelo, variável e filtros.")
+            st.dataframe(
+                dados_est[['celula', 'coef', 'erro_padrao', 'p_valor', 'n_obs', 'n_entidades', 'status']].rename(columns={
+                    'celula': 'Subgrupo', 'coef': 'Coeficiente', 'erro_padrao': 'Erro-Padrão', 'p_valor': 'p-valor',
+                    'n_obs': 'Observações', 'n_entidades': 'Clientes', 'status': 'Situação'}),
+                hide_index=True, use_container_width=True
+            )
+
+    with tab8:
         st.header("Dissertação e Materiais de Apoio")
         st.markdown("Acesse aqui o trabalho completo, o podcast explicativo e os scripts de análise.")
-        
-        diretorio_script = Path(__file__).parent
-        caminho_materiais = diretorio_script / "materiais"
-        
+
+        caminho_materiais = ativos.PASTA_MATERIAIS
+
         st.subheader("Leia a Dissertação Completa")
         arquivo_pdf_path = caminho_materiais / "DISSERTAÇÃO_Vinicios.pdf"
         try:
-            with open(arquivo_pdf_path, "rb") as f:
-                base64_pdf = base64.b64encode(f.read()).decode('utf-8')
-            pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="800" type="application/pdf"></iframe>'
+            # servido como arquivo estático (enableStaticServing), sem embutir o PDF na página
+            url_pdf = publicar_dissertacao()
+            pdf_display = f'<iframe src="{url_pdf}" width="100%" height="800" type="application/pdf"></iframe>'
             st.markdown(pdf_display, unsafe_allow_html=True)
+            st.markdown(f"[Abrir a dissertação em nova aba]({url_pdf})")
         except FileNotFoundError:
             st.error(f"ERRO: Arquivo da dissertação ('{arquivo_pdf_path.name}') não encontrado.")
 
@@ -245,13 +463,16 @@ if all(df is not None for df in [df_filtros, df_mapa, df_dist, df_temporal, df_p
         st.subheader("Faça o Download do Script de Análise (.do)")
         arquivo_do_path = caminho_materiais / "Trabalho_Completo_Reestruturado.do"
         try:
-            with open(arquivo_do_path, "r", encoding="utf-8") as f:
-                do_file_content = f.read()
             st.download_button(
                 label="Clique aqui para baixar o arquivo .do",
-                data=do_file_content,
+                data=carregar_material(arquivo_do_path.name),
                 file_name="script_dissertacao_stata.do",
                 mime="text/plain"
             )
         except FileNotFoundError:
-            st.error(f"ERRO: Arquivo do Stata ('{arquivo_do_path.name}') não encontrado.")
\ No newline at end of file
+            st.error(f"ERRO: Arquivo do Stata ('{arquivo_do_path.name}') não encontrado.")
+
+    # Contadores do cache (ao fim do script, já com as consultas desta execução); abra com ?diagnostico=1
+    if st.query_params.get("diagnostico"):
+        with st.sidebar.expander("Cache de figuras"):
+            st.json(cache.estatisticas())
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+armazem.py
+----------
+Armazém colunar (Parquet particionado por `anomes`) para a base bruta da dissertação.
+
+A conversão a partir do .sas7bdat/.dta/.csv é feita uma única vez, em blocos, e
+registrada num manifesto (`_manifesto.json`) com o hash SHA-256 do arquivo de origem.
+Cada bloco é gravado com os tipos inferidos dele; o schema comum (colunas vazias num
+bloco adotam o tipo dos blocos em que têm valores; inteiro e real viram real) fica em
+`_schema.arrow` e é aplicado na leitura.
+Enquanto o hash não mudar, o notebook e o `preparar_dados_app.py` leem direto do
+armazém, com projeção de colunas e filtros empurrados para a leitura (partições de
+`anomes` e estatísticas dos row groups), sem reprocessar o arquivo estatístico.
+
+O manifesto também guarda um hash e o número de linhas por partição. Meses novos (ou
+corrigidos) entregues em arquivo à parte entram com `acrescentar`: só esse arquivo é
+convertido, e suas partições substituem as de mesmo `anomes`, sem reconverter a origem.
+
+Uso:
+    import armazem
+    destino = armazem.garantir_armazem(caminho_origem)          # converte só se a origem mudou
+    armazem.acrescentar(destino, "base_202406.csv")             # incorpora só as partições do mês
+    df = armazem.ler_armazem(destino, colunas=['cliente', 'anomes', 'renda'],
+                             filtros=[('renda', '>', 20000), ('anomes', '>=', 202301)])
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+import carregamento
+import gravacao
+
+DIRETORIO_ARMAZEM = Path(__file__).parent / "cache" / "armazem"
+ARQUIVO_MANIFESTO = "_manifesto.json"  # prefixo "_" faz o pyarrow ignorá-lo na leitura
+ARQUIVO_SCHEMA = "_schema.arrow"
+VERSAO_ARMAZEM = 3
+COLUNA_PARTICAO = 'anomes'
+
+
+def hash_arquivo(caminho: str, tamanho_leitura: int = 8 * 1024 * 1024) -> str:
+    """SHA-256 do arquivo, lido em pedaços (memória constante)."""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for pedaco in iter(lambda: f.read(tamanho_leitura), b''):
+            h.update(pedaco)
+    return h.hexdigest()
+
+
+def diretorio_padrao(origem: str) -> Path:
+    """
+    Diretório do armazém associado a um arquivo de origem: nome do arquivo mais o hash do
+    caminho absoluto (base.csv e base.dta, ou duas base.sas7bdat em pastas diferentes,
+    têm armazéns separados).
+    """
+    caminho = os.path.abspath(origem)
+    return DIRETORIO_ARMAZEM / f"{Path(caminho).stem}_{hashlib.sha256(caminho.encode('utf-8')).hexdigest()[:12]}"
+
+
+def ler_manifesto(destino) -> Optional[dict]:
+    caminho = Path(destino) / ARQUIVO_MANIFESTO
+    if not caminho.exists():
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _hash_origem(origem: str, manifesto: Optional[dict]) -> str:
+    """
+    Hash da origem. Se tamanho e mtime batem com o manifesto, reaproveita o hash
+    gravado (evita reler arquivos de vários GB a cada execução).
+    """
+    st = os.stat(origem)
+    if manifesto and manifesto.get('tamanho') == st.st_size and manifesto.get('mtime_ns') == st.st_mtime_ns:
+        return manifesto['sha256']
+    return hash_arquivo(origem)
+
+
+def _tabela_bloco(bloco: pd.DataFrame):
+    """Tabela Arrow do bloco com os tipos inferidos; colunas só com nulos ficam com o tipo null."""
+    import pyarrow as pa
+
+    tabela = pa.Table.from_pandas(bloco, preserve_index=False).replace_schema_metadata(None)
+    for i, coluna in enumerate(tabela.columns):
+        if coluna.null_count == len(tabela) and not pa.types.is_null(coluna.type):
+            tabela = tabela.set_column(i, tabela.field(i).name, pa.nulls(len(tabela)))
+    return tabela
+
+
+def _unificar_schema(schema, novo):
+    """Schema comum a dois blocos: null adota o tipo do outro e inteiro com real vira real."""
+    import pyarrow as pa
+
+    return novo if schema is None else pa.unify_schemas([schema, novo], promote_options='permissive')
+
+
+def _schema_final(schema):
+    """
+    Colunas nulas na origem inteira ficam float64, como o pandas as leria; a coluna de
+    partição vai para o fim, onde o pyarrow a põe ao descobrir o dataset.
+    """
+    import pyarrow as pa
+
+    campos = [pa.field(f.name, pa.float64()) if pa.types.is_null(f.type) else f for f in schema]
+    return pa.schema([f for f in campos if f.name != COLUNA_PARTICAO] + [schema.field(COLUNA_PARTICAO)])
+
+
+def _ler_schema_unificado(destino):
+    """Schema comum como acumulado na conversão (colunas nulas ainda com o tipo null)."""
+    import pyarrow.ipc as ipc
+
+    caminho = Path(destino) / ARQUIVO_SCHEMA
+    if not caminho.exists():
+        return None
+    with open(caminho, 'rb') as f:
+        return ipc.read_schema(f)
+
+
+def ler_schema(destino):
+    """Schema comum do armazém, como é lido (None em armazéns sem ele, ex.: gerados por outros scripts)."""
+    schema = _ler_schema_unificado(destino)
+    return None if schema is None else _schema_final(schema)
+
+
+def _gravar_schema(schema, destino) -> None:
+    def escrever(temporario: str) -> None:
+        with open(temporario, 'wb') as f:
+            f.write(schema.serialize().to_pybytes())
+
+    gravacao.substituir(Path(destino) / ARQUIVO_SCHEMA, escrever)
+
+
+def _hash_particao(pasta: Path) -> str:
+    """Hash dos arquivos de uma partição (nomes e conteúdos, em ordem)."""
+    h = hashlib.sha256()
+    for arquivo in sorted(pasta.glob('*.parquet')):
+        h.update(arquivo.name.encode('utf-8'))
+        h.update(hash_arquivo(str(arquivo)).encode('ascii'))
+    return h.hexdigest()
+
+
+def _gravar_manifesto(manifesto: dict, destino) -> None:
+    gravacao.gravar_json(Path(destino) / ARQUIVO_MANIFESTO, manifesto, indent=2)
+
+
+def converter(origem: str, destino, tamanho_bloco: int = carregamento.TAMANHO_BLOCO_PADRAO,
+              n_processos: int = 1, sha256: Optional[str] = None) -> dict:
+    """
+    Converte a origem em Parquet particionado por `anomes`, bloco a bloco.
+    Grava num diretório temporário e só troca pelo definitivo ao final (publicação atômica);
+    numa falha, o temporário é removido. Linhas sem `anomes` (ausente ou não numérico) não
+    têm partição: são descartadas, contadas no manifesto e avisadas.
+    """
+    import pyarrow.parquet as pq
+
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    # diretório temporário exclusivo: duas conversões simultâneas não se misturam
+    temporario = Path(tempfile.mkdtemp(dir=destino.parent, prefix=destino.name + '_', suffix='.tmp'))
+
+    schema = None
+    linhas_particoes: Dict[int, int] = {}
+    sem_particao = 0
+    try:
+        blocos = carregamento.iterar_blocos(origem, colunas=None, tamanho_bloco=tamanho_bloco,
+                                            n_processos=n_processos, otimizar=False)
+        for i, bloco in enumerate(blocos):
+            if COLUNA_PARTICAO not in bloco.columns:
+                raise ValueError(f"'{origem}' não tem a coluna '{COLUNA_PARTICAO}' que particiona o armazém.")
+            mes = pd.to_numeric(bloco[COLUNA_PARTICAO], errors='coerce')
+            if mes.isna().any():
+                sem_particao += int(mes.isna().sum())
+                bloco, mes = bloco[mes.notna()].copy(), mes[mes.notna()]
+            bloco[COLUNA_PARTICAO] = mes.astype('int32')
+            if not len(bloco):
+                continue
+            # cada bloco com os seus tipos; o schema comum é acumulado e aplicado na leitura
+            tabela = _tabela_bloco(bloco)
+            schema = _unificar_schema(schema, tabela.schema)
+            pq.write_to_dataset(tabela, root_path=str(temporario), partition_cols=[COLUNA_PARTICAO],
+                                basename_template=f"bloco{i:05d}-{{i}}.parquet")
+            for m, n in bloco[COLUNA_PARTICAO].value_counts().items():
+                linhas_particoes[int(m)] = linhas_particoes.get(int(m), 0) + int(n)
+        if schema is not None:
+            _gravar_schema(schema, temporario)
+    except BaseException:
+        shutil.rmtree(temporario, ignore_errors=True)
+        raise
+    if sem_particao:
+        print(f"[armazem] aviso: {sem_particao} linha(s) de '{origem}' sem '{COLUNA_PARTICAO}' "
+              "válido foram descartadas.")
+    st = os.stat(origem)
+    manifesto = {
+        'versao': VERSAO_ARMAZEM,
+        'origem': os.path.abspath(origem),
+        'sha256': sha256 or hash_arquivo(origem),
+        'tamanho': st.st_size,
+        'mtime_ns': st.st_mtime_ns,
+        'n_linhas': sum(linhas_particoes.values()),
+        'colunas': {f.name: str(f.type) for f in _schema_final(schema)} if schema is not None else {},
+        'particoes': sorted(linhas_particoes),
+        'linhas_sem_particao': sem_particao,
+        'linhas_particoes': {str(m): n for m, n in sorted(linhas_particoes.items())},
+        'hash_particoes': {str(m): _hash_particao(temporario / f"{COLUNA_PARTICAO}={m}")
+                           for m in sorted(linhas_particoes)},
+        'acrescimos': {},
+        'criado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    _gravar_manifesto(manifesto, temporario)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(temporario, destino)
+    return manifesto
+
+
+def garantir_armazem(origem: str, destino=None, tamanho_bloco: int = carregamento.TAMANHO_BLOCO_PADRAO,
+                     n_processos: int = 1) -> Path:
+    """Retorna o diretório do armazém, (re)convertendo apenas quando o hash da origem mudou."""
+    destino = Path(destino) if destino is not None else diretorio_padrao(origem)
+    manifesto = ler_manifesto(destino)
+    sha = _hash_origem(origem, manifesto)
+    if manifesto and manifesto.get('versao') == VERSAO_ARMAZEM and manifesto.get('sha256') == sha:
+        st = os.stat(origem)
+        if manifesto.get('mtime_ns') != st.st_mtime_ns:
+            # arquivo tocado mas com mesmo conteúdo: só atualiza o carimbo
+            manifesto.update(tamanho=st.st_size, mtime_ns=st.st_mtime_ns)
+            _gravar_manifesto(manifesto, destino)
+        return destino
+    print(f"[armazem] convertendo '{origem}' para Parquet em '{destino}'...")
+    converter(origem, destino, tamanho_bloco=tamanho_bloco, n_processos=n_processos, sha256=sha)
+    return destino
+
+
+def acrescentar(destino, arquivo: str, tamanho_bloco: int = carregamento.TAMANHO_BLOCO_PADRAO,
+                n_processos: int = 1) -> dict:
+    """
+    Incorpora ao armazém as partições de `arquivo` (meses novos ou corrigidos, no formato
+    da origem) sem reconverter a origem: o arquivo é convertido à parte e cada partição
+    dele substitui a de mesmo `anomes`. Um arquivo já incorporado com o mesmo conteúdo é
+    ignorado. Uma reconversão da origem (que mudou) descarta os acréscimos.
+    """
+    destino = Path(destino)
+    manifesto = ler_manifesto(destino)
+    if manifesto is None:
+        raise FileNotFoundError(f"Armazém sem manifesto em '{destino}'.")
+    chave = os.path.abspath(arquivo)
+    anterior = manifesto.get('acrescimos', {}).get(chave)
+    sha = _hash_origem(arquivo, anterior)
+    if anterior is not None and anterior['sha256'] == sha:
+        return manifesto
+
+    print(f"[armazem] incorporando '{arquivo}' ao armazém '{destino}'...")
+    convertido = Path(tempfile.mkdtemp(dir=destino.parent, prefix=destino.name + '_', suffix='.acrescimo'))
+    parcial = converter(arquivo, convertido, tamanho_bloco=tamanho_bloco, n_processos=n_processos, sha256=sha)
+    try:
+        schema = _ler_schema_unificado(destino)
+        novo = _ler_schema_unificado(convertido)
+        if novo is not None:
+            schema = _unificar_schema(schema, novo)
+            _gravar_schema(schema, destino)
+        for mes in parcial['particoes']:
+            pasta = destino / f"{COLUNA_PARTICAO}={mes}"
+            antiga = destino / f"_{COLUNA_PARTICAO}={mes}.antiga"  # "_": ignorada pelo pyarrow
+            if pasta.exists():
+                os.replace(pasta, antiga)
+            os.replace(convertido / pasta.name, pasta)
+            shutil.rmtree(antiga, ignore_errors=True)
+            manifesto['linhas_particoes'][str(mes)] = parcial['linhas_particoes'][str(mes)]
+            manifesto['hash_particoes'][str(mes)] = parcial['hash_particoes'][str(mes)]
+    finally:
+        shutil.rmtree(convertido, ignore_errors=True)
+
+    manifesto['particoes'] = sorted(set(manifesto['particoes']) | set(parcial['particoes']))
+    manifesto['n_linhas'] = sum(manifesto['linhas_particoes'].values())
+    if schema is not None:
+        manifesto['colunas'] = {f.name: str(f.type) for f in _schema_final(schema)}
+    manifesto.setdefault('acrescimos', {})[chave] = {
+        'sha256': sha, 'tamanho': parcial['tamanho'], 'mtime_ns': parcial['mtime_ns'],
+        'particoes': parcial['particoes'], 'linhas_sem_particao': parcial['linhas_sem_particao'],
+        'incorporado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+    _gravar_manifesto(manifesto, destino)  # gravado por último: marca o acréscimo como concluído
+    return manifesto
+
+
+def ler_armazem(destino, colunas: Optional[Sequence[str]] = None,
+                filtros: Optional[List[Tuple]] = None, otimizar: bool = False) -> pd.DataFrame:
+    """
+    Lê o armazém com projeção de colunas e filtros no formato do pyarrow
+    (ex.: [('renda', '>', 20000)] ou [('anomes', 'in', [202301, 202302])]).
+    Filtros em `anomes` descartam partições inteiras; os demais usam as estatísticas
+    dos row groups e são aplicados durante a leitura, antes de virar DataFrame.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    particionamento = ds.partitioning(pa.schema([(COLUNA_PARTICAO, pa.int32())]), flavor='hive')
+    # com o schema comum, arquivos de blocos com tipos diferentes (ex.: coluna vazia no bloco) são convertidos a ele
+    dataset = ds.dataset(str(destino), format='parquet', partitioning=particionamento, schema=ler_schema(destino))
+    if colunas is not None:
+        # colunas ausentes na origem são ignoradas (mesmo comportamento do carregamento em blocos)
+        colunas = [c for c in colunas if c in dataset.schema.names]
+    expressao = pq.filters_to_expression(filtros) if filtros else None
+    tabela = dataset.to_table(columns=colunas, filter=expressao)
+    df = tabela.to_pandas()
+    return carregamento.otimizar_tipos(df) if otimizar else df
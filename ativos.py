@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+ativos.py
+---------
+Ativos estáticos do app (mapa dos estados, dissertação em PDF e script do Stata).
+
+O Streamlit reexecuta o `app.py` inteiro a cada interação. Sem cache, cada rerun lia o
+`brasil_estados.json`, lia o PDF e o embutia em base64 no iframe (um payload de ~0,5 MB
+por página) e lia o `.do`, qualquer que fosse a aba aberta. Aqui ficam as funções puras
+de preparo; o `app.py` as envolve em `st.cache_resource`, então cada ativo é lido uma
+vez por processo e compartilhado entre as sessões:
+
+* mapa: o GeoJSON é simplificado (Douglas-Peucker com tolerância em graus e coordenadas
+  arredondadas, sem as `properties` que o mapa não usa) e gravado uma vez em
+  `app_data/brasil_estados_simplificado.json`; o arquivo é refeito quando o original
+  muda. A figura leva só a versão simplificada ao navegador;
+* PDF: copiado para `static/` e servido pelo próprio servidor do Streamlit
+  (`enableStaticServing` em `.streamlit/config.toml`), com o iframe apontando para
+  `app/static/<arquivo>` em vez de carregar o conteúdo embutido;
+* `.do`: bytes lidos uma vez para o botão de download.
+
+Uso (pré-cálculo do mapa, opcional; o app também o faz na primeira carga):
+    python ativos.py
+    python ativos.py --tolerancia 0.02 --casas 3
+"""
+from __future__ import annotations
+import argparse
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import gravacao
+
+DIRETORIO_ATUAL = Path(__file__).parent
+GEOJSON_ORIGINAL = DIRETORIO_ATUAL / "brasil_estados.json"
+GEOJSON_SIMPLIFICADO = DIRETORIO_ATUAL / "app_data" / "brasil_estados_simplificado.json"
+PASTA_MATERIAIS = DIRETORIO_ATUAL / "materiais"
+PASTA_ESTATICA = DIRETORIO_ATUAL / "static"  # servida pelo Streamlit em app/static/
+URL_ESTATICA = "app/static"
+
+TOLERANCIA_GRAUS = 0.01  # ~1 km: invisível na escala do mapa do Brasil
+CASAS_DECIMAIS = 3
+
+
+# ------------------------------
+# GeoJSON simplificado
+# ------------------------------
+def _douglas_peucker(pontos: np.ndarray, tolerancia: float) -> np.ndarray:
+    """Máscara dos vértices mantidos de uma linha (n x 2) pelo algoritmo de Douglas-Peucker."""
+    n = len(pontos)
+    manter = np.zeros(n, dtype=bool)
+    manter[0] = manter[-1] = True
+    pilha = [(0, n - 1)]
+    while pilha:
+        inicio, fim = pilha.pop()
+        if fim - inicio < 2:
+            continue
+        a, b = pontos[inicio], pontos[fim]
+        meio = pontos[inicio + 1:fim]
+        direcao = b - a
+        comprimento = np.hypot(direcao[0], direcao[1])
+        if comprimento == 0:
+            distancias = np.hypot(meio[:, 0] - a[0], meio[:, 1] - a[1])
+        else:
+            distancias = np.abs(direcao[0] * (meio[:, 1] - a[1]) - direcao[1] * (meio[:, 0] - a[0])) / comprimento
+        i = int(np.argmax(distancias))
+        if distancias[i] > tolerancia:
+            k = inicio + 1 + i
+            manter[k] = True
+            pilha.append((inicio, k))
+            pilha.append((k, fim))
+    return manter
+
+
+def simplificar_anel(anel: List, tolerancia: float = TOLERANCIA_GRAUS,
+                     casas: int = CASAS_DECIMAIS) -> List:
+    """
+    Anel de polígono (lista de [lon, lat], fechado) com menos vértices. Anéis que
+    ficariam com menos de 4 pontos (ilhas pequenas) só têm as coordenadas arredondadas.
+    """
+    pontos = np.asarray(anel, dtype=np.float64)[:, :2]
+    if len(pontos) > 4:
+        reduzido = pontos[_douglas_peucker(pontos, tolerancia)]
+        if len(reduzido) >= 4:
+            pontos = reduzido
+    pontos = np.round(pontos, casas)
+    # arredondar pode repetir vértices vizinhos
+    distintos = np.r_[True, np.any(np.diff(pontos, axis=0) != 0, axis=1)]
+    if distintos.sum() >= 4:
+        pontos = pontos[distintos]
+    return pontos.tolist()
+
+
+def simplificar_geojson(geojson: Dict, tolerancia: float = TOLERANCIA_GRAUS,
+                        casas: int = CASAS_DECIMAIS) -> Dict:
+    """
+    FeatureCollection só com o que o `px.choropleth` usa (o `id` de cada feição e a
+    geometria simplificada). Polygon e MultiPolygon são simplificados; outros tipos
+    passam como estão.
+    """
+    feicoes = []
+    for feicao in geojson.get('features', []):
+        geometria = feicao.get('geometry') or {}
+        tipo = geometria.get('type')
+        if tipo == 'Polygon':
+            coordenadas = [simplificar_anel(anel, tolerancia, casas) for anel in geometria['coordinates']]
+        elif tipo == 'MultiPolygon':
+            coordenadas = [[simplificar_anel(anel, tolerancia, casas) for anel in poligono]
+                           for poligono in geometria['coordinates']]
+        else:
+            coordenadas = geometria.get('coordinates')
+        nova = {'type': 'Feature', 'geometry': {'type': tipo, 'coordinates': coordenadas}}
+        if 'id' in feicao:
+            nova['id'] = feicao['id']
+        feicoes.append(nova)
+    return {'type': 'FeatureCollection', 'features': feicoes}
+
+
+def contar_vertices(geojson: Dict) -> int:
+    """Total de vértices das geometrias Polygon/MultiPolygon da coleção."""
+    total = 0
+    for feicao in geojson.get('features', []):
+        geometria = feicao.get('geometry') or {}
+        if geometria.get('type') == 'Polygon':
+            total += sum(len(anel) for anel in geometria['coordinates'])
+        elif geometria.get('type') == 'MultiPolygon':
+            total += sum(len(anel) for poligono in geometria['coordinates'] for anel in poligono)
+    return total
+
+
+def preparar_geojson(origem: Path = GEOJSON_ORIGINAL, destino: Path = GEOJSON_SIMPLIFICADO,
+                     tolerancia: float = TOLERANCIA_GRAUS, casas: int = CASAS_DECIMAIS,
+                     forcar: bool = False) -> Path:
+    """
+    Grava (se ausente, desatualizado em relação à origem ou `forcar`) o GeoJSON
+    simplificado e retorna seu caminho. Sem a origem, usa o simplificado já existente.
+    Levanta FileNotFoundError se não houver nenhum dos dois.
+    """
+    origem, destino = Path(origem), Path(destino)
+    if not origem.exists():
+        if destino.exists():
+            return destino
+        raise FileNotFoundError(origem)
+    if not forcar and destino.exists() and destino.stat().st_mtime >= origem.stat().st_mtime:
+        return destino
+    with open(origem, 'r', encoding='utf-8') as f:
+        simplificado = simplificar_geojson(json.load(f), tolerancia, casas)
+    gravacao.gravar_json(destino, simplificado, separators=(',', ':'))  # outra sessão nunca lê meio arquivo
+    return destino
+
+
+def carregar_geojson(origem: Path = GEOJSON_ORIGINAL, destino: Path = GEOJSON_SIMPLIFICADO) -> Dict:
+    """GeoJSON simplificado do mapa (gerado na primeira chamada se preciso)."""
+    with open(preparar_geojson(origem, destino), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ------------------------------
+# Arquivos servidos e baixados
+# ------------------------------
+def publicar_estatico(origem: Path, nome: Optional[str] = None, pasta: Path = PASTA_ESTATICA) -> str:
+    """
+    Copia `origem` para a pasta estática do Streamlit (se ausente ou desatualizada) e
+    retorna a URL relativa pela qual o servidor o entrega. `nome` permite publicar com
+    um nome só ASCII, que dispensa codificar a URL.
+    Levanta FileNotFoundError se a origem não existir.
+    """
+    origem = Path(origem)
+    if not origem.exists():
+        raise FileNotFoundError(origem)
+    destino = Path(pasta) / (nome or origem.name)
+    if not destino.exists() or destino.stat().st_size != origem.stat().st_size \
+            or destino.stat().st_mtime < origem.stat().st_mtime:
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        gravacao.substituir(destino, lambda temporario: shutil.copy2(origem, temporario))
+    return f"{URL_ESTATICA}/{destino.name}"
+
+
+def ler_bytes(caminho: Path) -> bytes:
+    """Conteúdo do arquivo (FileNotFoundError se não existir)."""
+    return Path(caminho).read_bytes()
+
+
+# ------------------------------
+# Linha de comando
+# ------------------------------
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Pré-calcula o GeoJSON simplificado do mapa do app.")
+    parser.add_argument('--origem', type=Path, default=GEOJSON_ORIGINAL)
+    parser.add_argument('--destino', type=Path, default=GEOJSON_SIMPLIFICADO)
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_GRAUS,
+                        help="distância máxima (graus) entre a linha simplificada e a original")
+    parser.add_argument('--casas', type=int, default=CASAS_DECIMAIS,
+                        help="casas decimais das coordenadas gravadas")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _argumentos(argv)
+    try:
+        destino = preparar_geojson(args.origem, args.destino, args.tolerancia, args.casas, forcar=True)
+    except FileNotFoundError:
+        print(f"ERRO: GeoJSON '{args.origem}' não encontrado.")
+        return 1
+    with open(args.origem, 'r', encoding='utf-8') as f:
+        antes = contar_vertices(json.load(f))
+    with open(destino, 'r', encoding='utf-8') as f:
+        depois = contar_vertices(json.load(f))
+    print(f"GeoJSON simplificado: {destino}")
+    print(f"Vértices: {antes:,} -> {depois:,}; tamanho: "
+          f"{args.origem.stat().st_size / 2**10:,.0f} KB -> {destino.stat().st_size / 2**10:,.0f} KB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
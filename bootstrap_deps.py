@@ -12,15 +12,22 @@ Uso em NOTEBOOK (Jupyter/VSCode):
     import bootstrap_deps as deps
     deps.ensure_in_notebook(requirements_file="requirements.txt")  # reinicie o kernel após instalar
 
+Início rápido (padrão): depois de uma verificação bem-sucedida, grava um carimbo em
+cache/bootstrap_deps.json com o hash dos requisitos, o interpretador e o estado da pasta
+site-packages. Enquanto nada disso mudar, a verificação (find_spec ou pip) é pulada.
+Use fast_start=False (ou apague o carimbo) para forçar a verificação.
+
 Observação: para produção, prefira venv + requirements.txt. O bootstrap é uma rede de segurança.
 """
 from __future__ import annotations
 import sys
 import subprocess
+import hashlib
 import importlib.util
+import json
 import os
+import sysconfig
 from typing import Iterable, List, Optional
-from scipy.stats import chi2  # não é obrigatório; só para manter coerência de imports se você usar em outros trechos
 
 # Pacotes padrão caso não exista requirements.txt (inclui linearmodels)
 DEFAULT_REQS = [
@@ -50,6 +57,47 @@ PKG_TO_MODULE = {
     "appnope": "appnope",
 }
 
+# Carimbo do início rápido (por chave: requisitos + interpretador + site-packages)
+STAMP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cache", "bootstrap_deps.json")
+
+def _stamp_key(requirements_file: Optional[str], extra: Optional[Iterable[str]]) -> str:
+    """Hash dos requisitos pedidos, do interpretador e da última modificação do site-packages."""
+    h = hashlib.sha256()
+    if requirements_file and os.path.exists(requirements_file):
+        with open(requirements_file, "rb") as f:
+            h.update(f.read())
+    else:
+        h.update("\n".join(DEFAULT_REQS + list(extra or [])).encode("utf-8"))
+    h.update(sys.executable.encode("utf-8"))
+    h.update(sys.version.encode("utf-8"))
+    # instalar ou remover pacotes altera a pasta site-packages e invalida o carimbo
+    for chave in ("purelib", "platlib"):
+        pasta = sysconfig.get_paths().get(chave)
+        if pasta and os.path.isdir(pasta):
+            h.update(f"{pasta}:{os.stat(pasta).st_mtime_ns}".encode("utf-8"))
+    return h.hexdigest()
+
+def _read_stamps() -> dict:
+    try:
+        with open(STAMP_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _stamp_ok(key: str) -> bool:
+    return _read_stamps().get(sys.executable) == key
+
+def _write_stamp(key: str) -> None:
+    """Registra a chave verificada para este interpretador (falhas de escrita só desativam o atalho)."""
+    try:
+        carimbos = _read_stamps()
+        carimbos[sys.executable] = key
+        os.makedirs(os.path.dirname(STAMP_FILE), exist_ok=True)
+        with open(STAMP_FILE, "w", encoding="utf-8") as f:
+            json.dump(carimbos, f, indent=2)
+    except OSError:
+        pass
+
 def _module_available(module_name: str) -> bool:
     try:
         return importlib.util.find_spec(module_name) is not None
@@ -83,11 +131,16 @@ def _pip_install(args: List[str]) -> None:
     print("[bootstrap] executando:", " ".join(cmd))
     subprocess.check_call(cmd)
 
-def ensure(requirements_file: Optional[str] = None, extra: Optional[Iterable[str]] = None) -> None:
+def ensure(requirements_file: Optional[str] = None, extra: Optional[Iterable[str]] = None,
+           fast_start: bool = True) -> None:
     """
     Garante dependências para SCRIPTS. Se instalar algo, reinicia o processo
     com os mesmos argumentos para carregar os módulos recém-instalados.
+    Com `fast_start`, um ambiente já verificado (mesmo carimbo) não é verificado de novo.
     """
+    key = _stamp_key(requirements_file, extra)
+    if fast_start and _stamp_ok(key):
+        return
     reqs = []
     if requirements_file and os.path.exists(requirements_file):
         # delega toda a resolução ao pip
@@ -99,6 +152,7 @@ def ensure(requirements_file: Optional[str] = None, extra: Optional[Iterable[str
             reqs.extend(list(extra))
         missing = _missing_modules_from_requirements(reqs)
         if not missing:
+            _write_stamp(key)
             return
         reqs = missing
 
@@ -107,16 +161,24 @@ def ensure(requirements_file: Optional[str] = None, extra: Optional[Iterable[str
     except subprocess.CalledProcessError as e:
         print("[bootstrap] Falha ao instalar dependências:", e, file=sys.stderr)
         raise
+    # carimbo do ambiente já instalado: o processo reiniciado não instala de novo
+    _write_stamp(_stamp_key(requirements_file, extra))
 
     # Reinicia o processo (apenas para scripts .py)
     print("[bootstrap] Dependências instaladas. Reiniciando o processo...")
     os.execv(sys.executable, [sys.executable] + sys.argv)
 
-def ensure_in_notebook(requirements_file: Optional[str] = None, extra: Optional[Iterable[str]] = None) -> None:
+def ensure_in_notebook(requirements_file: Optional[str] = None, extra: Optional[Iterable[str]] = None,
+                       fast_start: bool = True) -> None:
     """
     Garante dependências para NOTEBOOKS sem reiniciar o processo automaticamente.
     Após instalar, reinicie o kernel.
+    Com `fast_start`, um ambiente já verificado (mesmo carimbo) não é verificado de novo.
     """
+    key = _stamp_key(requirements_file, extra)
+    if fast_start and _stamp_ok(key):
+        print("[bootstrap] Ambiente inalterado desde a última verificação; dependências não verificadas de novo.")
+        return
     reqs = []
     if requirements_file and os.path.exists(requirements_file):
         reqs = ["-r", requirements_file]
@@ -127,11 +189,13 @@ def ensure_in_notebook(requirements_file: Optional[str] = None, extra: Optional[
         missing = _missing_modules_from_requirements(reqs)
         if not missing:
             print("[bootstrap] Todas as dependências necessárias já estão disponíveis.")
+            _write_stamp(key)
             return
         reqs = missing
 
     try:
         _pip_install(["install", "--disable-pip-version-check", "--no-input"] + reqs)
+        _write_stamp(_stamp_key(requirements_file, extra))
         print("[bootstrap] Instalação concluída. Reinicie o kernel para carregar os novos pacotes.")
     except subprocess.CalledProcessError as e:
         print("[bootstrap] Falha ao instalar dependências:", e, file=sys.stderr)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+cache_figuras.py
+----------------
+Cache LRU das figuras (e números derivados) do `app.py`, chaveado pela seleção de filtros.
+
+O Streamlit reexecuta o script a cada interação e, sem cache, todas as figuras de todas
+as abas eram refeitas (máscaras de filtro + `px.*`), mesmo quando só um filtro sem
+relação com elas mudava. Cada figura entra aqui com uma chave formada pelo seu nome e
+pelos filtros de que depende (normalizados: a ordem de seleção no multiselect não
+importa), então só as figuras cujos insumos mudaram são reconstruídas.
+
+O cache é um só por processo (criado em `st.cache_resource` no app), compartilhado
+entre as sessões, com no máximo `capacidade` entradas: a menos usada recentemente sai
+primeiro. Acertos e faltas são contados para dimensionar a capacidade (abra o app com
+`?diagnostico=1` para vê-los na barra lateral).
+
+As figuras guardadas são compartilhadas: quem as recebe não deve alterá-las.
+
+Uso:
+    cache = cache_figuras.CacheLRU(capacidade=128)
+    chave = ('temporal', cache_figuras.normalizar(regioes))
+    fig = cache.obter(chave, lambda: px.line(df[df['regiao'].isin(regioes)], ...))
+    print(cache.estatisticas())
+"""
+from __future__ import annotations
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Tuple
+
+
+def normalizar(valores: Iterable) -> Tuple:
+    """Seleção de um multiselect como tupla ordenada e sem repetições (parte de uma chave)."""
+    return tuple(sorted(set(valores), key=lambda v: (type(v).__name__, str(v))))
+
+
+class CacheLRU:
+    """Dicionário limitado com descarte do menos usado recentemente e contadores de acerto/falta."""
+
+    def __init__(self, capacidade: int = 128):
+        if capacidade < 1:
+            raise ValueError("A capacidade do cache deve ser de pelo menos 1 entrada.")
+        self.capacidade = capacidade
+        self._itens: OrderedDict = OrderedDict()
+        self._trava = threading.Lock()  # sessões do Streamlit rodam em threads diferentes
+        self.acertos = 0
+        self.faltas = 0
+        self.descartes = 0
+
+    def obter(self, chave: Hashable, construir: Callable):
+        """Valor guardado para `chave`; numa falta, chama `construir()` e guarda o resultado."""
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.faltas += 1
+        # a construção fica fora da trava: figuras lentas não bloqueiam as outras sessões
+        valor = construir()
+        with self._trava:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.capacidade:
+                self._itens.popitem(last=False)
+                self.descartes += 1
+        return valor
+
+    def limpar(self) -> None:
+        with self._trava:
+            self._itens.clear()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def estatisticas(self) -> Dict:
+        with self._trava:
+            consultas = self.acertos + self.faltas
+            return {
+                'entradas': len(self._itens),
+                'capacidade': self.capacidade,
+                'acertos': self.acertos,
+                'faltas': self.faltas,
+                'descartes': self.descartes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
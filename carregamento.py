@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+carregamento.py
+---------------
+Leitura em blocos (chunks) das bases brutas da dissertação (.sas7bdat, .dta ou .csv).
+
+Em vez de carregar o arquivo inteiro de uma vez, a base é lida em blocos de linhas,
+mantendo apenas as colunas usadas pelas etapas seguintes e reduzindo os tipos
+(categorias para colunas de texto repetitivas, float32 para os saldos de carteira)
+à medida que cada bloco chega. O encoding é detectado uma única vez e, opcionalmente,
+os blocos são lidos em processos paralelos.
+
+Uso:
+    import carregamento
+    df = carregamento.carregar_em_blocos(caminho, tamanho_bloco=500_000, n_processos=4)
+
+    # ou, para processar bloco a bloco com memória limitada ao tamanho do bloco:
+    for bloco in carregamento.iterar_blocos(caminho):
+        ...
+"""
+from __future__ import annotations
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# Saldos de carteira (viram float32 no modo otimizado)
+COLUNAS_CARTEIRA = [
+    'RENDA_FIXA_POS_CDI', 'RENDA_FIXA_PRE', 'RENDA_FIXA_INFLACAO',
+    'MULTIMERCADOS', 'RENDA_VARIAVEL', 'INVEST_ALTERNATIVOS',
+    'INVEST_EXT_RENDA_VARIAVEL', 'INVEST_NO_EXTERIOR', 'INVEST_EXTERIOR', 'INVEST_EXT_RENDA_FIXA',
+]
+
+# Colunas de texto com poucos valores distintos (viram category)
+COLUNAS_CATEGORICAS = ['UF_CADASTRO', 'SEXO', 'DS_OCUPACAO', 'NM_TIP_CTRA']
+
+# Colunas efetivamente usadas pelo notebook (prepare_engineer) e pelo app (tratar_dados)
+COLUNAS_USADAS = [
+    'cliente', 'anomes', 'renda', 'DT_NASCIMENTO', 'SEXO', 'UF_CADASTRO', 'NM_TIP_CTRA',
+    'EST_CIVIL', 'ESCOLAR', 'CD_PRFL_API', 'DS_OCUPACAO',
+] + COLUNAS_CARTEIRA
+
+ENCODINGS_CANDIDATOS = ('utf-8', 'latin1')
+TAMANHO_BLOCO_PADRAO = 500_000
+
+
+def _formato(caminho: str) -> str:
+    ext = os.path.splitext(str(caminho))[1].lower()
+    if ext not in ('.sas7bdat', '.dta', '.csv'):
+        raise ValueError(f"Formato de arquivo não suportado: '{ext}' ({caminho})")
+    return ext
+
+
+def _leitor_readstat(formato: str):
+    import pyreadstat
+    return pyreadstat.read_sas7bdat if formato == '.sas7bdat' else pyreadstat.read_dta
+
+
+def _colunas_disponiveis(caminho: str, colunas: Optional[Sequence[str]], encoding: Optional[str]) -> Optional[List[str]]:
+    """Interseção entre as colunas pedidas e as existentes no arquivo (preservando a ordem do pedido)."""
+    if colunas is None:
+        return None
+    formato = _formato(caminho)
+    if formato == '.csv':
+        existentes = pd.read_csv(caminho, nrows=0, encoding=encoding).columns
+    else:
+        _, meta = _leitor_readstat(formato)(caminho, metadataonly=True, encoding=encoding)
+        existentes = meta.column_names
+    existentes = set(existentes)
+    return [c for c in colunas if c in existentes]
+
+
+def detectar_encoding(caminho: str, linhas_amostra: int = 10_000) -> Optional[str]:
+    """
+    Detecta o encoding uma única vez, tentando ler uma amostra com cada candidato.
+    Retorna None para .dta (o pyreadstat usa o encoding gravado no próprio arquivo).
+    """
+    formato = _formato(caminho)
+    if formato == '.dta':
+        return None
+    ultimo_erro = None
+    for enc in ENCODINGS_CANDIDATOS:
+        try:
+            if formato == '.csv':
+                pd.read_csv(caminho, nrows=linhas_amostra, encoding=enc)
+            else:
+                _leitor_readstat(formato)(caminho, encoding=enc, row_limit=linhas_amostra)
+            return enc
+        except Exception as e:  # ReadstatError / UnicodeDecodeError
+            ultimo_erro = e
+    raise ValueError(f"Não foi possível detectar o encoding de '{caminho}': {ultimo_erro}")
+
+
+def contar_linhas(caminho: str, encoding: Optional[str] = None) -> Optional[int]:
+    """Número de linhas a partir dos metadados (None quando o formato não informa)."""
+    formato = _formato(caminho)
+    if formato == '.csv':
+        return None
+    _, meta = _leitor_readstat(formato)(caminho, metadataonly=True, encoding=encoding)
+    n = getattr(meta, 'number_rows', None)
+    return int(n) if n is not None and n >= 0 else None
+
+
+def otimizar_tipos(df: pd.DataFrame) -> pd.DataFrame:
+    """Reduz os tipos de um bloco: category para textos repetitivos e float32 para saldos e códigos."""
+    for col in df.columns:
+        s = df[col]
+        if col in COLUNAS_CATEGORICAS:
+            df[col] = s.astype('category')
+        elif col in COLUNAS_CARTEIRA:
+            df[col] = pd.to_numeric(s, errors='coerce').astype(np.float32)
+        elif col in ('EST_CIVIL', 'ESCOLAR', 'CD_PRFL_API') and pd.api.types.is_float_dtype(s):
+            # códigos pequenos com possíveis missings: float32 basta e preserva NaN
+            df[col] = s.astype(np.float32)
+    return df
+
+
+def _ler_bloco(caminho: str, offset: int, limite: int, colunas: Optional[List[str]],
+               encoding: Optional[str], otimizar: bool) -> pd.DataFrame:
+    """Lê um único bloco de linhas [offset, offset + limite). Executado também nos processos filhos."""
+    formato = _formato(caminho)
+    if formato == '.csv':
+        df = pd.read_csv(caminho, usecols=colunas, encoding=encoding,
+                         skiprows=range(1, offset + 1), nrows=limite)
+    else:
+        df, _ = _leitor_readstat(formato)(caminho, usecols=colunas, encoding=encoding,
+                                          row_offset=offset, row_limit=limite)
+    return otimizar_tipos(df) if otimizar else df
+
+
+def iterar_blocos(caminho: str,
+                  colunas: Optional[Sequence[str]] = COLUNAS_USADAS,
+                  tamanho_bloco: int = TAMANHO_BLOCO_PADRAO,
+                  n_processos: int = 1,
+                  otimizar: bool = True,
+                  encoding: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """
+    Gera os blocos do arquivo, em ordem. Com n_processos > 1 os blocos são lidos em
+    processos paralelos, com no máximo `n_processos` blocos em memória ao mesmo tempo.
+    """
+    formato = _formato(caminho)
+    if encoding is None:
+        encoding = detectar_encoding(caminho)
+    colunas = _colunas_disponiveis(caminho, colunas, encoding)
+
+    # CSV não tem acesso aleatório barato: lê sequencialmente com o iterador do pandas
+    if formato == '.csv':
+        for bloco in pd.read_csv(caminho, usecols=colunas, encoding=encoding, chunksize=tamanho_bloco):
+            yield otimizar_tipos(bloco) if otimizar else bloco
+        return
+
+    n_linhas = contar_linhas(caminho, encoding)
+    if n_linhas is None:
+        # sem contagem nos metadados: lê em sequência até o primeiro bloco vazio
+        offset = 0
+        while True:
+            bloco = _ler_bloco(caminho, offset, tamanho_bloco, colunas, encoding, otimizar)
+            if bloco.empty:
+                return
+            yield bloco
+            offset += len(bloco)
+
+    offsets = list(range(0, n_linhas, tamanho_bloco))
+    if n_processos <= 1:
+        for off in offsets:
+            yield _ler_bloco(caminho, off, tamanho_bloco, colunas, encoding, otimizar)
+        return
+
+    with ProcessPoolExecutor(max_workers=n_processos) as pool:
+        # janela deslizante: mantém só n_processos leituras em voo
+        pendentes = []
+        for off in offsets:
+            pendentes.append(pool.submit(_ler_bloco, caminho, off, tamanho_bloco, colunas, encoding, otimizar))
+            if len(pendentes) >= n_processos:
+                yield pendentes.pop(0).result()
+        for fut in pendentes:
+            yield fut.result()
+
+
+def concatenar_blocos(blocos: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatena blocos preservando as colunas categóricas (união das categorias de cada bloco).
+
+    Os blocos podem vir de um iterador: cada um é repartido em colunas assim que chega e
+    descartado, e o quadro final é montado coluna a coluna, liberando os pedaços de cada
+    coluna logo depois de juntá-los. A memória extra fica em um bloco e uma coluna da base,
+    em vez de todos os blocos mais o quadro concatenado.
+    """
+    partes: dict = {}
+    tamanhos: List[int] = []
+    for bloco in blocos:
+        if not len(bloco):
+            continue
+        for col in partes.keys() - set(bloco.columns):
+            partes[col].append(pd.Series(np.nan, index=range(len(bloco))))  # coluna ausente no bloco
+        for col in bloco.columns:
+            # cópia da coluna: a fatia sozinha manteria vivo o bloco interno inteiro do pandas
+            partes.setdefault(col, [pd.Series(np.nan, index=range(n)) for n in tamanhos]).append(bloco[col].copy())
+        tamanhos.append(len(bloco))
+        del bloco
+    if not tamanhos:
+        return pd.DataFrame()
+
+    df = pd.DataFrame(index=pd.RangeIndex(sum(tamanhos)))
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+        for col in list(partes):
+            pedacos = partes.pop(col)
+            if all(isinstance(p.dtype, pd.CategoricalDtype) for p in pedacos):
+                if len({p.cat.categories.dtype for p in pedacos}) > 1:
+                    # um bloco em que o texto veio todo ausente (lido como float) tem categorias
+                    # float: as categorias de todos passam a object antes da união
+                    pedacos = [p.cat.set_categories(p.cat.categories.astype(object)) for p in pedacos]
+                valores = pd.Categorical(union_categoricals(pedacos, ignore_order=True))
+            else:
+                valores = pd.concat(pedacos, ignore_index=True)
+            del pedacos
+            df[col] = valores
+            del valores
+    return df
+
+
+def carregar_em_blocos(caminho: str,
+                       colunas: Optional[Sequence[str]] = COLUNAS_USADAS,
+                       tamanho_bloco: int = TAMANHO_BLOCO_PADRAO,
+                       n_processos: int = 1,
+                       otimizar: bool = True) -> pd.DataFrame:
+    """
+    Carrega o arquivo inteiro, bloco a bloco, já com os tipos reduzidos.
+    O pico de memória fica limitado à base compacta mais `n_processos` blocos e uma coluna.
+    """
+    return concatenar_blocos(iterar_blocos(caminho, colunas=colunas, tamanho_bloco=tamanho_bloco,
+                                           n_processos=n_processos, otimizar=otimizar))
@@ -0,0 +1,346 @@
+# -*- coding: utf-8 -*-
+"""
+desempenho.py
+-------------
+Benchmark das etapas do notebook e do pré-processamento do app em várias escalas de dados.
+
+Para cada escala (número de clientes x meses), uma base sintética é gerada com o
+`gerar_dados_sinteticos.py` (e guardada em `cache/benchmark/` para as próximas rodadas)
+e cada etapa roda num processo novo, com a entrada já pronta em disco, medindo:
+
+* tempo de parede da etapa (sem contar a leitura da entrada preparada);
+* pico de memória residente do processo (RSS) e memória antes da etapa;
+* vazão (linhas da entrada por segundo).
+
+Etapas: `load_data`, `prepare_engineer` e `run_models` (notebook `dados.ipynb`),
+`tratar_dados`, `construir_cubo` e as sete agregações de `salvar_agregados`
+(`preparar_dados_app.py`) e `carregar_dados_agregados` (`app.py`, sem o cache do
+Streamlit, isto é, a carga a frio).
+
+Cada rodada é acrescentada ao histórico (`benchmarks/historico.jsonl`, uma linha
+JSON por medição) e comparada com a linha de base (`benchmarks/linha_base.json`):
+medições mais lentas ou com pico de memória maior que a tolerância são marcadas como
+regressão e o processo termina com código 1.
+
+Uso:
+    python desempenho.py                                   # escalas padrão, todas as etapas
+    python desempenho.py --escalas 1000 100000 1000000 --meses 48
+    python desempenho.py --etapas prepare_engineer run_models --salvar-linha-base
+"""
+from __future__ import annotations
+import argparse
+import ast
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import shutil
+import subprocess
+import sys
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+import carregamento
+import gerar_dados_sinteticos as sinteticos
+import memoria
+import pacote_dados
+
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+DIRETORIO = Path(__file__).parent
+DIRETORIO_DADOS = DIRETORIO / "cache" / "benchmark"
+ARQUIVO_HISTORICO = DIRETORIO / "benchmarks" / "historico.jsonl"
+ARQUIVO_LINHA_BASE = DIRETORIO / "benchmarks" / "linha_base.json"
+ESCALAS_PADRAO = (1_000, 100_000)
+MESES_PADRAO = 48
+TOLERANCIA_PADRAO = 0.25   # 25% acima da linha de base = regressão
+FOLGA_SEGUNDOS = 0.05      # diferenças menores que isso são ruído de medição
+
+# etapa -> (arquivo de entrada, arquivo de saída) dentro do diretório de trabalho da escala
+ETAPAS = {
+    'load_data':                ('dados.csv', 'bruto.pkl'),
+    'prepare_engineer':         ('bruto.pkl', 'painel.pkl'),
+    'run_models':               ('painel.pkl', None),
+    'tratar_dados':             ('bruto.pkl', 'tratado.pkl'),
+    'construir_cubo':           ('tratado.pkl', 'cubo.pkl'),
+    'salvar_agregados':         ('cubo.pkl', 'app_data'),
+    'carregar_dados_agregados': ('app_data', None),
+}
+
+
+# ------------------------------
+# Código do notebook e do app
+# ------------------------------
+def carregar_notebook(caminho=DIRETORIO / "dados.ipynb") -> dict:
+    """
+    Executa as células de código do notebook num namespace próprio (sem rodar `main`)
+    e devolve as funções e configurações. A instalação de dependências é pulada.
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        celulas = json.load(f)['cells']
+    fonte = "\n".join(''.join(c['source']) for c in celulas if c['cell_type'] == 'code')
+    fonte = "\n".join(l for l in fonte.splitlines() if not l.strip().startswith('deps.ensure'))
+    namespace = {'__name__': 'dados_notebook', '__file__': str(caminho)}
+    exec(compile(fonte, str(caminho), 'exec'), namespace)
+    return namespace
+
+
+def funcao_do_app(nome: str, diretorio_app_data, caminho=DIRETORIO / "app.py"):
+    """
+    Função de nível superior do `app.py`, compilada sem os decoradores do Streamlit e com
+    `__file__` apontando para `diretorio_app_data/..` (importar o app executaria a página inteira).
+    """
+    with open(caminho, 'r', encoding='utf-8') as f:
+        arvore = ast.parse(f.read(), filename=str(caminho))
+    definicao = next(n for n in arvore.body if isinstance(n, ast.FunctionDef) and n.name == nome)
+    definicao.decorator_list = []
+    modulo = ast.Module(body=[definicao], type_ignores=[])
+    namespace = {'pd': pd, 'Path': Path, 'st': None, 'pacote_dados': pacote_dados,
+                 '__file__': str(Path(diretorio_app_data).parent / "app.py")}
+    exec(compile(modulo, str(caminho), 'exec'), namespace)
+    return namespace[nome]
+
+
+# ------------------------------
+# Execução de uma etapa (processo filho)
+# ------------------------------
+def _ler(caminho: Path):
+    with open(caminho, 'rb') as f:
+        return pickle.load(f)
+
+
+def _gravar(obj, caminho: Path) -> None:
+    with open(caminho, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _rss_atual() -> Optional[int]:
+    return psutil.Process().memory_info().rss if psutil is not None else None
+
+
+def _executar_etapa(etapa: str, trabalho: str) -> dict:
+    """Roda uma etapa num processo novo; só a chamada da etapa entra no tempo medido."""
+    os.environ.setdefault('MPLBACKEND', 'Agg')  # figuras do run_models sem janela
+    warnings.filterwarnings('ignore')
+    import preparar_dados_app as app_prep
+    trabalho = Path(trabalho)
+    entrada, saida = ETAPAS[etapa]
+    silencio = io.StringIO()
+
+    with contextlib.redirect_stdout(silencio):
+        if etapa in ('load_data', 'prepare_engineer', 'run_models'):
+            nb = carregar_notebook()
+            nb['RESULTS_DIR'] = str(trabalho / "resultados")
+            os.makedirs(nb['RESULTS_DIR'], exist_ok=True)
+        if etapa == 'load_data':
+            # CSV sintético: leitura em blocos (o caminho sas7bdat inteiro não lê CSV)
+            tarefa = lambda: nb['load_data'](str(trabalho / entrada), tamanho_bloco=carregamento.TAMANHO_BLOCO_PADRAO)
+            linhas = None
+        elif etapa == 'carregar_dados_agregados':
+            tarefa = funcao_do_app('carregar_dados_agregados', trabalho / entrada)
+            linhas = None
+        elif etapa == 'salvar_agregados':
+            cubo, clientes, dist_diver = _ler(trabalho / entrada)
+            app_prep.PASTA_SAIDA_APP = trabalho / saida
+            os.makedirs(app_prep.PASTA_SAIDA_APP, exist_ok=True)
+            tarefa = lambda: app_prep.salvar_agregados(cubo, clientes, dist_diver)
+            linhas = len(cubo)
+        else:
+            dados = _ler(trabalho / entrada)
+            linhas = len(dados)
+            if etapa == 'prepare_engineer':
+                tarefa = lambda: nb['prepare_engineer'](dados)
+            elif etapa == 'run_models':
+                tarefa = lambda: nb['run_models'](dados)
+            elif etapa == 'tratar_dados':
+                tarefa = lambda: app_prep.tratar_dados(dados, verbose=False)
+            else:  # construir_cubo
+                tarefa = lambda: app_prep.construir_cubo(dados) + (app_prep.histograma_diver(dados['diver']),)
+
+        antes = _rss_atual()
+        inicio = time.perf_counter()
+        resultado = tarefa()
+        segundos = time.perf_counter() - inicio
+        pico = memoria.pico_processo()
+
+    if etapa == 'load_data':
+        linhas = len(resultado)
+    if saida is not None and etapa != 'salvar_agregados':
+        _gravar(resultado, trabalho / saida)
+    return {
+        'segundos': segundos,
+        'mb_pico': None if pico is None else pico / 2**20,
+        'mb_antes': None if antes is None else antes / 2**20,
+        'linhas': linhas,
+        'linhas_por_segundo': None if not linhas else linhas / segundos,
+    }
+
+
+# ------------------------------
+# Rodada completa
+# ------------------------------
+def preparar_base(clientes: int, meses: int, semente: int = sinteticos.SEMENTE) -> Path:
+    """Base sintética da escala (gerada uma vez e reaproveitada nas rodadas seguintes)."""
+    trabalho = DIRETORIO_DADOS / f"c{clientes}_m{meses}_s{semente}"
+    csv = trabalho / ETAPAS['load_data'][0]
+    if not csv.exists():
+        os.makedirs(trabalho, exist_ok=True)
+        fim = (pd.Timestamp(sinteticos.DATA_INICIO) + pd.DateOffset(months=meses - 1)).strftime('%Y-%m-%d')
+        param = sinteticos.ParametrosSimulacao(clientes=clientes, data_fim=fim, semente=semente)
+        with contextlib.redirect_stdout(io.StringIO()):
+            sinteticos.gerar(param, str(csv), formato='csv', n_processos=min(4, os.cpu_count() or 1))
+    return trabalho
+
+
+def _dependencias(etapas: List[str]) -> List[str]:
+    """Etapas pedidas mais as que produzem suas entradas, na ordem do fluxo."""
+    produtor = {saida: e for e, (_, saida) in ETAPAS.items() if saida is not None}
+    necessarias = set()
+    pendentes = list(etapas)
+    while pendentes:
+        e = pendentes.pop()
+        if e in necessarias:
+            continue
+        necessarias.add(e)
+        if ETAPAS[e][0] in produtor:
+            pendentes.append(produtor[ETAPAS[e][0]])
+    return [e for e in ETAPAS if e in necessarias]
+
+
+def _versao_codigo() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRETORIO, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def rodar(escalas=ESCALAS_PADRAO, meses: int = MESES_PADRAO, etapas: Optional[List[str]] = None,
+          repeticoes: int = 1) -> pd.DataFrame:
+    """Mede as etapas em cada escala; etapas não pedidas rodam só para produzir entradas."""
+    pedidas = list(etapas or ETAPAS)
+    contexto = {'data': datetime.now().isoformat(timespec='seconds'), 'commit': _versao_codigo(),
+                'maquina': platform.node(), 'python': platform.python_version(), 'pandas': pd.__version__,
+                'numpy': np.__version__, 'cpus': os.cpu_count()}
+    medicoes = []
+    for clientes in escalas:
+        trabalho = preparar_base(clientes, meses)
+        for etapa in _dependencias(pedidas):
+            vezes = repeticoes if etapa in pedidas else 1
+            resultados = []
+            for _ in range(vezes):
+                # processo novo por execução: o pico de RSS é o da etapa, não o das anteriores
+                with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                    resultados.append(executor.submit(_executar_etapa, etapa, str(trabalho)).result())
+            if etapa not in pedidas:
+                continue
+            melhor = min(resultados, key=lambda r: r['segundos'])  # menor tempo = menos ruído externo
+            medicoes.append({**contexto, 'clientes': clientes, 'meses': meses, 'etapa': etapa,
+                             'repeticoes': vezes, **melhor})
+            print(f"  {clientes:>10,} clientes  {etapa:<26} {melhor['segundos']:9.2f} s  "
+                  f"pico {melhor['mb_pico'] or float('nan'):9.1f} MB")
+    return pd.DataFrame(medicoes)
+
+
+# ------------------------------
+# Histórico e linha de base
+# ------------------------------
+def salvar_historico(medicoes: pd.DataFrame, caminho=ARQUIVO_HISTORICO) -> None:
+    os.makedirs(Path(caminho).parent, exist_ok=True)
+    with open(caminho, 'a', encoding='utf-8') as f:
+        for registro in medicoes.to_dict(orient='records'):
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + "\n")
+
+
+def ler_historico(caminho=ARQUIVO_HISTORICO) -> pd.DataFrame:
+    if not Path(caminho).exists():
+        return pd.DataFrame()
+    return pd.read_json(caminho, lines=True)
+
+
+def salvar_linha_base(medicoes: pd.DataFrame, caminho=ARQUIVO_LINHA_BASE) -> None:
+    """Grava (ou atualiza) a linha de base com as medições da rodada, por (clientes, meses, etapa)."""
+    base = {}
+    if Path(caminho).exists():
+        with open(caminho, 'r', encoding='utf-8') as f:
+            base = json.load(f)
+    for r in medicoes.to_dict(orient='records'):
+        base[f"{r['clientes']}|{r['meses']}|{r['etapa']}"] = {
+            'segundos': r['segundos'], 'mb_pico': r['mb_pico'], 'commit': r['commit'], 'data': r['data']}
+    os.makedirs(Path(caminho).parent, exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(base, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def comparar(medicoes: pd.DataFrame, caminho=ARQUIVO_LINHA_BASE,
+             tolerancia: float = TOLERANCIA_PADRAO) -> pd.DataFrame:
+    """Razão medição / linha de base de tempo e pico, com `regressao` quando passa da tolerância."""
+    if not Path(caminho).exists():
+        return pd.DataFrame()
+    with open(caminho, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    linhas = []
+    for r in medicoes.to_dict(orient='records'):
+        ref = base.get(f"{r['clientes']}|{r['meses']}|{r['etapa']}")
+        if ref is None:
+            continue
+        razao_tempo = r['segundos'] / ref['segundos'] if ref['segundos'] else np.nan
+        razao_pico = r['mb_pico'] / ref['mb_pico'] if r['mb_pico'] and ref['mb_pico'] else np.nan
+        mais_lento = razao_tempo > 1 + tolerancia and r['segundos'] - ref['segundos'] > FOLGA_SEGUNDOS
+        linhas.append({'clientes': r['clientes'], 'etapa': r['etapa'], 'segundos': r['segundos'],
+                       'segundos_base': ref['segundos'], 'razao_tempo': razao_tempo, 'razao_pico': razao_pico,
+                       'regressao': bool(mais_lento or razao_pico > 1 + tolerancia)})
+    return pd.DataFrame(linhas)
+
+
+def _argumentos(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmark das etapas do notebook e do pré-processamento do app.")
+    p.add_argument('--escalas', type=int, nargs='+', default=list(ESCALAS_PADRAO), help="números de clientes")
+    p.add_argument('--meses', type=int, default=MESES_PADRAO)
+    p.add_argument('--etapas', nargs='+', choices=list(ETAPAS), default=None)
+    p.add_argument('--repeticoes', type=int, default=1, help="execuções por etapa (vale a mais rápida)")
+    p.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO)
+    p.add_argument('--salvar-linha-base', action='store_true', help="grava esta rodada como linha de base")
+    p.add_argument('--limpar', action='store_true', help="apaga as bases sintéticas e entradas intermediárias")
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _argumentos(argv)
+    if args.limpar:
+        shutil.rmtree(DIRETORIO_DADOS, ignore_errors=True)
+    print(f"Benchmark: escalas {args.escalas} x {args.meses} meses")
+    medicoes = rodar(args.escalas, args.meses, args.etapas, args.repeticoes)
+    salvar_historico(medicoes)
+    print(f"Histórico: {ARQUIVO_HISTORICO}")
+
+    comparacao = comparar(medicoes, tolerancia=args.tolerancia)
+    if args.salvar_linha_base:
+        salvar_linha_base(medicoes)
+        print(f"Linha de base gravada em: {ARQUIVO_LINHA_BASE}")
+    if comparacao.empty:
+        print("Sem linha de base para comparar (use --salvar-linha-base).")
+        return 0
+    print(comparacao.to_string(index=False, float_format=lambda v: f"{v:,.2f}"))
+    regressoes = comparacao[comparacao['regressao']]
+    for r in regressoes.to_dict(orient='records'):
+        print(f"[REGRESSAO] {r['etapa']} com {r['clientes']:,} clientes: "
+              f"{r['razao_tempo']:.2f}x o tempo e {r['razao_pico']:.2f}x o pico da linha de base")
+    return 1 if len(regressoes) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
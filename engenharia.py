@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+engenharia.py
+-------------
+Motor único das variáveis derivadas da base bruta, compartilhado pelo notebook
+(`prepare_engineer`) e pelo `preparar_dados_app.py` (`tratar_dados`).
+
+As duas rotinas refaziam as mesmas contas sobre o mesmo arquivo, em execuções separadas,
+e já divergiam nos detalhes: a idade do notebook era calculada na data de hoje (o painel
+mudava de um dia para o outro) e a do app em 01/01/2025; a região saía de cinco `isin`
+num lado e de um `np.select` no outro; os rótulos de perfil e ocupação eram escritos em
+dois lugares; as constantes regionais eram gravadas com cinco `.loc` mascarados por
+variável. Aqui ficam:
+
+* as tabelas de consulta, declaradas uma vez e indexadas por código: UF -> código da
+  região (0 = não identificada) -> nome, rótulo do app e constantes regionais; código do
+  perfil -> nome e rótulo. Cada coluna sai de um `take` sobre os códigos, e as UFs são
+  consultadas uma vez por valor distinto (ou pelos códigos, se a coluna for category);
+* as funções vetorizadas de cada derivação (clientes, idade, exterior, região, perfil,
+  ocupação, `soma_complex`/`soma_total`/`diver`/`complex`), usadas pelos dois lados;
+* `visao_app`, que monta as colunas do cubo do app a partir das variáveis já derivadas.
+  O notebook, com `AGREGADOS_APP = True`, gera o pacote do app no mesmo tratamento do
+  painel: a base é lida e tratada uma vez só e os dois produtos concordam por construção.
+
+Uso:
+    import engenharia
+    base = engenharia.derivar(bruto)                   # variáveis comuns (nomes do notebook)
+    cubo, clientes = app_prep.construir_cubo(engenharia.visao_app(base))
+"""
+from __future__ import annotations
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+import ocupacoes
+
+# Idade em anos completos nesta data (fixa: o painel não muda com o dia em que é montado)
+DATA_REFERENCIA_IDADE = pd.Timestamp('2025-01-01')
+
+# Região por código (0 = UF fora das listas): nome do notebook, rótulo do app e médias regionais
+REGIOES = pd.DataFrame({
+    'nome': ['nao_identificada', 'norte', 'nordeste', 'sudeste', 'sul', 'centro_oeste'],
+    'rotulo': ['Não Identificada', 'Norte', 'Nordeste', 'Sudeste', 'Sul', 'Centro-Oeste'],
+    'escolaridade_regiao': [np.nan, 9.2, 8.3, 10.0, 10.1, 10.1],
+    'renda_regional': [np.nan, 2421.7, 2078.0, 3514.0, 3423.7, 3604.0],
+    'idh_regional': [np.nan, 0.6847, 0.6487, 0.7537, 0.7563, 0.7533],
+    'pib_percapita_regional': [np.nan, 33123, 25401, 63327, 55942, 65651],
+}, index=pd.RangeIndex(6, name='regiao_codigo'))
+VARIAVEIS_REGIONAIS = ['escolaridade_regiao', 'renda_regional', 'idh_regional', 'pib_percapita_regional']
+UFS_REGIAO = {
+    'norte': ["AC", "AP", "AM", "PA", "RO", "RR", "TO"],
+    'nordeste': ["AL", "BA", "CE", "MA", "PB", "PE", "PI", "RN", "SE"],
+    'sudeste': ["ES", "MG", "RJ", "SP"],
+    'sul': ["PR", "RS", "SC"],
+    'centro_oeste': ["DF", "GO", "MT", "MS"],
+}
+CODIGO_UF = {uf: int(REGIOES.index[REGIOES['nome'] == regiao][0])
+             for regiao, ufs in UFS_REGIAO.items() for uf in ufs}
+
+# Perfil do investidor por código (CD_PRFL_API, com 0 e ausente = 5)
+PERFIS = pd.DataFrame({
+    'nome': ['conservador', 'moderado', 'arrojado', 'agressivo', 'nao_resp'],
+    'rotulo': ['Conservador', 'Moderado', 'Arrojado', 'Agressivo', 'Não Respondeu'],
+}, index=pd.Index([1, 2, 3, 4, 5], name='prfl_codigo'))
+NAO_INFORMADO = 'Não Informado'  # rótulo do app quando a base não traz a coluna de origem
+
+COLUNAS_EXTERIOR = ['INVEST_EXT_RENDA_VARIAVEL', 'INVEST_NO_EXTERIOR', 'INVEST_EXTERIOR', 'INVEST_EXT_RENDA_FIXA']
+COLUNAS_COMPLEXOS = ['MULTIMERCADOS', 'RENDA_VARIAVEL', 'INVEST_ALTERNATIVOS', 'investimento_exterior']
+COLUNAS_TOTAL = ['RENDA_FIXA_POS_CDI', 'RENDA_FIXA_PRE', 'RENDA_FIXA_INFLACAO'] + COLUNAS_COMPLEXOS
+LIMITE_FAIXA_RENDA = 20000
+
+
+# ------------------------------
+# Consultas por código
+# ------------------------------
+def rotular(codigos, rotulos: pd.Series) -> np.ndarray:
+    """Rótulo de cada código por `take` na tabela `rotulos` (índice = código); códigos fora dela ficam NaN."""
+    tabela = np.full(int(rotulos.index.max()) + 2, np.nan, dtype=object)
+    tabela[rotulos.index.to_numpy()] = rotulos.to_numpy()
+    codigos = np.asarray(codigos, dtype=np.int64)
+    fora = (codigos < 0) | (codigos >= len(tabela) - 1)
+    return tabela.take(np.where(fora, len(tabela) - 1, codigos))  # última posição = NaN
+
+
+def codigo_regiao(uf: pd.Series) -> np.ndarray:
+    """Código da região (int8, 0 = não identificada) de cada linha, consultando cada UF distinta uma vez."""
+    if isinstance(uf.dtype, pd.CategoricalDtype):
+        codigos, distintos = uf.cat.codes.to_numpy(), uf.cat.categories
+    else:
+        codigos, distintos = pd.factorize(uf)
+    tabela = np.array([CODIGO_UF.get(v, 0) for v in distintos] + [0], dtype=np.int8)
+    return tabela.take(codigos)  # -1 (nulo) indexa a última posição
+
+
+def constantes_regionais(codigos, variaveis: Sequence[str] = VARIAVEIS_REGIONAIS) -> Dict[str, np.ndarray]:
+    """Médias regionais de cada linha a partir do código da região."""
+    codigos = np.asarray(codigos, dtype=np.int64)
+    return {v: REGIOES[v].to_numpy(dtype=np.float64).take(codigos) for v in variaveis}
+
+
+def codigo_perfil(cd_prfl: pd.Series) -> np.ndarray:
+    """Código do perfil (1 a 5) a partir de CD_PRFL_API; 0 e ausente viram 5 (não respondeu)."""
+    return cd_prfl.replace(0, 5).fillna(5).astype(int).to_numpy()
+
+
+def ocupacao_app(grupos: pd.Series) -> pd.Series:
+    """Grupos de ocupação do notebook com os rótulos do app (categorias em ordem alfabética, como no `classificar`)."""
+    rotulos = grupos.cat.rename_categories(lambda c: ocupacoes.ROTULOS_APP.get(c, c))
+    return rotulos.cat.reorder_categories(sorted(rotulos.cat.categories))
+
+
+# ------------------------------
+# Derivações
+# ------------------------------
+def filtrar_clientes(df: pd.DataFrame) -> pd.DataFrame:
+    """Sem linhas de cliente ausente ou vazio, com `id_cliente` (0..n-1 na ordem dos identificadores)."""
+    if 'cliente' not in df.columns:
+        raise KeyError("Coluna 'cliente' não encontrada.")
+    df = df.dropna(subset=['cliente'])
+    df = df[df['cliente'] != '']
+    df['id_cliente'] = df.groupby('cliente').ngroup()
+    return df
+
+
+def idade(nascimento: pd.Series) -> pd.Series:
+    """Idade em anos (fracionária) na DATA_REFERENCIA_IDADE."""
+    return (DATA_REFERENCIA_IDADE - pd.to_datetime(nascimento)).dt.days / 365.25
+
+
+def soma_colunas(df: pd.DataFrame, colunas: Sequence[str]):
+    """Soma por linha das colunas presentes (ausentes contam zero); 0.0 se nenhuma estiver na base."""
+    presentes = [c for c in colunas if c in df.columns]
+    return df[presentes].sum(axis=1, skipna=True) if presentes else 0.0
+
+
+def diversificacao(soma_complex: pd.Series, soma_total: pd.Series) -> pd.Series:
+    """Participação dos complexos no total, limitada a 1; total zero (divisão infinita ou 0/0) vira 0."""
+    return (soma_complex / soma_total).replace([np.inf, -np.inf], np.nan).fillna(0.0).clip(upper=1.0)
+
+
+def faixa_renda(renda: pd.Series) -> pd.Categorical:
+    """Faixa de renda do app (abaixo ou a partir de LIMITE_FAIXA_RENDA)."""
+    return pd.cut(renda, bins=[0, LIMITE_FAIXA_RENDA, np.inf], labels=['Até 20k', 'Acima de 20k'], right=False)
+
+
+def derivar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Variáveis comuns ao painel e ao app, com os nomes do notebook: `id_cliente`,
+    `idade_int`, `investimento_exterior`, `regiao_codigo`, `prfl_codigo` e
+    `grupo_ocupacao` (se a base trouxer as colunas de origem), `soma_complex`,
+    `soma_total`, `diver` e `complex`.
+    """
+    df = filtrar_clientes(df)
+    if 'DT_NASCIMENTO' in df.columns:
+        df['DT_NASCIMENTO'] = pd.to_datetime(df['DT_NASCIMENTO'])
+        df['idade_int'] = idade(df['DT_NASCIMENTO']).astype(int)
+    else:
+        df['idade_int'] = np.nan
+    df['investimento_exterior'] = soma_colunas(df, COLUNAS_EXTERIOR)
+    df['regiao_codigo'] = codigo_regiao(df['UF_CADASTRO']) if 'UF_CADASTRO' in df.columns else 0
+    if 'CD_PRFL_API' in df.columns:
+        df['prfl_codigo'] = codigo_perfil(df['CD_PRFL_API'])
+    if 'DS_OCUPACAO' in df.columns:
+        df['grupo_ocupacao'] = ocupacoes.classificar(df['DS_OCUPACAO'], ocupacoes.OCUP_MAP)
+    df['soma_complex'] = soma_colunas(df, COLUNAS_COMPLEXOS)
+    df['soma_total'] = soma_colunas(df, COLUNAS_TOTAL)
+    df['diver'] = diversificacao(df['soma_complex'], df['soma_total'])
+    df['complex'] = (df['soma_complex'] > 0).astype(int)
+    return df
+
+
+def visao_app(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Colunas do cubo do app (dimensões com os rótulos exibidos, métricas e clientes) a
+    partir das variáveis derivadas, pelo `derivar` ou pelo `prepare_engineer` antes do
+    índice do painel (`anomes` ainda AAAAMM).
+    """
+    base = pd.DataFrame({'cliente': df['cliente'], 'id_cliente': df['id_cliente'], 'UF_CADASTRO': df['UF_CADASTRO']},
+                        index=df.index)
+    base['regiao'] = rotular(df['regiao_codigo'].to_numpy(), REGIOES['rotulo'])
+    base['perfil_grupo'] = rotular(df['prfl_codigo'].to_numpy(), PERFIS['rotulo']) \
+        if 'prfl_codigo' in df.columns else NAO_INFORMADO
+    base['grupo_ocupacao'] = ocupacao_app(df['grupo_ocupacao']) if 'DS_OCUPACAO' in df.columns else NAO_INFORMADO
+    base['faixa_renda'] = faixa_renda(df['renda'])
+    base['complex'] = df['complex'].astype(np.int64)
+    base['anomes'] = pd.to_datetime(df['anomes'].astype(int).astype(str), format='%Y%m')
+    for metrica in ('diver', 'renda', 'idade_int'):
+        base[metrica] = df[metrica]
+    return base
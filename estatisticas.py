@@ -0,0 +1,483 @@
+# -*- coding: utf-8 -*-
+"""
+estatisticas.py
+---------------
+Núcleos estatísticos vetorizados usados na engenharia de variáveis do notebook.
+
+Momentos por grupo: em vez de um `groupby(...).transform` por estatística (cada um
+alocando uma coluna do tamanho da base), os grupos viram códigos inteiros uma vez,
+as somas saem de `np.bincount` (contagem, média, M2 e M3 em duas varreduras: somas e
+desvios centrados) e os valores voltam para as linhas por indexação inteira.
+
+Winsorização: várias colunas de uma vez, com os pontos de corte tirados por seleção
+parcial (`np.partition`, sem ordenar a coluna inteira) e corte no próprio array. Os
+cortes são os mesmos de `scipy.stats.mstats.winsorize` (limites inclusivos, NaN
+ignorado), então o resultado é idêntico bit a bit; opcionalmente, por grupo.
+
+Resumo de colunas (`ResumoColunas`): contagem, média, desvio, mínimo, máximo, quantis e
+covariância/correlação de várias colunas numa só passada por blocos. Os momentos de cada
+bloco são fundidos aos acumulados pelas fórmulas de Chan et al. (estáveis, sem somas de
+quadrados brutas) e os quantis vêm de um esboço KLL mesclável (`EsbocoQuantis`, exato até
+`K_QUANTIS` valores, com erro de posto da ordem de 1/`K_QUANTIS` depois). Resumos de
+processos diferentes se mesclam, então um arquivo Parquet pode ser resumido por grupos de
+linhas em paralelo (`resumir_parquet`) sem ser carregado inteiro.
+
+Uso:
+    import estatisticas
+    codigos, n_grupos = estatisticas.codificar_grupos(regiao, ano)
+    m = estatisticas.momentos_agrupados(valores, codigos, n_grupos)
+    desvio_por_linha = m.desvio_padrao()[codigos]
+    estatisticas.winsorizar(matriz)  # corta as colunas de `matriz` em 1%/1%
+    resumo = estatisticas.resumir_blocos(blocos, colunas)   # ou resumir_parquet(caminho, colunas, n_processos=4)
+    resumo.descrever(); resumo.correlacao()
+"""
+from __future__ import annotations
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def codificar_grupos(*chaves) -> Tuple[np.ndarray, int]:
+    """
+    Código inteiro (0..G-1) da combinação das chaves, na ordem de primeira aparição. Chave
+    ausente (NaN/None) é um valor como os outros: as linhas com ela formam um grupo próprio,
+    com uma ou várias chaves.
+    """
+    if len(chaves) == 1:
+        codigos, uniques = pd.factorize(np.asarray(chaves[0]), use_na_sentinel=False)
+        return codigos.astype(np.int64), len(uniques)
+    combinado = np.zeros(len(chaves[0]), dtype=np.int64)
+    for chave in chaves:
+        codigos, uniques = pd.factorize(np.asarray(chave), use_na_sentinel=False)
+        combinado = combinado * len(uniques) + codigos
+    codigos, uniques = pd.factorize(combinado)
+    return codigos.astype(np.int64), len(uniques)
+
+
+class Momentos(NamedTuple):
+    """Contagem (sem NaN), média e somas centradas de 2ª e 3ª ordem por grupo."""
+    n: np.ndarray
+    media: np.ndarray
+    m2: np.ndarray
+    m3: np.ndarray
+
+    def desvio_padrao(self, ddof: int = 1) -> np.ndarray:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self.n > ddof, np.sqrt(self.m2 / (self.n - ddof)), np.nan)
+
+    def assimetria(self, ddof: int = 1) -> np.ndarray:
+        """Média dos desvios padronizados ao cubo (padronizados pelo desvio com `ddof`)."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.m3 / self.n / self.desvio_padrao(ddof) ** 3
+
+
+def momentos_agrupados(valores, codigos: np.ndarray, n_grupos: int, ordem: int = 3) -> Momentos:
+    """Momentos por grupo ignorando NaN (grupos vazios ficam com média NaN)."""
+    valores = np.asarray(valores, dtype=np.float64)
+    validos = ~np.isnan(valores)
+    cod = codigos[validos]
+    x = valores[validos]
+    n = np.bincount(cod, minlength=n_grupos).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media = np.bincount(cod, weights=x, minlength=n_grupos) / n
+    m2 = m3 = np.full(n_grupos, np.nan)
+    if ordem >= 2:
+        d = x - media[cod]
+        d2 = d * d
+        m2 = np.bincount(cod, weights=d2, minlength=n_grupos)
+        if ordem >= 3:
+            m3 = np.bincount(cod, weights=d2 * d, minlength=n_grupos)
+    return Momentos(n, media, m2, m3)
+
+
+def diferenca_agrupada(valores, codigos: np.ndarray) -> np.ndarray:
+    """`groupby(codigos).diff()`: diferença para a linha anterior do mesmo grupo (NaN na primeira)."""
+    valores = np.asarray(valores, dtype=np.float64)
+    ordem = None
+    if np.any(codigos[1:] < codigos[:-1]):
+        ordem = np.argsort(codigos, kind='stable')  # preserva a ordem das linhas dentro do grupo
+        valores, codigos = valores[ordem], codigos[ordem]
+    saida = np.empty_like(valores)
+    saida[0:1] = np.nan
+    saida[1:] = valores[1:] - valores[:-1]
+    saida[1:][codigos[1:] != codigos[:-1]] = np.nan
+    if ordem is not None:
+        desfeita = np.empty_like(saida)
+        desfeita[ordem] = saida
+        saida = desfeita
+    return saida
+
+
+def proxy_assimetria(log_renda, cliente, ano, regiao, ano_corte: int = 2021,
+                     n_minimo: int = 30) -> Dict[str, np.ndarray]:
+    """
+    Proxy de assimetria da renda (bloco `skew_proxy` do `prepare_engineer`):
+    variação mensal da log-renda por cliente, média anual por cliente, padronização
+    e assimetria por (região, ano), descartada em grupos com menos de `n_minimo`
+    observações e substituída pela média regional dos anos posteriores a `ano_corte`.
+    Retorna as colunas intermediárias e finais, na ordem em que o notebook as criava.
+    """
+    cod_cliente, _ = codificar_grupos(cliente)
+    delta_y = diferenca_agrupada(log_renda, cod_cliente)
+    return {'delta_y': delta_y, **proxy_assimetria_de_delta(delta_y, cod_cliente, ano, regiao, ano_corte, n_minimo)}
+
+
+def proxy_assimetria_de_delta(delta_y, cliente, ano, regiao, ano_corte: int = 2021,
+                              n_minimo: int = 30) -> Dict[str, np.ndarray]:
+    """
+    Parte de `proxy_assimetria` que parte da variação mensal `delta_y` já calculada
+    (usada na atualização incremental, que guarda `delta_y` por linha).
+    """
+    ano = np.asarray(ano)
+    regiao = np.asarray(regiao)
+    cod_cliente, _ = codificar_grupos(cliente)
+
+    # média anual por cliente (NaN só se o cliente não tem variação no ano)
+    cod_ca, n_ca = codificar_grupos(cod_cliente, ano)
+    delta_y_anual = momentos_agrupados(delta_y, cod_ca, n_ca, ordem=1).media[cod_ca]
+
+    # média, desvio e assimetria por (região, ano) numa única estrutura de momentos
+    cod_ra, n_ra = codificar_grupos(regiao, ano)
+    m = momentos_agrupados(delta_y_anual, cod_ra, n_ra)
+    media = m.media
+    desvio = m.desvio_padrao()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        delta_y_pad = (delta_y_anual - media[cod_ra]) / desvio[cod_ra]
+    # contagem de padronizados válidos: todas as observações do grupo, ou nenhuma se o desvio é 0/NaN
+    grupo_n = np.where(np.isfinite(desvio) & (desvio > 0), m.n, 0).astype(np.int64)
+    skew = m.assimetria()
+    skew[grupo_n < n_minimo] = np.nan
+
+    # média regional (ponderada pelas linhas) das assimetrias dos anos após o corte
+    linhas_ra = np.bincount(cod_ra, minlength=n_ra).astype(np.float64)
+    reg_do_grupo = np.empty(n_ra, dtype=regiao.dtype)
+    reg_do_grupo[cod_ra] = regiao
+    ano_do_grupo = np.empty(n_ra, dtype=ano.dtype)
+    ano_do_grupo[cod_ra] = ano
+    skew_final_grupo = np.where(ano_do_grupo > ano_corte, skew, np.nan)
+    cod_r, n_r = codificar_grupos(reg_do_grupo)
+    usar = ~np.isnan(skew_final_grupo)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_regional = (np.bincount(cod_r[usar], weights=(skew_final_grupo * linhas_ra)[usar], minlength=n_r)
+                          / np.bincount(cod_r[usar], weights=linhas_ra[usar], minlength=n_r))
+    skew_media_regional = media_regional[cod_r]
+
+    skew_linha = skew[cod_ra]
+    return {
+        'delta_y_anual': delta_y_anual,
+        'media_dy': media[cod_ra],
+        'sd_dy': desvio[cod_ra],
+        'delta_y_pad': delta_y_pad,
+        'skew_aux': delta_y_pad ** 3,
+        'grupo_n': grupo_n[cod_ra],
+        'skew': skew_linha,
+        'skew_final': skew_final_grupo[cod_ra],
+        'skew_media_regional': skew_media_regional[cod_ra],
+        'skew_proxy': np.where(np.isnan(skew_linha), skew_media_regional[cod_ra], skew_linha),
+    }
+
+
+def posicoes_winsor(n: int, limites) -> Tuple[int, int]:
+    """
+    Posições (na ordem crescente dos n valores não nulos) dos cortes de `mstats.winsorize`:
+    `int(limite * n)` e `n - int(limite * n) - 1`.
+    """
+    inferior, superior = limites
+    baixo = int(inferior * n) if inferior else 0
+    alto = n - 1 if superior is None else n - int(n * superior) - 1
+    return baixo, alto
+
+
+def _cortes_winsor(matriz: np.ndarray, limites) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Valores de corte (inferior, superior) por coluna nas `posicoes_winsor` dos valores
+    não nulos, obtidos por seleção parcial (só as duas posições ficam no lugar).
+    """
+    k = matriz.shape[1]
+    corte_baixo = np.full(k, np.nan)
+    corte_alto = np.full(k, np.nan)
+    for j in range(k):
+        coluna = matriz[:, j]
+        validos = coluna[~np.isnan(coluna)]  # cópia contígua, reordenada no lugar abaixo
+        n = len(validos)
+        if n == 0:
+            continue
+        baixo, alto = posicoes_winsor(n, limites)
+        validos.partition([baixo, alto] if baixo < alto else [baixo])
+        corte_baixo[j] = validos[baixo]
+        corte_alto[j] = validos[alto]
+    return corte_baixo, corte_alto
+
+
+def winsorizar(matriz: np.ndarray, limites=(0.01, 0.01), codigos: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Winsoriza, no próprio array, cada coluna de `matriz` (float64, n x k ou vetor), ignorando
+    NaN. Com `codigos` (ex.: de `codificar_grupos(ano)`), os cortes são calculados dentro de
+    cada grupo. `limites` segue `mstats.winsorize` (fração cortada em cada cauda; None = sem corte).
+    """
+    vetor = matriz.ndim == 1
+    m = matriz.reshape(-1, 1) if vetor else matriz
+    if codigos is None:
+        baixo, alto = _cortes_winsor(m, limites)
+        np.clip(m, baixo, alto, out=m)
+        return matriz
+    codigos = np.asarray(codigos)
+    ordem = np.argsort(codigos, kind='stable')
+    fronteiras = np.flatnonzero(np.diff(codigos[ordem])) + 1
+    for linhas in np.split(ordem, fronteiras):
+        bloco = m[linhas]
+        baixo, alto = _cortes_winsor(bloco, limites)
+        m[linhas] = np.clip(bloco, baixo, alto, out=bloco)
+    return matriz
+
+
+# ------------------------------
+# Resumo de colunas em uma passada (descritivas e correlação)
+# ------------------------------
+K_QUANTIS = 1000        # capacidade do nível mais alto do esboço de quantis (erro de posto ~ 1/K)
+LINHAS_BLOCO = 250_000  # linhas por bloco ao resumir um quadro em memória
+
+
+class EsbocoQuantis:
+    """
+    Esboço KLL de quantis, mesclável. Os valores entram no nível 0 (peso 1); quando um
+    nível passa da capacidade, é ordenado e metade dos itens (os de posição par ou ímpar,
+    sorteada) sobe para o nível seguinte com o dobro do peso. O peso total é sempre o número
+    de valores; enquanto nada foi compactado (até `k` valores) os quantis são exatos.
+    """
+
+    def __init__(self, k: int = K_QUANTIS, semente: int = 0):
+        self.k = k
+        self.n = 0
+        self.niveis = [np.empty(0)]
+        self._rng = np.random.default_rng(semente)
+
+    def _capacidade(self, nivel: int) -> int:
+        return max(2, int(np.ceil(self.k * (2 / 3) ** (len(self.niveis) - 1 - nivel))))
+
+    def _compactar(self) -> None:
+        while True:
+            cheios = [h for h, itens in enumerate(self.niveis) if len(itens) > self._capacidade(h)]
+            if not cheios:
+                return
+            h = cheios[0]
+            if h + 1 == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            itens = np.sort(self.niveis[h])
+            sobra = len(itens) % 2  # com número ímpar de itens, o menor fica no nível
+            inicio = sobra + int(self._rng.integers(2))
+            self.niveis[h + 1] = np.concatenate([self.niveis[h + 1], itens[inicio::2]])
+            self.niveis[h] = itens[:sobra]
+
+    def atualizar(self, valores) -> None:
+        v = np.asarray(valores, dtype=np.float64).ravel()
+        v = v[~np.isnan(v)]
+        if len(v):
+            self.n += len(v)
+            self.niveis[0] = np.concatenate([self.niveis[0], v])
+            self._compactar()
+
+    def mesclar(self, outro: 'EsbocoQuantis') -> None:
+        for h, itens in enumerate(outro.niveis):
+            if h == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            self.niveis[h] = np.concatenate([self.niveis[h], itens])
+        self.n += outro.n
+        self._compactar()
+
+    def quantis(self, probabilidades) -> np.ndarray:
+        """Quantis com interpolação linear entre postos vizinhos (a de `np.percentile`; NaN se vazio)."""
+        p = np.asarray(probabilidades, dtype=np.float64)
+        if self.n == 0:
+            return np.full(p.shape, np.nan)
+        itens = np.concatenate(self.niveis)
+        pesos = np.concatenate([np.full(len(x), 2 ** h, dtype=np.int64) for h, x in enumerate(self.niveis)])
+        ordem = np.argsort(itens, kind='stable')
+        itens, acumulado = itens[ordem], np.cumsum(pesos[ordem])
+        posto = p * (self.n - 1)
+        baixo = np.floor(posto).astype(np.int64)
+        valor_baixo = itens[np.searchsorted(acumulado, baixo, side='right')]
+        valor_alto = itens[np.minimum(np.searchsorted(acumulado, baixo + 1, side='right'), len(itens) - 1)]
+        return valor_baixo + (posto - baixo) * (valor_alto - valor_baixo)
+
+
+class ResumoColunas:
+    """
+    Contagem, média, desvio, mínimo, máximo, quantis aproximados e matriz de covariância de
+    várias colunas, acumulados bloco a bloco e mescláveis entre processos.
+
+    Os momentos são guardados por par de colunas (i, j), só com as linhas em que as duas
+    são não nulas: `n[i, j]`, `media[i, j]` (média de i nessas linhas), `m2[i, j]` (soma
+    dos quadrados dos desvios de i) e `comom[i, j]` (soma dos produtos dos desvios). A
+    diagonal dá os momentos de cada coluna e a correlação sai como no `DataFrame.corr()`
+    (pares completos). Dentro do bloco os desvios são tomados da média do bloco; entre
+    blocos, a fusão de Chan et al. (médias ponderadas e correção n_a n_b / n d_i d_j), sem
+    as somas de quadrados brutas que perdem precisão.
+    """
+
+    def __init__(self, colunas, k: int = K_QUANTIS, semente: int = 0):
+        self.colunas = list(colunas)
+        m = len(self.colunas)
+        self.n = np.zeros((m, m), dtype=np.int64)
+        self.media = np.zeros((m, m))
+        self.m2 = np.zeros((m, m))
+        self.comom = np.zeros((m, m))
+        self.minimo = np.full(m, np.inf)
+        self.maximo = np.full(m, -np.inf)
+        self.esbocos = [EsbocoQuantis(k, semente + j) for j in range(m)]
+
+    def _momentos_bloco(self, x: np.ndarray):
+        """(n, media, m2, comom) de um bloco, com desvios tomados das médias do próprio bloco."""
+        validos = ~np.isnan(x)
+        m = x.shape[1]
+        if validos.all():
+            media = x.mean(axis=0)
+            desvios = x - media
+            comom = desvios.T @ desvios
+            return (np.full((m, m), len(x), dtype=np.int64), np.repeat(media[:, None], m, axis=1),
+                    np.repeat(np.diag(comom)[:, None], m, axis=1), comom)
+        v = validos.astype(np.float64)
+        n = (v.T @ v).round().astype(np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            media = np.where(n > 0, (np.where(validos, x, 0.0).T @ v) / n, 0.0)
+        m2, comom = np.zeros((m, m)), np.zeros((m, m))
+        incompletas = np.flatnonzero(~validos.all(axis=0))
+        completas = np.flatnonzero(validos.all(axis=0))
+        # pares de colunas sem ausentes no bloco: todas as linhas, um só produto de matrizes
+        if len(completas):
+            desvios = x[:, completas] - media[completas, completas[0]]
+            bloco = desvios.T @ desvios
+            comom[np.ix_(completas, completas)] = bloco
+            m2[np.ix_(completas, completas)] = np.diag(bloco)[:, None]
+        # pares com uma coluna incompleta: as linhas válidas dela, contra todas as completas de uma vez
+        for i in incompletas:
+            linhas = validos[:, i]
+            if len(completas):
+                di = x[linhas, i] - media[i, completas[0]]
+                dj = x[np.ix_(linhas, completas)] - media[completas, i]
+                comom[i, completas] = comom[completas, i] = di @ dj
+                m2[i, completas] = di @ di
+                m2[completas, i] = np.einsum('ij,ij->j', dj, dj)
+            for j in incompletas[incompletas >= i]:
+                par = linhas & validos[:, j]
+                di = x[par, i] - media[i, j]
+                dj = x[par, j] - media[j, i]
+                comom[i, j] = comom[j, i] = di @ dj
+                m2[i, j], m2[j, i] = di @ di, dj @ dj
+        return n, media, m2, comom
+
+    def _fundir(self, n_b, media_b, m2_b, comom_b) -> None:
+        n_a = self.n
+        n = n_a + n_b
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peso = np.where(n > 0, n_b / n, 0.0)
+            fator = np.where(n > 0, n_a * n_b / n, 0.0)
+        delta = media_b - self.media
+        self.media = self.media + delta * peso
+        self.m2 = self.m2 + m2_b + delta ** 2 * fator
+        self.comom = self.comom + comom_b + delta * delta.T * fator
+        self.n = n
+
+    def atualizar(self, matriz) -> 'ResumoColunas':
+        """Acrescenta um bloco (n x k, colunas na ordem de `colunas`; NaN = ausente)."""
+        x = np.asarray(matriz, dtype=np.float64)
+        if x.ndim == 1:
+            x = x.reshape(-1, 1)
+        if len(x) == 0:
+            return self
+        self._fundir(*self._momentos_bloco(x))
+        validos = ~np.isnan(x)
+        self.minimo = np.minimum(self.minimo, np.where(validos, x, np.inf).min(axis=0))
+        self.maximo = np.maximum(self.maximo, np.where(validos, x, -np.inf).max(axis=0))
+        for j, esboco in enumerate(self.esbocos):
+            esboco.atualizar(x[:, j])
+        return self
+
+    def mesclar(self, outro: 'ResumoColunas') -> 'ResumoColunas':
+        if outro.colunas != self.colunas:
+            raise ValueError("Só é possível mesclar resumos das mesmas colunas, na mesma ordem.")
+        self._fundir(outro.n, outro.media, outro.m2, outro.comom)
+        self.minimo = np.minimum(self.minimo, outro.minimo)
+        self.maximo = np.maximum(self.maximo, outro.maximo)
+        for esboco, outro_esboco in zip(self.esbocos, outro.esbocos):
+            esboco.mesclar(outro_esboco)
+        return self
+
+    def _posicoes(self, colunas) -> np.ndarray:
+        return np.array([self.colunas.index(c) for c in (self.colunas if colunas is None else colunas)], dtype=np.int64)
+
+    def descrever(self, colunas=None, percentis=(0.25, 0.5, 0.75)) -> pd.DataFrame:
+        """Tabela no formato de `DataFrame.describe().T` (quantis aproximados pelo esboço)."""
+        pos = self._posicoes(colunas)
+        n = np.diag(self.n)[pos].astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            desvio = np.sqrt(np.diag(self.m2)[pos] / (n - 1))
+        vazio = n == 0
+        tabela = {
+            'count': n,
+            'mean': np.where(vazio, np.nan, np.diag(self.media)[pos]),
+            'std': np.where(n > 1, desvio, np.nan),
+            'min': np.where(vazio, np.nan, self.minimo[pos]),
+        }
+        quantis = np.array([self.esbocos[j].quantis(percentis) for j in pos]).reshape(len(pos), len(percentis))
+        for q, p in enumerate(percentis):
+            tabela[f"{p * 100:g}%"] = quantis[:, q]
+        tabela['max'] = np.where(vazio, np.nan, self.maximo[pos])
+        return pd.DataFrame(tabela, index=[self.colunas[j] for j in pos])
+
+    def covariancia(self, colunas=None, ddof: int = 1) -> pd.DataFrame:
+        pos = self._posicoes(colunas)
+        n = self.n[np.ix_(pos, pos)]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(n > ddof, self.comom[np.ix_(pos, pos)] / (n - ddof), np.nan)
+        nomes = [self.colunas[j] for j in pos]
+        return pd.DataFrame(cov, index=nomes, columns=nomes)
+
+    def correlacao(self, colunas=None) -> pd.DataFrame:
+        """Correlação de Pearson com pares completos, como `DataFrame.corr()`."""
+        pos = self._posicoes(colunas)
+        sub = np.ix_(pos, pos)
+        m2 = self.m2[sub]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.where(self.n[sub] > 1, self.comom[sub] / np.sqrt(m2 * m2.T), np.nan)
+        nomes = [self.colunas[j] for j in pos]
+        return pd.DataFrame(corr, index=nomes, columns=nomes)
+
+
+def resumir_blocos(blocos, colunas, k: int = K_QUANTIS) -> ResumoColunas:
+    """Resumo de uma sequência de blocos (matrizes n x k ou DataFrames com `colunas`)."""
+    resumo = ResumoColunas(colunas, k)
+    for bloco in blocos:
+        if isinstance(bloco, pd.DataFrame):
+            bloco = bloco[list(colunas)].to_numpy(dtype=np.float64, na_value=np.nan)
+        resumo.atualizar(bloco)
+    return resumo
+
+
+def _resumir_grupos_parquet(caminho: str, colunas, grupos, k: int) -> ResumoColunas:
+    import pyarrow.parquet as pq
+    arquivo = pq.ParquetFile(caminho)
+    return resumir_blocos((arquivo.read_row_group(g, columns=list(colunas)).to_pandas() for g in grupos), colunas, k)
+
+
+def resumir_parquet(caminho, colunas, n_processos: int = 1, k: int = K_QUANTIS) -> ResumoColunas:
+    """
+    Resumo das `colunas` de um arquivo Parquet, lido grupo de linhas a grupo de linhas
+    (só as colunas pedidas; o arquivo nunca é carregado inteiro). Com `n_processos` > 1,
+    cada processo resume uma faixa contígua de grupos e os resumos são mesclados em ordem.
+    """
+    import pyarrow.parquet as pq
+    caminho = str(caminho)
+    n_grupos = pq.ParquetFile(caminho).num_row_groups
+    faixas = [list(f) for f in np.array_split(np.arange(n_grupos), max(1, min(n_processos, n_grupos))) if len(f)]
+    if len(faixas) <= 1:
+        return _resumir_grupos_parquet(caminho, colunas, range(n_grupos), k)
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=len(faixas)) as pool:
+        partes = list(pool.map(_resumir_grupos_parquet, [caminho] * len(faixas), [colunas] * len(faixas),
+                               faixas, [k] * len(faixas)))
+    resumo = partes[0]
+    for parte in partes[1:]:
+        resumo.mesclar(parte)
+    return resumo
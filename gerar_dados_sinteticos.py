@@ -6,87 +6,328 @@ Este script gera uma base de dados sintética (falsa) que imita a estrutura
 da base de dados original da dissertação.
 
 O objetivo é permitir que o notebook de análise 'dados.ipynb' seja executado
-sem erros, para fins educacionais e de estudo dos procedimentos.
+sem erros, para fins educacionais e de estudo dos procedimentos, e produzir
+bases do tamanho da produção (milhões de clientes) para testes de carga.
+
+Os clientes são gerados em blocos independentes (opcionalmente em processos
+paralelos), cada bloco com seu próprio fluxo de números aleatórios derivado da
+semente: a mesma semente (e o mesmo tamanho de bloco) gera a mesma base, com
+qualquer número de processos.
+Os blocos são gravados à medida que ficam prontos, sem montar o painel inteiro
+em memória:
+
+* csv: um único arquivo, blocos acrescentados em ordem;
+* parquet: diretório particionado por `anomes` no layout do `armazem.py`
+  (pode ser lido direto com `armazem.ler_armazem`);
+* dta: um arquivo Stata por bloco (`parte_00000.dta`, ...), lido pelo mesmo
+  leitor readstat do `.sas7bdat` em `carregamento.py` (o pyreadstat não grava
+  `.sas7bdat`).
+
+Uso:
+    python gerar_dados_sinteticos.py                       # 500 clientes, dados_sinteticos.csv
+    python gerar_dados_sinteticos.py --clientes 2000000 --formato parquet --processos 8 \\
+        --assimetria -0.5 --fracao-ausente 0.02 --mudanca-uf 0.01 --saida base_carga
 
 ATENÇÃO: Os dados aqui gerados são aleatórios. Qualquer resultado ou conclusão
 derivado deles não será real nem corresponderá aos achados da pesquisa.
 """
+from __future__ import annotations
+import argparse
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, NamedTuple, Optional
 
-import pandas as pd
 import numpy as np
-import os
+import pandas as pd
 
-# --- Parâmetros da Simulação ---
+# --- Parâmetros padrão da simulação ---
 NUM_CLIENTES = 500      # Número de clientes fictícios
 DATA_INICIO = '2021-01-01'
 DATA_FIM = '2024-12-31'
 ARQUIVO_SAIDA = 'dados_sinteticos.csv'
+SEMENTE = 2025
+CLIENTES_POR_BLOCO = 50_000
+
+UFS = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA", "PB", "PR",
+       "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
+
+# Ocupações cobrindo todos os grupos do ocupacoes.OCUP_MAP, mais textos que não casam com nenhum
+OCUPACOES = [
+    "ADMINISTRADOR", "CONTADOR", "ANALISTA DE SISTEMAS", "ECONOMISTA",
+    "SERVIDOR PUBLICO", "SECRETARIO MUNICIPAL", "PROCURADOR",
+    "MEDICO", "ENFERMEIRO", "FISIOTERAPEUTA", "PSICOLOGO",
+    "PROFESSOR", "ESTUDANTE", "ESTAGIARIO",
+    "COMERCIANTE", "VENDEDOR", "REPRESENTANTE COMERCIAL",
+    "AGRICULTOR", "PECUARISTA", "PRODUTOR RURAL",
+    "MECANICO", "ELETRICISTA", "TECNICO EM INFORMATICA",
+    "ADVOGADO", "JUIZ DE DIREITO", "OFICIAL DE JUSTICA",
+    "POLICIAL MILITAR", "VIGILANTE", "BOMBEIRO",
+    "MUSICO", "JORNALISTA", "FOTOGRAFO",
+    "ENGENHEIRO", "APOSENTADO", "DO LAR", "OUTROS",
+]
 
-print("Iniciando a geração de dados sintéticos...")
+COLUNAS_CARTEIRA = [
+    'RENDA_FIXA_POS_CDI', 'RENDA_FIXA_PRE', 'RENDA_FIXA_INFLACAO',
+    'MULTIMERCADOS', 'RENDA_VARIAVEL', 'INVEST_ALTERNATIVOS',
+    'INVEST_EXT_RENDA_VARIAVEL', 'INVEST_NO_EXTERIOR',
+    'INVEST_EXTERIOR', 'INVEST_EXT_RENDA_FIXA'
+]
+FORMATOS = ('csv', 'parquet', 'dta')
 
-# --- Gerando a estrutura do painel (clientes x tempo) ---
-# Criando IDs de clientes únicos
-ids_clientes = [f'cliente_{i+1:05d}' for i in range(NUM_CLIENTES)]
-# Criando o intervalo de tempo mensal
-datas = pd.to_datetime(pd.date_range(start=DATA_INICIO, end=DATA_FIM, freq='MS'))
-# Criando o DataFrame com todas as combinações
-df = pd.DataFrame(
-    index=pd.MultiIndex.from_product([ids_clientes, datas], names=['cliente', 'anomes_dt'])
-).reset_index()
 
-print(f"Estrutura do painel criada com {len(df)} observações.")
+class ParametrosSimulacao(NamedTuple):
+    """Configuração da base sintética (a mesma para todos os blocos)."""
+    clientes: int = NUM_CLIENTES
+    data_inicio: str = DATA_INICIO
+    data_fim: str = DATA_FIM
+    semente: int = SEMENTE
+    clientes_por_bloco: int = CLIENTES_POR_BLOCO
+    assimetria: float = 0.0          # assimetria média dos choques mensais da log-renda (-1 a 1)
+    dispersao_assimetria: float = 0.3  # variação da assimetria entre UF x ano (move o skew_proxy)
+    fracao_ausente: float = 0.005    # fração de atributos de cliente, UFs, saldos e rendas ausentes
+    mudanca_uf: float = 0.01         # probabilidade mensal de o cliente mudar de UF
+    variantes_ocupacao: int = 0      # textos extras por ocupação (ex.: 'MEDICO 17'), para o cache de ocupações
+    ruido_cadastral: float = 0.01    # fração de meses com SEXO/DT_NASCIMENTO registrados de outra forma
 
-# --- Gerando características fixas por cliente ---
-# Dicionário para armazenar características fixas de cada cliente
-clientes_df = pd.DataFrame(index=ids_clientes)
 
-# Demográficos
-clientes_df['SEXO'] = np.random.choice(['M', 'F'], size=NUM_CLIENTES, p=[0.61, 0.39])
-clientes_df['DT_NASCIMENTO'] = (
-    pd.to_datetime('1960-01-01') + pd.to_timedelta(np.random.randint(5000, 25000), unit='D')
-)
-ufs = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA", "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
-clientes_df['UF_CADASTRO'] = np.random.choice(ufs, size=NUM_CLIENTES)
+def meses(param: ParametrosSimulacao) -> pd.DatetimeIndex:
+    return pd.date_range(start=param.data_inicio, end=param.data_fim, freq='MS')
 
-# Outros atributos categóricos
-clientes_df['EST_CIVIL'] = np.random.randint(1, 13, size=NUM_CLIENTES)
-clientes_df['ESCOLAR'] = np.random.randint(0, 10, size=NUM_CLIENTES)
-clientes_df['CD_PRFL_API'] = np.random.randint(0, 5, size=NUM_CLIENTES)
-ocupacoes = ["ADMINISTRADOR", "MEDICO", "ADVOGADO", "PROFESSOR", "SERVIDOR PUBLICO", "ESTUDANTE", "COMERCIANTE", "ENGENHEIRO", "OUTROS"]
-clientes_df['DS_OCUPACAO'] = np.random.choice(ocupacoes, size=NUM_CLIENTES, p=[0.1, 0.1, 0.1, 0.1, 0.2, 0.1, 0.1, 0.1, 0.1])
-clientes_df['NM_TIP_CTRA'] = np.random.choice(["ESTILO INVESTIDOR", "CARTEIRA PADRAO"], size=NUM_CLIENTES, p=[0.7, 0.3])
 
+def _gerador(param: ParametrosSimulacao, *chave: int) -> np.random.Generator:
+    """Fluxo aleatório independente por chave, reproduzível pela semente: (0,) = comum, (1, i) = bloco i."""
+    return np.random.default_rng(np.random.SeedSequence(param.semente, spawn_key=chave))
 
-# Juntando as características fixas ao painel principal
-df = pd.merge(df, clientes_df, left_on='cliente', right_index=True)
 
-print("Características demográficas e fixas geradas.")
+def assimetrias_uf_ano(param: ParametrosSimulacao) -> np.ndarray:
+    """Assimetria dos choques de renda por (UF, ano), comum a todos os blocos."""
+    anos = meses(param).year.unique()
+    rng = _gerador(param, 0)
+    a = param.assimetria + param.dispersao_assimetria * rng.standard_normal((len(UFS), len(anos)))
+    return np.clip(a, -1.0, 1.0)
 
-# --- Gerando variáveis financeiras (variam no tempo) ---
-df['anomes'] = df['anomes_dt'].dt.strftime('%Y%m')
 
-# Gerando valores de portfólio com distribuição log-normal (mais realista)
-portfolio_cols = [
-    'RENDA_FIXA_POS_CDI', 'RENDA_FIXA_PRE', 'RENDA_FIXA_INFLACAO',
-    'MULTIMERCADOS', 'RENDA_VARIAVEL', 'INVEST_ALTERNATIVOS',
-    'INVEST_EXT_RENDA_VARIAVEL', 'INVEST_NO_EXTERIOR',
-    'INVEST_EXTERIOR', 'INVEST_EXT_RENDA_FIXA'
-]
-for col in portfolio_cols:
-    df[col] = np.random.lognormal(mean=10, sigma=2.5, size=len(df)) * np.random.choice([0,1], size=len(df), p=[0.4, 0.6])
+def _choques(rng: np.random.Generator, a: np.ndarray) -> np.ndarray:
+    """Choques de variância 1 e assimetria 2*sign(a)*|a|^1.5 (normal misturada com exponencial centrada)."""
+    z = rng.standard_normal(a.shape)
+    e = rng.standard_exponential(a.shape) - 1.0
+    return np.sqrt(1.0 - np.abs(a)) * z + np.sign(a) * np.sqrt(np.abs(a)) * e
+
+
+def _ausentes(rng: np.random.Generator, valores, fracao: float):
+    """Substitui uma fração aleatória dos valores por ausentes (NaN/None)."""
+    if fracao <= 0:
+        return valores
+    mascara = rng.random(len(valores)) < fracao
+    if valores.dtype.kind in 'fc':
+        return np.where(mascara, np.nan, valores)
+    valores = valores.astype(object)
+    valores[mascara] = None
+    return valores
+
+
+def gerar_bloco(param: ParametrosSimulacao, indice: int, assimetrias: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """Painel (clientes x meses) do bloco `indice`, ordenado por cliente e mês."""
+    if assimetrias is None:
+        assimetrias = assimetrias_uf_ano(param)
+    rng = _gerador(param, 1, indice)
+    inicio = indice * param.clientes_por_bloco
+    n = min(param.clientes_por_bloco, param.clientes - inicio)
+    datas = meses(param)
+    m = len(datas)
+    largura = max(5, len(str(param.clientes)))
+    ids = np.array([f'cliente_{i + 1:0{largura}d}' for i in range(inicio, inicio + n)], dtype=object)
+
+    # --- Características fixas por cliente ---
+    sexo = rng.choice(np.array(['M', 'F'], dtype=object), size=n, p=[0.61, 0.39])
+    # idades de 18 a 90 anos no primeiro mês (sem ausentes: o notebook calcula a idade de todos)
+    nascimento = pd.Timestamp(param.data_inicio) - pd.to_timedelta(rng.integers(18 * 365, 90 * 365, size=n), unit='D')
+    est_civil = rng.integers(1, 13, size=n).astype(float)
+    escolar = rng.integers(0, 10, size=n).astype(float)
+    perfil = rng.integers(0, 5, size=n).astype(float)
+    # ocupação: frequências decrescentes (poucas ocupações concentram a base), com variantes opcionais
+    pesos = 1.0 / np.sqrt(np.arange(1, len(OCUPACOES) + 1))
+    ocupacao = np.array(OCUPACOES, dtype=object)[rng.choice(len(OCUPACOES), size=n, p=pesos / pesos.sum())]
+    if param.variantes_ocupacao > 0:
+        variante = rng.integers(0, param.variantes_ocupacao + 1, size=n)
+        ocupacao = np.where(variante > 0, ocupacao + ' ' + variante.astype(str).astype(object), ocupacao)
+    carteira_tipo = rng.choice(np.array(["ESTILO INVESTIDOR", "CARTEIRA PADRAO"], dtype=object), size=n, p=[0.7, 0.3])
+    fixos = {'SEXO': sexo, 'EST_CIVIL': est_civil, 'ESCOLAR': escolar, 'CD_PRFL_API': perfil,
+             'DS_OCUPACAO': ocupacao}
+    for col in fixos:
+        fixos[col] = _ausentes(rng, fixos[col], param.fracao_ausente)
+
+    # --- UF ao longo do tempo (mudanças mensais com probabilidade `mudanca_uf`) ---
+    mudancas = np.cumsum(rng.random((n, m)) < param.mudanca_uf, axis=1) if param.mudanca_uf > 0 \
+        else np.zeros((n, m), dtype=np.int64)
+    opcoes_uf = rng.integers(0, len(UFS), size=(n, int(mudancas.max(initial=0)) + 1))
+    uf_codigo = np.take_along_axis(opcoes_uf, mudancas, axis=1)                      # n x m
+    uf = _ausentes(rng, np.array(UFS, dtype=object)[uf_codigo].ravel(), param.fracao_ausente)  # lacunas mensais
+
+    # --- Renda: passeio aleatório na log-renda com choques assimétricos por (UF, ano) ---
+    anos = datas.year.to_numpy()
+    indice_ano = np.searchsorted(np.unique(anos), anos)
+    a = assimetrias[uf_codigo, indice_ano[None, :]]
+    nivel = rng.normal(10.5, 1.0, size=(n, 1))
+    log_renda = nivel + 0.1 * np.cumsum(_choques(rng, a), axis=1)
+    renda = _ausentes(rng, (np.exp(log_renda) + 1000).ravel(), param.fracao_ausente)
+
+    # --- Montagem no formato da base original (cliente x mês) ---
+    df = pd.DataFrame({
+        'cliente': np.repeat(ids, m),
+        'SEXO': np.repeat(fixos['SEXO'], m),
+        'DT_NASCIMENTO': np.repeat(nascimento.to_numpy(), m),
+        'UF_CADASTRO': uf,
+        'EST_CIVIL': np.repeat(fixos['EST_CIVIL'], m),
+        'ESCOLAR': np.repeat(fixos['ESCOLAR'], m),
+        'CD_PRFL_API': np.repeat(fixos['CD_PRFL_API'], m),
+        'DS_OCUPACAO': np.repeat(fixos['DS_OCUPACAO'], m),
+        'NM_TIP_CTRA': np.repeat(carteira_tipo, m),
+        'anomes': np.tile(datas.strftime('%Y%m').to_numpy(dtype=object), n),
+    })
+    # Valores de portfólio com distribuição log-normal (mais realista), zerados em 40% dos meses
+    for col in COLUNAS_CARTEIRA:
+        valores = rng.lognormal(mean=10, sigma=2.5, size=n * m) * (rng.random(n * m) < 0.6)
+        df[col] = _ausentes(rng, valores, param.fracao_ausente)
+    df['renda'] = renda
+
+    # Ruído cadastral: alguns meses com sexo trocado ou data de nascimento corrigida. Sem ele, sexo e
+    # idade são constantes por cliente e os modelos de efeitos fixos do notebook os absorvem.
+    if param.ruido_cadastral > 0:
+        linhas = np.flatnonzero(rng.random(n * m) < param.ruido_cadastral)
+        sexo_linhas = df['SEXO'].to_numpy()[linhas]
+        df.loc[df.index[linhas], 'SEXO'] = np.where(sexo_linhas == 'M', 'F', np.where(sexo_linhas == 'F', 'M', sexo_linhas))
+        deslocamento = pd.to_timedelta(rng.integers(-3650, 3651, size=len(linhas)), unit='D')
+        df.loc[df.index[linhas], 'DT_NASCIMENTO'] = df['DT_NASCIMENTO'].to_numpy()[linhas] + deslocamento.to_numpy()
+    return df
+
+
+# ------------------------------
+# Gravação em fluxo
+# ------------------------------
+def _esquema_parquet():
+    """Esquema fixo (o mesmo em todos os blocos, mesmo quando uma coluna vem toda ausente)."""
+    import pyarrow as pa
+    campos = [('cliente', pa.string()), ('SEXO', pa.string()), ('DT_NASCIMENTO', pa.timestamp('ns')),
+              ('UF_CADASTRO', pa.string()), ('EST_CIVIL', pa.float64()), ('ESCOLAR', pa.float64()),
+              ('CD_PRFL_API', pa.float64()), ('DS_OCUPACAO', pa.string()), ('NM_TIP_CTRA', pa.string()),
+              ('anomes', pa.int32())]
+    campos += [(c, pa.float64()) for c in COLUNAS_CARTEIRA] + [('renda', pa.float64())]
+    return pa.schema(campos)
+
+
+def _gravar_bloco(param: ParametrosSimulacao, indice: int, assimetrias: np.ndarray, formato: str,
+                  destino: str):
+    """Gera o bloco e, em parquet/dta, grava no próprio processo; em csv devolve o DataFrame."""
+    df = gerar_bloco(param, indice, assimetrias)
+    if formato == 'csv':
+        return df
+    if formato == 'parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        df['anomes'] = df['anomes'].astype('int32')
+        tabela = pa.Table.from_pandas(df, schema=_esquema_parquet(), preserve_index=False)
+        pq.write_to_dataset(tabela, root_path=destino, partition_cols=['anomes'],
+                            basename_template=f"bloco{indice:05d}-{{i}}.parquet")
+    else:
+        import pyreadstat
+        pyreadstat.write_dta(df, os.path.join(destino, f"parte_{indice:05d}.dta"))
+    return len(df)
+
+
+def _em_ordem(param: ParametrosSimulacao, formato: str, destino: str, n_processos: int) -> Iterator:
+    """Resultados dos blocos na ordem dos índices, com no máximo 2 blocos por processo em andamento."""
+    n_blocos = -(-param.clientes // param.clientes_por_bloco)
+    assimetrias = assimetrias_uf_ano(param)
+    if n_processos <= 1:
+        for i in range(n_blocos):
+            yield _gravar_bloco(param, i, assimetrias, formato, destino)
+        return
+    with ProcessPoolExecutor(max_workers=n_processos) as executor:
+        pendentes = []
+        proximo = 0
+        while proximo < n_blocos or pendentes:
+            while proximo < n_blocos and len(pendentes) < 2 * n_processos:
+                pendentes.append(executor.submit(_gravar_bloco, param, proximo, assimetrias, formato, destino))
+                proximo += 1
+            yield pendentes.pop(0).result()
+
+
+def gerar(param: ParametrosSimulacao, saida: str, formato: str = 'csv', n_processos: int = 1) -> int:
+    """
+    Gera a base inteira em `saida` (arquivo .csv ou diretório para parquet/dta), gravando
+    num destino temporário e publicando só ao final. Retorna o número de linhas.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato '{formato}' inválido (use um de {FORMATOS}).")
+    saida = Path(saida)
+    temporario = saida.with_name(saida.name + ".tmp")
+    if temporario.is_dir():
+        shutil.rmtree(temporario)
+    if formato != 'csv':
+        temporario.mkdir(parents=True)
+    n_linhas = 0
+    if formato == 'csv':
+        with open(temporario, 'w', encoding='utf-8', newline='') as f:
+            for i, bloco in enumerate(_em_ordem(param, formato, str(temporario), n_processos)):
+                bloco.to_csv(f, header=(i == 0), index=False)
+                n_linhas += len(bloco)
+                print(f"  bloco {i + 1}: {n_linhas:,} linhas")
+    else:
+        for i, linhas in enumerate(_em_ordem(param, formato, str(temporario), n_processos)):
+            n_linhas += linhas
+            print(f"  bloco {i + 1}: {n_linhas:,} linhas")
+    if saida.is_dir():
+        shutil.rmtree(saida)
+    os.replace(temporario, saida)
+    return n_linhas
+
+
+def _argumentos(argv=None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Gera a base sintética da dissertação (clientes x meses).")
+    p.add_argument('--clientes', type=int, default=NUM_CLIENTES, help="número de clientes")
+    p.add_argument('--inicio', default=DATA_INICIO, help="primeiro mês (AAAA-MM-DD)")
+    p.add_argument('--fim', default=DATA_FIM, help="último mês (AAAA-MM-DD)")
+    p.add_argument('--meses', type=int, default=None, help="número de meses a partir de --inicio (substitui --fim)")
+    p.add_argument('--semente', type=int, default=SEMENTE)
+    p.add_argument('--formato', choices=FORMATOS, default='csv')
+    p.add_argument('--saida', default=None, help="arquivo .csv ou diretório (parquet/dta)")
+    p.add_argument('--processos', type=int, default=1)
+    p.add_argument('--clientes-por-bloco', type=int, default=CLIENTES_POR_BLOCO)
+    p.add_argument('--assimetria', type=float, default=0.0, help="assimetria média dos choques de renda (-1 a 1)")
+    p.add_argument('--dispersao-assimetria', type=float, default=0.3)
+    p.add_argument('--fracao-ausente', type=float, default=0.005)
+    p.add_argument('--mudanca-uf', type=float, default=0.01, help="probabilidade mensal de mudança de UF")
+    p.add_argument('--variantes-ocupacao', type=int, default=0)
+    p.add_argument('--ruido-cadastral', type=float, default=0.01,
+                   help="fração de meses com SEXO/DT_NASCIMENTO divergentes (0 = constantes por cliente)")
+    return p.parse_args(argv)
+
 
-# Gerando renda mensal
-df['renda'] = np.random.lognormal(mean=10.5, sigma=1.0, size=len(df)) + 1000
+def main(argv=None):
+    args = _argumentos(argv)
+    fim = args.fim
+    if args.meses is not None:
+        fim = (pd.Timestamp(args.inicio) + pd.DateOffset(months=args.meses - 1)).strftime('%Y-%m-%d')
+    param = ParametrosSimulacao(
+        clientes=args.clientes, data_inicio=args.inicio, data_fim=fim, semente=args.semente,
+        clientes_por_bloco=args.clientes_por_bloco, assimetria=args.assimetria,
+        dispersao_assimetria=args.dispersao_assimetria, fracao_ausente=args.fracao_ausente,
+        mudanca_uf=args.mudanca_uf, variantes_ocupacao=args.variantes_ocupacao,
+        ruido_cadastral=args.ruido_cadastral)
+    saida = args.saida or (ARQUIVO_SAIDA if args.formato == 'csv' else f"dados_sinteticos_{args.formato}")
 
-# Limpando colunas desnecessárias
-df = df.drop(columns=['anomes_dt'])
+    print("Iniciando a geração de dados sintéticos...")
+    print(f"{param.clientes:,} clientes x {len(meses(param))} meses, formato {args.formato}, "
+          f"{args.processos} processo(s)")
+    n_linhas = gerar(param, saida, formato=args.formato, n_processos=args.processos)
 
-print("Variáveis financeiras geradas.")
+    print("-" * 50)
+    print(f"✅ Base de dados sintética ({n_linhas:,} linhas) salva com sucesso em '{os.path.abspath(saida)}'")
+    print("\nLembre-se de atualizar a variável 'INPUT_PATH' no seu notebook 'dados.ipynb'.")
 
-# --- Salvando o arquivo ---
-df.to_csv(ARQUIVO_SAIDA, index=False)
 
-print("-" * 50)
-print(f"✅ Base de dados sintética salva com sucesso em '{os.path.abspath(ARQUIVO_SAIDA)}'")
-print(f"Colunas geradas: {df.columns.tolist()}")
-print("\nLembre-se de atualizar a variável 'INPUT_PATH' no seu notebook 'dados.ipynb'.")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
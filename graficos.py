@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+graficos.py
+-----------
+Gráficos agregados das variáveis do painel (dispersão diversificação x renda e boxplots por grupo).
+
+No modo original do `run_models`, o `scatter_diver_vs_renda.png` desenhava um ponto por
+linha do painel e os boxplots do seaborn recebiam `df.reset_index()` (uma cópia do painel
+inteiro por figura). O tempo e a memória cresciam com o número de linhas, e a linha de
+tendência saía de um `np.polyfit` sobre duas séries com `dropna` independentes (os pares
+podiam ficar desalinhados). Aqui cada figura é dividida em duas partes:
+
+* agregação, no processo do notebook e proporcional às linhas: a dispersão vira uma grade
+  de contagens (`np.bincount` sobre os índices das células), com a tendência ajustada só
+  nos pares em que x e y são finitos; os boxplots viram quartis, bigodes (1,5 x IQR, a
+  mesma regra do matplotlib/seaborn) e uma amostra limitada dos pontos atípicos por grupo,
+  calculados sobre as duas colunas usadas, sem copiar o quadro;
+* desenho, de tamanho fixo: os agregados (alguns KB) vão para processos trabalhadores que
+  montam as figuras com a API `Figure` do matplotlib (sem pyplot nem estado global) e
+  gravam os PNGs em paralelo.
+
+Uso:
+    densidade = graficos.densidade_2d(x, y)
+    caixas = graficos.estatisticas_caixa(grupos, valores)
+    erros = graficos.renderizar([
+        (graficos.desenhar_densidade, dict(dados=densidade, caminho='scatter.png', ...)),
+        (graficos.desenhar_caixas, dict(caixas=caixas, caminho='boxplot.png', ...)),
+    ], n_processos=2)
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+GRADE_DENSIDADE = 200     # células por eixo na dispersão agregada
+MAX_ATIPICOS = 50         # pontos atípicos desenhados por lado em cada caixa (os extremos sempre entram)
+BIGODE = 1.5              # bigodes em BIGODE x IQR, como no matplotlib/seaborn
+
+
+def _numeros(s) -> np.ndarray:
+    return np.asarray(s, dtype=np.float64)
+
+
+def tendencia(x, y) -> Tuple[float, float]:
+    """Inclinação e intercepto de MQO de y em x, só com os pares em que ambos são finitos (NaN se < 2 pares)."""
+    x, y = _numeros(x), _numeros(y)
+    validos = np.isfinite(x) & np.isfinite(y)
+    if validos.sum() < 2:
+        return np.nan, np.nan
+    x, y = x[validos], y[validos]
+    mx, my = x.mean(), y.mean()
+    dx = x - mx
+    sxx = dx @ dx
+    if sxx == 0:
+        return np.nan, np.nan
+    m = (dx @ (y - my)) / sxx
+    return float(m), float(my - m * mx)
+
+
+def densidade_2d(x, y, grade: int = GRADE_DENSIDADE) -> Dict:
+    """
+    Contagens dos pares (x, y) finitos numa grade `grade` x `grade` sobre a faixa dos dados,
+    com as bordas das células e a reta de tendência. Custo linear nas linhas; o resultado
+    tem tamanho fixo.
+    """
+    x, y = _numeros(x), _numeros(y)
+    validos = np.isfinite(x) & np.isfinite(y)
+    x, y = x[validos], y[validos]
+    n = len(x)
+    if n == 0:
+        bordas = np.linspace(0.0, 1.0, grade + 1)
+        return {'contagens': np.zeros((grade, grade), dtype=np.int64), 'bordas_x': bordas,
+                'bordas_y': bordas, 'tendencia': (np.nan, np.nan), 'n': 0}
+    bordas_x = np.linspace(x.min(), x.max(), grade + 1)
+    bordas_y = np.linspace(y.min(), y.max(), grade + 1)
+
+    def celula(v, bordas):
+        largura = bordas[-1] - bordas[0]
+        if largura == 0:
+            return np.zeros(len(v), dtype=np.int64)
+        i = ((v - bordas[0]) * (grade / largura)).astype(np.int64)
+        return np.minimum(i, grade - 1)  # o máximo cai na última célula
+
+    indices = celula(x, bordas_x) * grade + celula(y, bordas_y)
+    contagens = np.bincount(indices, minlength=grade * grade).reshape(grade, grade)
+    return {'contagens': contagens, 'bordas_x': bordas_x, 'bordas_y': bordas_y,
+            'tendencia': tendencia(x, y), 'n': n}
+
+
+def _amostra(valores: np.ndarray, limite: int) -> np.ndarray:
+    """Até `limite` valores espaçados de um vetor ordenado, incluindo o primeiro e o último."""
+    if len(valores) <= limite:
+        return valores
+    return valores[np.unique(np.linspace(0, len(valores) - 1, limite).round().astype(np.int64))]
+
+
+def estatisticas_caixa(grupos: pd.Series, valores: pd.Series, max_atipicos: int = MAX_ATIPICOS) -> List[Dict]:
+    """
+    Estatísticas de um boxplot por grupo, no formato do `Axes.bxp` (`label`, `q1`, `med`,
+    `q3`, `whislo`, `whishi`, `fliers`), na ordem das categorias (ou ordenadas, se `grupos`
+    não for category). Valores não finitos são ignorados, como no seaborn; grupos sem
+    valores não aparecem. Os quartis usam interpolação linear (a de `np.percentile`).
+    """
+    if isinstance(grupos.dtype, pd.CategoricalDtype):
+        codigos, rotulos = grupos.cat.codes.to_numpy(), list(grupos.cat.categories)
+    else:
+        codigos, rotulos = pd.factorize(grupos, sort=True)
+        rotulos = list(rotulos)
+    v = _numeros(valores)
+    validos = np.isfinite(v) & (codigos >= 0)
+    codigos, v = codigos[validos], v[validos]
+    ordem = np.lexsort((v, codigos))  # por grupo e, dentro dele, por valor
+    v, codigos = v[ordem], codigos[ordem]
+    limites = np.searchsorted(codigos, np.arange(len(rotulos) + 1))
+
+    caixas = []
+    for g, rotulo in enumerate(rotulos):
+        segmento = v[limites[g]:limites[g + 1]]
+        if len(segmento) == 0:
+            continue
+        q1, med, q3 = np.percentile(segmento, [25, 50, 75])
+        iqr = q3 - q1
+        i_baixo = np.searchsorted(segmento, q1 - BIGODE * iqr, side='left')
+        i_alto = np.searchsorted(segmento, q3 + BIGODE * iqr, side='right')
+        caixas.append({
+            'label': str(rotulo), 'q1': q1, 'med': med, 'q3': q3,
+            'whislo': segmento[i_baixo], 'whishi': segmento[i_alto - 1],
+            'fliers': np.concatenate([_amostra(segmento[:i_baixo], max_atipicos),
+                                      _amostra(segmento[i_alto:], max_atipicos)]),
+            'n': len(segmento),
+        })
+    return caixas
+
+
+# ------------------------------
+# Desenho (roda nos trabalhadores; só recebe agregados)
+# ------------------------------
+def desenhar_densidade(dados: Dict, caminho: str, titulo: str, rotulo_x: str, rotulo_y: str,
+                       tamanho=(6, 4), dpi: int = 160) -> str:
+    """PNG da dispersão agregada: células coloridas pela contagem (escala log) e a reta de tendência."""
+    from matplotlib.figure import Figure
+    from matplotlib.colors import LogNorm
+    fig = Figure(figsize=tamanho)
+    ax = fig.add_subplot()
+    contagens = np.ma.masked_equal(dados['contagens'].T, 0)
+    if contagens.count():
+        malha = ax.pcolormesh(dados['bordas_x'], dados['bordas_y'], contagens, norm=LogNorm(),
+                              cmap='viridis', rasterized=True)
+        fig.colorbar(malha, ax=ax, label='observações')
+    m, b = dados['tendencia']
+    if np.isfinite(m):
+        xvals = np.linspace(dados['bordas_x'][0], dados['bordas_x'][-1], 200)
+        ax.plot(xvals, m * xvals + b, color='tab:red', linewidth=1.2)
+    ax.set_title(titulo)
+    ax.set_xlabel(rotulo_x)
+    ax.set_ylabel(rotulo_y)
+    fig.tight_layout()
+    fig.savefig(caminho, dpi=dpi)
+    return caminho
+
+
+def desenhar_caixas(caixas: Sequence[Dict], caminho: str, titulo: str, rotulo_x: str, rotulo_y: str,
+                    tamanho=(8, 5), rotacao: int = 0, dpi: int = 160) -> str:
+    """PNG dos boxplots a partir das estatísticas de `estatisticas_caixa`."""
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=tamanho)
+    ax = fig.add_subplot()
+    ax.bxp(caixas, patch_artist=True,
+           boxprops={'facecolor': 'tab:blue', 'alpha': 0.6},
+           medianprops={'color': 'black'},
+           flierprops={'marker': 'd', 'markersize': 3, 'markerfacecolor': 'gray', 'markeredgecolor': 'none'})
+    if rotacao:
+        for rotulo in ax.get_xticklabels():
+            rotulo.set_rotation(rotacao)
+            rotulo.set_horizontalalignment('right')
+    ax.set_title(titulo)
+    ax.set_xlabel(rotulo_x)
+    ax.set_ylabel(rotulo_y)
+    fig.tight_layout()
+    fig.savefig(caminho, dpi=dpi)
+    return caminho
+
+
+def _executar(funcao: Callable, argumentos: Dict) -> Optional[str]:
+    """Roda uma tarefa de desenho; devolve a mensagem de erro (ou None)."""
+    try:
+        funcao(**argumentos)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def renderizar(tarefas: Sequence[Tuple[Callable, Dict]], n_processos: int = 1) -> List[Optional[str]]:
+    """
+    Executa as tarefas `(funcao, argumentos)` de desenho, em processos trabalhadores se
+    `n_processos` > 1. Retorna, na ordem das tarefas, None (sucesso) ou a mensagem de erro:
+    uma figura que falha não impede as outras.
+    """
+    if n_processos <= 1 or len(tarefas) <= 1:
+        return [_executar(f, a) for f, a in tarefas]
+    import matplotlib.figure  # noqa: F401 -- carregado antes do fork, os trabalhadores já o recebem importado
+    with ProcessPoolExecutor(max_workers=min(n_processos, len(tarefas))) as pool:
+        futuros = [pool.submit(_executar, f, a) for f, a in tarefas]
+        return [f.result() for f in futuros]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+gravacao.py
+-----------
+Gravação atômica de arquivos compartilhados entre processos (cache de ocupações, GeoJSON
+e PDF do app, pacote e grade do app, estado incremental, manifesto do armazém).
+
+O arquivo é escrito num temporário exclusivo (`tempfile.mkstemp`) na mesma pasta do
+destino e publicado com `os.replace`: quem lê nunca vê um arquivo pela metade, duas
+gravações simultâneas (notebook, `preparar_dados_app.py`, processos do pipeline) não
+escrevem no mesmo temporário e, numa falha, o temporário é removido.
+
+Uso:
+    import gravacao
+    gravacao.gravar_json(caminho, dados, indent=2)
+    gravacao.substituir(destino, lambda temporario: shutil.copy2(origem, temporario))
+"""
+from __future__ import annotations
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, TypeVar
+
+T = TypeVar('T')
+
+
+def substituir(destino, escrever: Callable[[str], T]) -> T:
+    """
+    Grava `destino` por `escrever(temporario)` num temporário exclusivo na mesma pasta e o
+    publica com `os.replace`. Retorna o que `escrever` retornar.
+    """
+    destino = Path(destino)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=destino.parent, prefix=destino.stem + '_', suffix='.tmp')
+    os.close(fd)
+    try:
+        resultado = escrever(temporario)
+        os.replace(temporario, destino)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+    return resultado
+
+
+def gravar_json(destino, dados, **opcoes) -> None:
+    """`dados` em JSON (UTF-8, sem escapar acentos), publicado atomicamente; `opcoes` vão para `json.dump`."""
+    def escrever(temporario: str) -> None:
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False, **opcoes)
+
+    substituir(destino, escrever)
@@ -0,0 +1,524 @@
+# -*- coding: utf-8 -*-
+"""
+incremental.py
+--------------
+Atualização mensal incremental do painel do notebook e dos agregados do app.
+
+Quando chega um `anomes` novo, só a partição desse mês é lida e processada; o que
+depende do histórico fica num estado persistente em `cache/incremental/`:
+
+Painel do notebook (`atualizar_painel`):
+* linhas já tratadas de cada mês (`painel/anomes=AAAAMM.parquet`), com `delta_y`;
+* última `log_renda_ind` e último mês de cada cliente, para o `delta_y` do mês novo;
+* pontos de corte da winsorização das ln_* e as caudas das duas pontas de cada coluna
+  (valores distintos e contagens), de onde sai o corte exato da base acrescida do mês
+  novo. Os meses novos usam os cortes guardados; se o corte exato se afasta deles mais
+  que `tolerancia` (fração da amplitude entre os cortes), ou se a base dobrou desde a
+  última reconstrução, o painel é reconstruído do zero pelo `prepare_engineer`;
+* médias anuais por cliente e momentos por (região, ano) do `skew_proxy` são refeitos
+  na leitura do painel, a partir do `delta_y` guardado, numa passada de bincount
+  (mesma conta do `prepare_engineer`, então os valores são idênticos).
+
+Agregados do app (`atualizar_app`):
+* cubo de células aditivas (soma/contagem por dimensão e `anomes`) e tabela de pares
+  (célula, cliente): o mês novo vira um cubo pequeno somado ao acumulado;
+* histograma de `diver`: contagens por faixa e os valores de cada mês em .npy; as
+  faixas só são recontadas se o mês novo mudar o mínimo ou o máximo.
+
+Meses já incorporados são ignorados; um mês anterior ao último incorporado (ou a
+winsorização por grupos, `WINSOR_GRUPOS`) leva à reconstrução completa do painel.
+
+O estado fica amarrado à entrada: o `estado.json` guarda a origem e o hash do armazém,
+o hash de cada partição incorporada e uma assinatura do código da engenharia (as
+funções, os módulos do repositório e as constantes globais que elas usam, como
+`LAYOUT_COMPACTO`). Outra origem, um mês já incorporado que mudou no armazém ou uma
+assinatura diferente levam à reconstrução completa, do painel ou do cubo.
+
+Os meses novos chegam em arquivos à parte (`arquivos_meses` em `fonte_armazem`), que o
+`armazem.acrescentar` incorpora partição a partição: a origem não é relida nem
+reconvertida, e o tempo de uma atualização acompanha o tamanho do mês.
+
+Uso:
+    fonte = incremental.fonte_armazem(origem, arquivos_meses=["base_202406.csv"])
+    painel = incremental.atualizar_painel(fonte, prepare_engineer)
+    cubo, clientes, dist_diver = incremental.atualizar_app(fonte)
+"""
+from __future__ import annotations
+import hashlib
+import json
+import shutil
+import types
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+import armazem
+import carregamento
+import engenharia as engenharia_base  # o nome `engenharia` é o do prepare_engineer passado às funções
+import estatisticas
+import gravacao
+import memoria
+
+DIRETORIO_ESTADO = Path(__file__).parent / "cache" / "incremental"
+VERSAO_ESTADO = 2
+TOLERANCIA_WINSOR = 0.001  # deslocamento máximo dos cortes (fração da amplitude entre eles) sem reconstruir
+LIMITES_WINSOR = (0.01, 0.01)
+COLUNAS_WINSOR = ['ln_diver', 'ln_renda', 'ln_ESC', 'ln_IDH', 'ln_PIB']
+COLUNAS_SKEW = ['delta_y_anual', 'media_dy', 'sd_dy', 'delta_y_pad', 'skew_aux', 'grupo_n',
+                'skew', 'skew_final', 'skew_media_regional', 'skew_proxy']
+INDICE_PAINEL = ['id_cliente', 'anomes']
+
+
+# ------------------------------
+# Fonte dos meses
+# ------------------------------
+class FonteArmazem:
+    """Partições `anomes` do armazém Parquet (ver armazem.py)."""
+
+    def __init__(self, destino, colunas: Optional[Sequence[str]] = carregamento.COLUNAS_USADAS,
+                 otimizar: bool = False):
+        self.destino = destino
+        self.colunas = colunas
+        self.otimizar = otimizar
+
+    def meses(self) -> List[int]:
+        return [int(m) for m in armazem.ler_manifesto(self.destino)['particoes']]
+
+    def identidade(self) -> Dict[str, str]:
+        """Origem do armazém e hash dela na última conversão."""
+        manifesto = armazem.ler_manifesto(self.destino)
+        return {'origem': manifesto['origem'], 'sha256': manifesto['sha256']}
+
+    def hashes(self) -> Dict[str, str]:
+        """Hash de cada partição (chave: anomes em texto)."""
+        return dict(armazem.ler_manifesto(self.destino)['hash_particoes'])
+
+    def ler(self, meses: Sequence[int]) -> pd.DataFrame:
+        return armazem.ler_armazem(self.destino, colunas=self.colunas, otimizar=self.otimizar,
+                                   filtros=[(armazem.COLUNA_PARTICAO, 'in', [int(m) for m in meses])])
+
+
+def fonte_armazem(origem: str, arquivos_meses: Sequence[str] = (),
+                  tamanho_bloco: int = carregamento.TAMANHO_BLOCO_PADRAO, n_processos: int = 1,
+                  **opcoes) -> FonteArmazem:
+    """
+    Armazém da origem (convertida só quando ela muda) com os arquivos de meses novos
+    incorporados partição a partição; `opcoes` vão para o `FonteArmazem`.
+    """
+    destino = armazem.garantir_armazem(origem, tamanho_bloco=tamanho_bloco, n_processos=n_processos)
+    for arquivo in arquivos_meses:
+        armazem.acrescentar(destino, arquivo, tamanho_bloco=tamanho_bloco, n_processos=n_processos)
+    return FonteArmazem(destino, **opcoes)
+
+
+# ------------------------------
+# Estado em disco
+# ------------------------------
+_DIRETORIO_REPOSITORIO = Path(__file__).resolve().parent
+_TIPOS_CONSTANTES = (bool, int, float, str, bytes, tuple, list, dict, set, frozenset, type(None))
+
+
+def _codigos(codigo: types.CodeType):
+    """O objeto de código e os das funções e classes definidas dentro dele."""
+    yield codigo
+    for const in codigo.co_consts:
+        if isinstance(const, types.CodeType):
+            yield from _codigos(const)
+
+
+def assinatura_codigo(*funcoes, extras=None) -> str:
+    """
+    Hash do código das `funcoes` e do que elas usam pelo nome: outras funções do mesmo
+    espaço de nomes (percorridas também), módulos do repositório (pelo conteúdo do
+    arquivo) e constantes globais simples (pelo valor). `extras` entra pelo repr.
+    """
+    h = hashlib.sha256(repr(extras).encode('utf-8'))
+    pendentes, vistas, arquivos = list(funcoes), set(), set()
+    while pendentes:
+        funcao = pendentes.pop(0)
+        funcao = getattr(funcao, 'func', funcao)  # functools.partial
+        if id(funcao) in vistas or not hasattr(funcao, '__code__'):
+            continue
+        vistas.add(id(funcao))
+        espaco = funcao.__globals__
+        for codigo in _codigos(funcao.__code__):
+            h.update(codigo.co_code)
+            h.update(repr([c for c in codigo.co_consts if not isinstance(c, types.CodeType)]).encode('utf-8'))
+            for nome in codigo.co_names:
+                valor = espaco.get(nome)
+                if isinstance(valor, types.FunctionType):
+                    pendentes.append(valor)
+                elif isinstance(valor, types.ModuleType):
+                    arquivo = getattr(valor, '__file__', None)
+                    if arquivo and Path(arquivo).resolve().parent == _DIRETORIO_REPOSITORIO:
+                        arquivos.add(str(Path(arquivo).resolve()))
+                elif isinstance(valor, _TIPOS_CONSTANTES):
+                    h.update(f"{nome}={valor!r}".encode('utf-8'))
+    for arquivo in sorted(arquivos):
+        h.update(Path(arquivo).name.encode('utf-8'))
+        h.update(armazem.hash_arquivo(arquivo).encode('ascii'))
+    return h.hexdigest()
+
+
+def _vinculo(fonte, meses: Sequence[int], assinatura: str) -> dict:
+    """O que amarra o estado à entrada: origem, hash do armazém e das partições incorporadas, assinatura."""
+    hashes = fonte.hashes()
+    return {**fonte.identidade(), 'assinatura': assinatura,
+            'hash_particoes': {str(m): hashes.get(str(m)) for m in meses}}
+
+
+def _divergencia(estado: dict, fonte, assinatura: str) -> Optional[str]:
+    """Motivo para descartar o estado guardado, ou None se ele corresponde à fonte e ao código."""
+    if estado.get('assinatura') != assinatura:
+        return "código ou parâmetros da engenharia mudaram"
+    if estado.get('origem') != fonte.identidade()['origem']:
+        return "outra origem"
+    hashes = fonte.hashes()
+    alterados = [m for m in estado['meses'] if estado['hash_particoes'].get(str(m)) != hashes.get(str(m))]
+    if alterados:
+        return f"mês {alterados[0]} diferente do incorporado (corrigido ou removido na origem)"
+    return None
+
+
+def _ler_estado(diretorio: Path) -> Optional[dict]:
+    caminho = diretorio / "estado.json"
+    if not caminho.exists():
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        estado = json.load(f)
+    return estado if estado.get('versao') == VERSAO_ESTADO else None
+
+
+def _gravar_estado(diretorio: Path, estado: dict) -> None:
+    """O estado.json é gravado por último: é ele que marca a atualização como concluída."""
+    estado['versao'] = VERSAO_ESTADO
+    gravacao.gravar_json(diretorio / "estado.json", estado, indent=2)
+
+
+def _anomes(datas) -> np.ndarray:
+    datas = pd.DatetimeIndex(datas)
+    return (datas.year * 100 + datas.month).to_numpy()
+
+
+# ------------------------------
+# Winsorização com cortes guardados
+# ------------------------------
+def _cauda(valores: np.ndarray, tamanho: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Os `tamanho` menores valores (ou todos, se forem menos) como (valores distintos, contagens)."""
+    if len(valores) > tamanho:
+        valores = np.partition(valores, tamanho - 1)[:tamanho]
+    return np.unique(valores, return_counts=True)
+
+
+def _mesclar_cauda(cauda: Tuple[np.ndarray, np.ndarray], novos: np.ndarray,
+                   tamanho: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Cauda dos valores guardados mais os novos. Como todo valor descartado antes é maior
+    que os da cauda, os `tamanho` menores da união continuam exatos para a base inteira.
+    """
+    novos_valores, novas_contagens = _cauda(novos, tamanho)
+    valores, inverso = np.unique(np.concatenate([cauda[0], novos_valores]), return_inverse=True)
+    contagens = np.bincount(inverso, weights=np.concatenate([cauda[1], novas_contagens])).astype(np.int64)
+    antes = np.cumsum(contagens) - contagens  # valores estritamente menores que cada um
+    manter = antes < tamanho
+    return valores[manter], contagens[manter]
+
+
+def _valor_na_posicao(cauda: Tuple[np.ndarray, np.ndarray], posicao: int) -> float:
+    """Valor na `posicao` (0 = menor) da ordem crescente, ou NaN se a cauda não chega até ela."""
+    acumulado = np.cumsum(cauda[1])
+    if len(acumulado) == 0 or posicao >= acumulado[-1]:
+        return np.nan
+    return float(cauda[0][np.searchsorted(acumulado, posicao, side='right')])
+
+
+def cortes_winsor(painel: pd.DataFrame, limites=LIMITES_WINSOR):
+    """
+    Cortes da base inteira por coluna ln_* e as caudas (valores distintos e contagens) das
+    duas pontas, com o dobro das observações que o corte usa hoje: enquanto a base não
+    dobrar, o corte exato da base acrescida de meses novos sai só das caudas.
+    """
+    matriz = memoria.selecionar(painel, COLUNAS_WINSOR).to_numpy(dtype=float)
+    baixo, alto = estatisticas._cortes_winsor(matriz, limites)
+    cortes, caudas = {}, {}
+    for j, col in enumerate(COLUNAS_WINSOR):
+        valores = matriz[:, j][~np.isnan(matriz[:, j])]
+        n = len(valores)
+        pos_baixo, pos_alto = estatisticas.posicoes_winsor(n, limites)
+        tamanho = 2 * (max(pos_baixo, n - 1 - pos_alto) + 1)
+        cortes[col] = {'n': n, 'baixo': float(baixo[j]), 'alto': float(alto[j]), 'tamanho_cauda': tamanho}
+        caudas[f'{col}.baixo'] = _cauda(valores, tamanho)
+        caudas[f'{col}.alto'] = _cauda(-valores, tamanho)  # pelo negativo: os maiores viram os menores
+    return cortes, caudas
+
+
+def _gravar_caudas(diretorio: Path, caudas: dict) -> None:
+    arrays = {}
+    for chave, (valores, contagens) in caudas.items():
+        arrays[f'{chave}.valores'], arrays[f'{chave}.contagens'] = valores, contagens
+    np.savez(diretorio / "caudas.npz", **arrays)
+
+
+def _ler_caudas(diretorio: Path) -> dict:
+    with np.load(diretorio / "caudas.npz") as arquivo:
+        chaves = {k.rsplit('.', 1)[0] for k in arquivo.files}
+        return {k: (arquivo[f'{k}.valores'], arquivo[f'{k}.contagens']) for k in chaves}
+
+
+def atualizar_cortes(cortes: dict, caudas: dict, mes: pd.DataFrame, limites=LIMITES_WINSOR):
+    """
+    Acrescenta o mês às caudas e mede o deslocamento dos cortes exatos da base acrescida em
+    relação aos guardados, como fração da amplitude (alto - baixo) de cada coluna. Retorna
+    (cortes com o novo n, caudas, deslocamento); deslocamento infinito se a cauda não basta.
+    """
+    novos_cortes, novas_caudas, maior = {}, {}, 0.0
+    for col, c in cortes.items():
+        valores = memoria.coluna(mes, col).to_numpy(dtype=float)
+        valores = valores[~np.isnan(valores)]
+        n = c['n'] + len(valores)
+        cauda_baixo = _mesclar_cauda(caudas[f'{col}.baixo'], valores, c['tamanho_cauda'])
+        cauda_alto = _mesclar_cauda(caudas[f'{col}.alto'], -valores, c['tamanho_cauda'])
+        pos_baixo, pos_alto = estatisticas.posicoes_winsor(n, limites)
+        baixo = _valor_na_posicao(cauda_baixo, pos_baixo)
+        alto = -_valor_na_posicao(cauda_alto, n - 1 - pos_alto)
+        amplitude = max(c['alto'] - c['baixo'], np.finfo(float).eps)
+        for exato, guardado in ((baixo, c['baixo']), (alto, c['alto'])):
+            maior = max(maior, np.inf if np.isnan(exato) else abs(exato - guardado) / amplitude)
+        novos_cortes[col] = {**c, 'n': n}
+        novas_caudas[f'{col}.baixo'], novas_caudas[f'{col}.alto'] = cauda_baixo, cauda_alto
+    return novos_cortes, novas_caudas, maior
+
+
+# ------------------------------
+# Painel do notebook
+# ------------------------------
+def _expandir(df: pd.DataFrame) -> pd.DataFrame:
+    """Layout compacto -> colunas comuns (as partições guardam o painel sem `df.attrs`)."""
+    info = memoria.constantes(df)
+    if info is None:
+        return df
+    df = df.copy()
+    for col in info[1].columns:
+        if col not in df.columns:
+            df[col] = memoria.coluna(df, col)
+    df.attrs.pop(memoria.ATRIBUTO, None)
+    return df
+
+
+def _gravar_meses(painel: pd.DataFrame, diretorio: Path) -> List[int]:
+    """Uma partição por mês, sem as colunas do skew_proxy (refeitas na leitura)."""
+    pasta = diretorio / "painel"
+    pasta.mkdir(parents=True, exist_ok=True)
+    linhas = painel.drop(columns=[c for c in COLUNAS_SKEW if c in painel.columns]).reset_index()
+    meses = _anomes(linhas['anomes'])
+    gravados = []
+    for mes in np.unique(meses):
+        linhas[meses == mes].to_parquet(pasta / f"anomes={mes}.parquet", index=False)
+        gravados.append(int(mes))
+    return gravados
+
+
+def _ultimos_clientes(painel: pd.DataFrame) -> pd.DataFrame:
+    """Última observação de cada cliente: mês e log da renda (para o delta_y do mês seguinte)."""
+    linhas = painel[['cliente', 'log_renda_ind']].reset_index()
+    ultimas = linhas.groupby('cliente', observed=True, sort=False).tail(1)
+    return pd.DataFrame({'cliente': ultimas['cliente'].astype(str).to_numpy(),
+                         'anomes': _anomes(ultimas['anomes']),
+                         'log_renda_ind': ultimas['log_renda_ind'].to_numpy(dtype=float)})
+
+
+def _assinatura_painel(engenharia: Callable, limites) -> str:
+    return assinatura_codigo(engenharia, extras={'limites': list(limites), 'colunas_winsor': COLUNAS_WINSOR})
+
+
+def reconstruir_painel(fonte, engenharia: Callable, diretorio=DIRETORIO_ESTADO / "painel",
+                       limites=LIMITES_WINSOR) -> pd.DataFrame:
+    """Painel completo pelo `prepare_engineer` (como sem o modo incremental) e estado refeito a partir dele."""
+    diretorio = Path(diretorio)
+    meses = sorted(fonte.meses())
+    vinculo = _vinculo(fonte, meses, _assinatura_painel(engenharia, limites))
+    painel = engenharia(fonte.ler(meses))
+    shutil.rmtree(diretorio, ignore_errors=True)
+    diretorio.mkdir(parents=True)
+    expandido = _expandir(painel)
+    _gravar_meses(expandido, diretorio)
+    _ultimos_clientes(expandido).to_parquet(diretorio / "clientes.parquet", index=False)
+    cortes, caudas = cortes_winsor(expandido, limites)
+    _gravar_caudas(diretorio, caudas)
+    _gravar_estado(diretorio, {'meses': meses, 'limites': list(limites), 'cortes': cortes,
+                               'colunas': list(expandido.columns), **vinculo})
+    print(f"[incremental] painel reconstruído: {len(meses)} meses, {len(painel)} linhas.")
+    return painel
+
+
+def _tratar_mes(bruto: pd.DataFrame, engenharia: Callable, clientes: pd.DataFrame,
+                estado: dict) -> pd.DataFrame:
+    """Engenharia do mês isolado, com delta_y ligado ao histórico e winsor pelos cortes guardados."""
+    mes = _expandir(engenharia(bruto))
+    mes = mes.drop(columns=[c for c in COLUNAS_SKEW if c in mes.columns])
+    # delta_y: diferença para a última observação do cliente (NaN para cliente novo)
+    anterior = clientes.set_index('cliente')['log_renda_ind']
+    mes['delta_y'] = mes['log_renda_ind'].to_numpy() - anterior.reindex(mes['cliente'].astype(str)).to_numpy()
+    for col, c in estado['cortes'].items():
+        mes[f'{col}_w'] = np.clip(memoria.coluna(mes, col).to_numpy(dtype=float), c['baixo'], c['alto'])
+    return mes
+
+
+def atualizar_painel(fonte, engenharia: Callable, diretorio=DIRETORIO_ESTADO / "painel",
+                     tolerancia: float = TOLERANCIA_WINSOR, reconstruir: bool = False,
+                     winsor_grupos=None) -> pd.DataFrame:
+    """
+    Incorpora ao painel os meses da fonte que ainda não estão no estado e devolve o painel
+    completo (mesmo formato do `prepare_engineer`). `engenharia` é o `prepare_engineer` do
+    notebook, aplicado só às linhas do mês novo.
+    """
+    diretorio = Path(diretorio)
+    estado = _ler_estado(diretorio)
+    disponiveis = sorted(fonte.meses())
+    motivo = None
+    if reconstruir:
+        motivo = "pedido"
+    elif winsor_grupos is not None:
+        motivo = "winsorização por grupos"
+    elif estado is None:
+        motivo = "sem estado"
+    else:
+        motivo = _divergencia(estado, fonte, _assinatura_painel(engenharia, LIMITES_WINSOR))
+    if motivo is None:
+        novos = [m for m in disponiveis if m not in estado['meses']]
+        if novos and min(novos) < max(estado['meses']):
+            motivo = f"mês {min(novos)} anterior ao último incorporado"
+    if motivo is not None:
+        print(f"[incremental] reconstrução completa ({motivo}).")
+        return reconstruir_painel(fonte, engenharia, diretorio, limites=tuple(LIMITES_WINSOR))
+
+    clientes = pd.read_parquet(diretorio / "clientes.parquet")
+    caudas = _ler_caudas(diretorio)
+    for mes in novos:
+        linhas = _tratar_mes(fonte.ler([mes]), engenharia, clientes, estado)
+        cortes, caudas, deslocamento = atualizar_cortes(estado['cortes'], caudas, linhas, estado['limites'])
+        if deslocamento > tolerancia:
+            print(f"[incremental] cortes da winsorização deslocados em {deslocamento:.4f} "
+                  f"(tolerância {tolerancia}) com o mês {mes}: reconstrução completa.")
+            return reconstruir_painel(fonte, engenharia, diretorio, limites=tuple(estado['limites']))
+        _gravar_meses(linhas, diretorio)
+        ultimos = _ultimos_clientes(linhas)
+        clientes = pd.concat([clientes[~clientes['cliente'].isin(ultimos['cliente'])], ultimos], ignore_index=True)
+        clientes.to_parquet(diretorio / "clientes.parquet", index=False)
+        _gravar_caudas(diretorio, caudas)
+        estado['cortes'] = cortes
+        estado['meses'] = sorted(estado['meses'] + [mes])
+        estado['hash_particoes'][str(mes)] = fonte.hashes().get(str(mes))
+        estado['sha256'] = fonte.identidade()['sha256']
+        estado['colunas'] += [c for c in linhas.reset_index().columns if c not in estado['colunas']]
+        _gravar_estado(diretorio, estado)
+        print(f"[incremental] mês {mes}: {len(linhas)} linhas incorporadas "
+              f"(deslocamento dos cortes {deslocamento:.4f}).")
+    return ler_painel(diretorio)
+
+
+def ler_painel(diretorio=DIRETORIO_ESTADO / "painel") -> pd.DataFrame:
+    """
+    Painel completo a partir das partições: identificadores de cliente, idade e colunas
+    do skew_proxy refeitos sobre a base inteira, como o `prepare_engineer` faria.
+    """
+    diretorio = Path(diretorio)
+    estado = _ler_estado(diretorio)
+    partes = [pd.read_parquet(diretorio / "painel" / f"anomes={m}.parquet") for m in estado['meses']]
+    tipos = {}
+    for parte in partes:
+        for col, tipo in parte.dtypes.items():
+            tipos.setdefault(col, tipo)
+    df = pd.concat(partes, ignore_index=True)
+    del partes
+    for col, tipo in tipos.items():
+        if isinstance(tipo, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')  # categorias da base inteira, como no prepare_engineer
+        elif df[col].isna().any() and pd.api.types.is_integer_dtype(tipo):
+            df[col] = df[col].fillna(0).astype(tipo)  # dummy de categoria ausente em algum mês
+
+    df['id_cliente'] = df.groupby('cliente', observed=True).ngroup()
+    if 'DT_NASCIMENTO' in df.columns:
+        df['idade'] = engenharia_base.idade(df['DT_NASCIMENTO'])
+        df['idade_int'] = df['idade'].astype(int)
+    df = df.set_index(INDICE_PAINEL).sort_index()
+
+    colunas_skew = estatisticas.proxy_assimetria_de_delta(
+        df['delta_y'].to_numpy(), df.index.get_level_values('id_cliente'), df['ano'].to_numpy(),
+        df['regiao_codigo'].to_numpy())
+    for nome, valores in colunas_skew.items():
+        df[nome] = valores
+    ordem = [c for c in estado['colunas'] if c in df.columns and c not in INDICE_PAINEL]
+    return df[ordem + [c for c in df.columns if c not in ordem]]
+
+
+# ------------------------------
+# Agregados do app
+# ------------------------------
+def _bordas(estado: dict):
+    import preparar_dados_app as app_prep
+    return app_prep._bordas_histograma(estado['diver_min'], estado['diver_max'], estado['bins'])
+
+
+def atualizar_app(fonte, diretorio=DIRETORIO_ESTADO / "app", reconstruir: bool = False,
+                  bins: int = 50):
+    """
+    Incorpora os meses novos ao cubo, à tabela de pares e ao histograma guardados e devolve
+    (cubo, clientes, dist_diver) para o `salvar_agregados`. A ordem dos meses não importa.
+    """
+    import preparar_dados_app as app_prep
+
+    diretorio = Path(diretorio)
+    assinatura = assinatura_codigo(app_prep.tratar_dados, app_prep.construir_cubo, extras={'bins': bins})
+    estado = None if reconstruir else _ler_estado(diretorio)
+    if estado is not None:
+        motivo = _divergencia(estado, fonte, assinatura)
+        if motivo is not None:
+            print(f"[incremental] cubo do app reconstruído ({motivo}).")
+            estado = None
+    if estado is None:
+        shutil.rmtree(diretorio, ignore_errors=True)
+        estado = {'meses': [], 'bins': bins, 'diver_min': None, 'diver_max': None, **_vinculo(fonte, [], assinatura)}
+    (diretorio / "diver").mkdir(parents=True, exist_ok=True)
+    cubo = pd.read_pickle(diretorio / "cubo.pkl") if estado['meses'] else None
+    clientes = pd.read_pickle(diretorio / "clientes.pkl") if estado['meses'] else None
+    contagem = np.load(diretorio / "contagem.npy") if estado['meses'] else np.zeros(bins, dtype=np.int64)
+
+    novos = [m for m in sorted(fonte.meses()) if m not in estado['meses']]
+    for mes in novos:
+        tratado = app_prep.tratar_dados(fonte.ler([mes]), verbose=False)
+        cubo_mes, clientes_mes = app_prep.construir_cubo(tratado)
+        # células de meses diferentes nunca coincidem: a soma só acrescenta as do mês novo
+        cubo = cubo_mes if cubo is None else app_prep.combinar_cubos([cubo, cubo_mes])
+        clientes = app_prep.combinar_clientes([clientes_mes] if clientes is None else [clientes, clientes_mes])
+
+        diver = tratado['diver'].to_numpy(dtype=np.float64)
+        diver = diver[~np.isnan(diver)]
+        np.save(diretorio / "diver" / f"anomes={mes}.npy", diver)
+        if len(diver):
+            mn = float(diver.min()) if estado['diver_min'] is None else min(estado['diver_min'], float(diver.min()))
+            mx = float(diver.max()) if estado['diver_max'] is None else max(estado['diver_max'], float(diver.max()))
+            if (mn, mx) == (estado['diver_min'], estado['diver_max']):
+                contagem = contagem + app_prep._contar_histograma(diver, _bordas(estado)[1], bins)
+            else:
+                # faixas mudaram: recontagem a partir dos valores guardados de cada mês
+                estado['diver_min'], estado['diver_max'] = mn, mx
+                bordas = _bordas(estado)[1]
+                contagem = sum(app_prep._contar_histograma(np.load(diretorio / "diver" / f"anomes={m}.npy"),
+                                                           bordas, bins) for m in estado['meses'] + [mes])
+        estado['meses'] = sorted(estado['meses'] + [mes])
+        estado['hash_particoes'][str(mes)] = fonte.hashes().get(str(mes))
+        print(f"[incremental] mês {mes}: {len(tratado)} linhas agregadas.")
+
+    if novos:
+        estado['sha256'] = fonte.identidade()['sha256']
+        cubo.to_pickle(diretorio / "cubo.pkl")
+        clientes.to_pickle(diretorio / "clientes.pkl")
+        np.save(diretorio / "contagem.npy", contagem)
+        _gravar_estado(diretorio, estado)
+    if cubo is None:
+        return None
+    faixas = _bordas(estado)[0]
+    return cubo, clientes, app_prep._tabela_histograma(faixas, contagem)
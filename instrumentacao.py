@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+"""
+instrumentacao.py
+-----------------
+Tempo, CPU e memória por etapa nomeada de uma execução, com relatório JSON.
+
+Uma execução (`execucao`) é ativada em volta do `main()` do notebook ou do
+`preparar_dados_app.py`; dentro dela, cada etapa registra:
+
+* tempo de parede e tempo de CPU do processo;
+* memória residente no início e no fim (com psutil) e quanto a etapa elevou o
+  pico de memória do processo;
+* linhas/colunas e tamanho (sem contar o conteúdo dos textos) da entrada e da saída.
+
+Há duas formas de marcar etapas:
+
+* `etapa(nome)`: bloco `with` em volta de uma chamada (leitura, tratamento, ...);
+* `voltas(nome, df)`: cronômetro de voltas para funções longas divididas em blocos
+  (`prepare_engineer`, `run_models`, ...): cada `marcar('bloco', df)` fecha o bloco
+  que terminou ali, sem reindentar a função.
+
+Fora de uma execução ativa as duas formas não fazem nada (custo de uma chamada),
+então as funções instrumentadas podem ser chamadas isoladamente (benchmark, testes).
+
+Perfil por amostragem: com `perfilar='prepare_engineer/winsor'` (ou só 'winsor'), uma
+thread registra a pilha do programa a cada `intervalo` segundos durante a etapa e
+grava as pilhas agregadas (formato "folded", aceito por flamegraph.pl e speedscope)
+em `perfil_<etapa>.txt`, com as funções mais frequentes no relatório.
+
+Uso:
+    with instrumentacao.execucao('notebook', perfilar=None) as execucao:
+        with instrumentacao.etapa('load_data') as e:
+            df = load_data(...)
+            e.saida(df)
+        ...
+    execucao.salvar(RESULTS_DIR)   # -> execucao_notebook_AAAAMMDD_HHMMSS.json
+
+    voltas = instrumentacao.voltas('prepare_engineer', df)
+    ...
+    voltas.marcar('dummies', df)
+"""
+from __future__ import annotations
+import contextlib
+import json
+import os
+import platform
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import memoria
+
+try:
+    import psutil
+except Exception:
+    psutil = None
+
+INTERVALO_AMOSTRAGEM = 0.005  # segundos entre amostras do perfil
+N_FUNCOES_PERFIL = 25         # funções mais frequentes listadas no relatório
+
+_ATIVA: List['Execucao'] = []  # pilha de execuções ativas (a última é a corrente)
+_PROCESSO: Dict[int, 'psutil.Process'] = {}  # por pid (processos filhos criam o seu)
+
+
+def _mb(valor) -> Optional[float]:
+    return None if valor is None else valor / 2**20
+
+
+def _rss() -> Optional[int]:
+    if psutil is None:
+        return None
+    pid = os.getpid()
+    if pid not in _PROCESSO:
+        _PROCESSO[pid] = psutil.Process(pid)
+    return _PROCESSO[pid].memory_info().rss
+
+
+def _dimensoes(obj) -> Dict:
+    """Linhas, colunas e MB de um DataFrame/Series/array (memória rasa: textos não são percorridos)."""
+    if obj is None:
+        return {}
+    if isinstance(obj, pd.DataFrame):
+        return {'linhas': len(obj), 'colunas': len(obj.columns),
+                'mb': _mb(int(obj.memory_usage(index=True, deep=False).sum()))}
+    if isinstance(obj, pd.Series):
+        return {'linhas': len(obj), 'colunas': 1, 'mb': _mb(int(obj.memory_usage(index=True, deep=False)))}
+    if isinstance(obj, np.ndarray):
+        return {'linhas': obj.shape[0] if obj.ndim else 1, 'colunas': obj.shape[1] if obj.ndim > 1 else 1,
+                'mb': _mb(obj.nbytes)}
+    if hasattr(obj, '__len__'):
+        return {'linhas': len(obj)}
+    return {}
+
+
+# ------------------------------
+# Perfil por amostragem
+# ------------------------------
+class AmostradorPilhas:
+    """Thread que conta as pilhas de chamada de outra thread em intervalos fixos."""
+
+    def __init__(self, intervalo: float = INTERVALO_AMOSTRAGEM, thread_id: Optional[int] = None):
+        self.intervalo = intervalo
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.pilhas: Counter = Counter()
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._laco, name='amostrador-perfil', daemon=True)
+
+    def _laco(self) -> None:
+        while not self._parar.wait(self.intervalo):
+            quadro = sys._current_frames().get(self.thread_id)
+            pilha = []
+            while quadro is not None:
+                codigo = quadro.f_code
+                pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                quadro = quadro.f_back
+            if pilha:
+                with self._trava:
+                    self.pilhas[tuple(reversed(pilha))] += 1
+
+    def iniciar(self) -> 'AmostradorPilhas':
+        self._thread.start()
+        return self
+
+    def parar(self) -> None:
+        self._parar.set()
+        self._thread.join()
+
+    def coletar(self) -> Counter:
+        """Pilhas acumuladas desde a última coleta (e zera o acumulado)."""
+        with self._trava:
+            pilhas, self.pilhas = self.pilhas, Counter()
+        return pilhas
+
+
+def resumo_pilhas(pilhas: Counter, n: int = N_FUNCOES_PERFIL) -> List[Dict]:
+    """Funções mais frequentes: amostras no topo da pilha (próprias) e em qualquer nível (inclusivas)."""
+    total = sum(pilhas.values())
+    proprias, inclusivas = Counter(), Counter()
+    for pilha, contagem in pilhas.items():
+        proprias[pilha[-1]] += contagem
+        for funcao in set(pilha):
+            inclusivas[funcao] += contagem
+    return [{'funcao': f, 'fracao_inclusiva': c / total, 'fracao_propria': proprias[f] / total}
+            for f, c in inclusivas.most_common(n)] if total else []
+
+
+def gravar_pilhas(pilhas: Counter, caminho: str) -> None:
+    """Formato 'folded': uma linha por pilha, funções separadas por ';' e a contagem no fim."""
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for pilha, contagem in pilhas.most_common():
+            f.write(';'.join(pilha) + f" {contagem}\n")
+
+
+# ------------------------------
+# Execução e etapas
+# ------------------------------
+class _Medida:
+    """Leituras de início de uma etapa; `fechar` devolve o registro com as diferenças."""
+
+    def __init__(self, nome: str, entrada=None):
+        self.nome = nome
+        self.entrada = _dimensoes(entrada)
+        self.rss = _rss()
+        self.pico = memoria.pico_processo()
+        self.cpu = time.process_time()
+        self.parede = time.perf_counter()
+
+    def fechar(self, saida=None, inicio_execucao: float = 0.0) -> Dict:
+        parede = time.perf_counter()
+        cpu = time.process_time()
+        pico = memoria.pico_processo()
+        rss = _rss()
+        registro = {
+            'etapa': self.nome,
+            'inicio_s': self.parede - inicio_execucao,
+            'segundos': parede - self.parede,
+            'segundos_cpu': cpu - self.cpu,
+            'mb_rss_inicio': _mb(self.rss),
+            'mb_rss_fim': _mb(rss),
+            'mb_aumento_pico': None if pico is None else _mb(pico - self.pico),
+        }
+        registro.update({f'{k}_entrada': v for k, v in self.entrada.items()})
+        registro.update({f'{k}_saida': v for k, v in _dimensoes(saida).items()})
+        return registro
+
+
+class _Etapa:
+    """Objeto do `with etapa(...)`: `saida(obj)` informa o resultado da etapa."""
+
+    def __init__(self):
+        self.resultado = None
+
+    def saida(self, obj) -> None:
+        self.resultado = obj
+
+
+class Execucao:
+    """Registros das etapas de uma execução (ordem de término) e o perfil da etapa escolhida."""
+
+    def __init__(self, nome: str, perfilar: Optional[str] = None, intervalo: float = INTERVALO_AMOSTRAGEM):
+        self.nome = nome
+        self.perfilar = perfilar
+        self.intervalo = intervalo
+        self.etapas: List[Dict] = []
+        self.perfil: Optional[Dict] = None
+        self._pilhas_perfil: Optional[Counter] = None
+        self._caminho: List[str] = []  # etapas abertas (para os nomes hierárquicos)
+        self.data_inicio = datetime.now()
+        self.inicio = time.perf_counter()
+        self.fim: Optional[float] = None
+
+    def nome_completo(self, nome: str) -> str:
+        return '/'.join(self._caminho + [nome])
+
+    def deve_perfilar(self, nome_completo: str) -> bool:
+        return self.perfilar is not None and self.perfilar in (nome_completo, nome_completo.rsplit('/', 1)[-1])
+
+    def registrar(self, registro: Dict) -> None:
+        registro['nivel'] = registro['etapa'].count('/')
+        self.etapas.append(registro)
+
+    def guardar_perfil(self, nome_completo: str, pilhas: Counter) -> None:
+        if self._pilhas_perfil is None:
+            self._pilhas_perfil = Counter()
+        self._pilhas_perfil.update(pilhas)  # a mesma etapa pode rodar várias vezes (ex.: por partição)
+        self.perfil = {'etapa': nome_completo, 'intervalo_s': self.intervalo,
+                       'amostras': sum(self._pilhas_perfil.values()),
+                       'funcoes': resumo_pilhas(self._pilhas_perfil)}
+
+    def tabela(self) -> pd.DataFrame:
+        return pd.DataFrame(self.etapas)
+
+    def texto(self) -> str:
+        tabela = self.tabela()
+        if tabela.empty:
+            return f"[INSTRUMENTACAO] execução '{self.nome}': nenhuma etapa executada"
+        colunas = [c for c in ['etapa', 'segundos', 'segundos_cpu', 'mb_aumento_pico', 'linhas_entrada', 'linhas_saida']
+                   if c in tabela.columns]
+        return f"[INSTRUMENTACAO] etapas da execução '{self.nome}'\n" + tabela[colunas].to_string(
+            index=False, float_format=lambda v: f"{v:,.2f}")
+
+    def relatorio(self) -> Dict:
+        fim = self.fim if self.fim is not None else time.perf_counter()
+        return {
+            'execucao': self.nome,
+            'inicio': self.data_inicio.isoformat(timespec='seconds'),
+            'segundos': fim - self.inicio,
+            'mb_pico_processo': _mb(memoria.pico_processo()),
+            'ambiente': {'maquina': platform.node(), 'python': platform.python_version(),
+                         'pandas': pd.__version__, 'numpy': np.__version__, 'cpus': os.cpu_count(),
+                         'psutil': psutil is not None},
+            'etapas': self.etapas,
+            'perfil': self.perfil,
+        }
+
+    def salvar(self, diretorio: str) -> str:
+        """Grava o relatório JSON (e as pilhas do perfil, se houver) em `diretorio`; retorna o caminho."""
+        os.makedirs(diretorio, exist_ok=True)
+        sufixo = self.data_inicio.strftime('%Y%m%d_%H%M%S')
+        if self._pilhas_perfil:
+            arquivo = os.path.join(diretorio, f"perfil_{self.perfil['etapa'].replace('/', '.')}_{sufixo}.txt")
+            gravar_pilhas(self._pilhas_perfil, arquivo)
+            self.perfil['arquivo_pilhas'] = arquivo
+        caminho = os.path.join(diretorio, f"execucao_{self.nome}_{sufixo}.json")
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(self.relatorio(), f, ensure_ascii=False, indent=2, default=str)
+        return caminho
+
+
+def atual() -> Optional[Execucao]:
+    """Execução ativa, ou None."""
+    return _ATIVA[-1] if _ATIVA else None
+
+
+@contextlib.contextmanager
+def execucao(nome: str, perfilar: Optional[str] = None, intervalo: float = INTERVALO_AMOSTRAGEM):
+    """Ativa uma execução: as etapas marcadas dentro do bloco são registradas nela."""
+    registro = Execucao(nome, perfilar=perfilar, intervalo=intervalo)
+    _ATIVA.append(registro)
+    try:
+        yield registro
+    finally:
+        registro.fim = time.perf_counter()
+        _ATIVA.remove(registro)
+
+
+@contextlib.contextmanager
+def etapa(nome: str, entrada=None):
+    """Mede o bloco como a etapa `nome` (aninhada sob as etapas abertas) da execução ativa."""
+    exe = atual()
+    marcador = _Etapa()
+    if exe is None:
+        yield marcador
+        return
+    nome = exe.nome_completo(nome)
+    amostrador = AmostradorPilhas(exe.intervalo).iniciar() if exe.deve_perfilar(nome) else None
+    exe._caminho.append(nome.rsplit('/', 1)[-1])
+    medida = _Medida(nome, entrada)
+    try:
+        yield marcador
+    finally:
+        registro = medida.fechar(marcador.resultado, exe.inicio)
+        exe._caminho.pop()
+        if amostrador is not None:
+            amostrador.parar()
+            exe.guardar_perfil(nome, amostrador.coletar())
+        exe.registrar(registro)
+
+
+class _Voltas:
+    """Cronômetro de voltas: cada `marcar` fecha o bloco desde a marca anterior."""
+
+    def __init__(self, exe: Execucao, nome: str, entrada=None, encadear: bool = True):
+        self.exe = exe
+        self.encadear = encadear
+        # dentro de `etapa(nome)` as voltas ficam sob a própria etapa (e não sob nome/nome)
+        self.prefixo = '/'.join(exe._caminho) if exe._caminho[-1:] == [nome] else exe.nome_completo(nome)
+        self.medida = _Medida('', entrada)
+        self.entrada = self.medida.entrada
+        self.amostrador = None
+        if exe.perfilar is not None and (exe.perfilar.startswith(self.prefixo + '/') or '/' not in exe.perfilar):
+            # o nome da volta só é conhecido na marca: amostra sempre e guarda só a volta pedida
+            self.amostrador = AmostradorPilhas(exe.intervalo).iniciar()
+
+    def marcar(self, nome: str, saida=None) -> None:
+        registro = self.medida.fechar(saida, self.exe.inicio)
+        registro['etapa'] = nome_completo = f"{self.prefixo}/{nome}"
+        self.exe.registrar(registro)
+        if self.amostrador is not None:
+            pilhas = self.amostrador.coletar()
+            if self.exe.deve_perfilar(nome_completo):
+                self.exe.guardar_perfil(nome_completo, pilhas)
+        self.medida = _Medida('', saida if self.encadear else None)
+        if not self.encadear:
+            self.medida.entrada = self.entrada
+
+    def reiniciar(self) -> None:
+        """Descarta o tempo desde a última marca (ex.: relatórios entre um bloco e outro)."""
+        entrada = self.medida.entrada
+        self.medida = _Medida('')
+        self.medida.entrada = entrada
+        if self.amostrador is not None:
+            self.amostrador.coletar()
+
+    def __del__(self):
+        if getattr(self, 'amostrador', None) is not None:
+            self.amostrador.parar()
+
+
+class _SemVoltas:
+    def marcar(self, nome: str, saida=None) -> None:
+        pass
+
+    def reiniciar(self) -> None:
+        pass
+
+
+def voltas(nome: str, entrada=None, encadear: bool = True):
+    """
+    Cronômetro de voltas da etapa `nome` na execução ativa (sem execução ativa, não mede nada).
+    Com `encadear`, a entrada de cada bloco é a saída do anterior; sem, é sempre `entrada`.
+    """
+    exe = atual()
+    return _SemVoltas() if exe is None else _Voltas(exe, nome, entrada, encadear)
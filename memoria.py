@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+memoria.py
+----------
+Layout compacto do painel montado pelo `prepare_engineer` e relatório de memória por etapa.
+
+No layout original o painel carrega dummies em int64, textos repetidos como object,
+constantes regionais (escolaridade, renda, IDH e PIB da região, seus logs e versões
+winsorizadas) repetidas em todas as linhas, e cada `pd.concat` de dummies copia o
+quadro inteiro. No layout compacto:
+
+* textos repetidos viram category e indicadores 0/1 viram int8;
+* as colunas constantes dentro de `regiao_codigo` ficam numa tabela pequena
+  (uma linha por região) guardada em `df.attrs`, e só são expandidas para o
+  tamanho da base quando alguém pede a coluna (`coluna` / `selecionar`);
+* colunas novas entram por atribuição (`anexar_colunas`), sem copiar o quadro.
+
+Os valores são os mesmos do layout original (float64 intactos), então os modelos
+não mudam.
+
+Uso:
+    relatorio = memoria.RelatorioMemoria()
+    relatorio.registrar('leitura', df)
+    memoria.recolher_constantes(df, ['renda_regional', 'ln_renda_w'], chave='regiao_codigo')
+    x = memoria.coluna(df, 'ln_renda_w')          # expandida para as linhas do painel
+    base = memoria.selecionar(df, ['ln_diver_w', 'ln_renda_w'])
+    print(relatorio.texto())
+"""
+from __future__ import annotations
+import sys
+import warnings
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except Exception:  # Windows
+    resource = None
+
+ATRIBUTO = 'constantes'  # chave em df.attrs: {'chave': nome da coluna, 'tabela': DataFrame por valor da chave}
+
+
+# ------------------------------
+# Tipos compactos
+# ------------------------------
+def _indicador(s: pd.Series) -> bool:
+    """Coluna inteira só com 0 e 1."""
+    if not pd.api.types.is_integer_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype):
+        return False
+    valores = s.to_numpy()
+    return len(valores) == 0 or (valores.min() >= 0 and valores.max() <= 1)
+
+
+def compactar_tipos(df: pd.DataFrame, colunas: Optional[Sequence[str]] = None,
+                    fracao_distintos: float = 0.5) -> pd.DataFrame:
+    """
+    Reduz tipos no próprio quadro: textos com poucos valores distintos (menos de
+    `fracao_distintos` das linhas) viram category, indicadores 0/1 viram int8 e os
+    demais inteiros descem para o menor tipo inteiro que comporta os valores.
+    Floats não são tocados (os modelos usam os mesmos float64).
+    """
+    for col in (df.columns if colunas is None else colunas):
+        s = df[col]
+        if s.dtype == object:
+            if s.nunique(dropna=True) < fracao_distintos * max(len(s), 1):
+                df[col] = s.astype('category')
+        elif _indicador(s):
+            df[col] = s.astype(np.int8)
+        elif pd.api.types.is_integer_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+            df[col] = pd.to_numeric(s, downcast='integer')
+    return df
+
+
+def anexar_colunas(df: pd.DataFrame, *blocos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Acrescenta as colunas dos blocos (mesmo índice de `df`) por atribuição, como o
+    `pd.concat([df, *blocos], axis=1)` faria, mas sem copiar as colunas já existentes.
+    """
+    with warnings.catch_warnings():
+        # muitas colunas novas fragmentam os blocos internos; o quadro é consolidado só quando preciso
+        warnings.simplefilter('ignore', pd.errors.PerformanceWarning)
+        for bloco in blocos:
+            for col in bloco.columns:
+                df[col] = bloco[col]
+    return df
+
+
+# ------------------------------
+# Constantes por chave (ex.: regiao_codigo)
+# ------------------------------
+def constantes(df: pd.DataFrame):
+    """(chave, tabela) das colunas recolhidas, ou None no layout original."""
+    info = df.attrs.get(ATRIBUTO)
+    return None if info is None else (info['chave'], info['tabela'])
+
+
+def definir_constantes(df: pd.DataFrame, chave: str, tabela: pd.DataFrame) -> None:
+    """Registra (ou amplia) a tabela de colunas constantes por valor de `chave`."""
+    atual = constantes(df)
+    if atual is not None:
+        if atual[0] != chave:
+            raise ValueError(f"Constantes já recolhidas por '{atual[0]}', não por '{chave}'.")
+        tabela = atual[1].join(tabela, how='outer')
+    df.attrs[ATRIBUTO] = {'chave': chave, 'tabela': tabela}
+
+
+def recolher_constantes(df: pd.DataFrame, colunas: Sequence[str], chave: str) -> List[str]:
+    """
+    Move para a tabela de constantes as colunas que não variam dentro de cada valor
+    de `chave` (e as remove do quadro). Colunas que variam ficam onde estão.
+    Retorna os nomes recolhidos.
+    """
+    codigos, valores_chave = pd.factorize(df[chave], sort=True)
+    recolhidas = {}
+    for col in colunas:
+        if col not in df.columns:
+            continue
+        valores = df[col].to_numpy()
+        # um representante por valor da chave; a coluna é constante se todas as linhas o repetem
+        representante = np.empty(len(valores_chave), dtype=valores.dtype)
+        representante[codigos] = valores
+        if np.array_equal(representante[codigos], valores, equal_nan=valores.dtype.kind == 'f'):
+            recolhidas[col] = representante
+    if recolhidas:
+        definir_constantes(df, chave, pd.DataFrame(recolhidas, index=pd.Index(valores_chave, name=chave)))
+        for col in recolhidas:
+            del df[col]
+    return list(recolhidas)
+
+
+def nomes(df: pd.DataFrame) -> List[str]:
+    """Colunas disponíveis: as do quadro mais as recolhidas na tabela de constantes."""
+    info = constantes(df)
+    return list(df.columns) + ([] if info is None else [c for c in info[1].columns if c not in df.columns])
+
+
+def coluna(df: pd.DataFrame, nome: str) -> pd.Series:
+    """A coluna `nome` com uma linha por observação, expandida da tabela se foi recolhida."""
+    if nome in df.columns:
+        return df[nome]
+    info = constantes(df)
+    if info is None or nome not in info[1].columns:
+        raise KeyError(nome)
+    chave, tabela = info
+    posicoes = tabela.index.get_indexer(df[chave])
+    return pd.Series(tabela[nome].to_numpy()[posicoes], index=df.index, name=nome)
+
+
+def selecionar(df: pd.DataFrame, colunas: Sequence[str]) -> pd.DataFrame:
+    """Quadro estreito com as colunas pedidas (expandindo as recolhidas); `df[colunas]` no layout original."""
+    colunas = list(dict.fromkeys(colunas))
+    if constantes(df) is None or all(c in df.columns for c in colunas):
+        return df[colunas]
+    return pd.DataFrame({c: coluna(df, c) for c in colunas}, index=df.index)
+
+
+# ------------------------------
+# Relatório por etapa
+# ------------------------------
+def pegada(df: pd.DataFrame) -> int:
+    """Bytes ocupados pelo quadro (textos contados por inteiro) mais a tabela de constantes."""
+    total = int(df.memory_usage(index=True, deep=True).sum())
+    info = constantes(df)
+    if info is not None:
+        total += int(info[1].memory_usage(index=True, deep=True).sum())
+    return total
+
+
+def pico_processo() -> Optional[int]:
+    """Pico de memória residente do processo até agora, em bytes (None fora do Unix)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(pico) * (1 if sys.platform == 'darwin' else 1024)  # macOS informa bytes, Linux KiB
+
+
+class RelatorioMemoria:
+    """Pegada do painel ao fim de cada etapa do fluxo (leitura, dummies, regionais, ...)."""
+
+    def __init__(self):
+        self.linhas: List[Dict] = []
+
+    def registrar(self, etapa: str, df: pd.DataFrame) -> None:
+        pico = pico_processo()
+        info = constantes(df)
+        self.linhas.append({
+            'etapa': etapa,
+            'linhas': len(df),
+            'colunas': len(df.columns),
+            'colunas_recolhidas': 0 if info is None else len(info[1].columns),
+            'mb_painel': pegada(df) / 2**20,
+            'mb_pico_processo': np.nan if pico is None else pico / 2**20,
+        })
+
+    def tabela(self) -> pd.DataFrame:
+        return pd.DataFrame(self.linhas, columns=['etapa', 'linhas', 'colunas', 'colunas_recolhidas',
+                                                  'mb_painel', 'mb_pico_processo'])
+
+    def texto(self) -> str:
+        return "[MEMORIA] pegada do painel por etapa (MB)\n" + self.tabela().to_string(
+            index=False, float_format=lambda v: f"{v:,.1f}")
+
+    def salvar(self, caminho: str) -> None:
+        self.tabela().to_csv(caminho, index=False, encoding='utf-8')
@@ -0,0 +1,811 @@
+# -*- coding: utf-8 -*-
+"""
+modelos_painel.py
+-----------------
+Espaço de trabalho para a bateria de modelos em painel do notebook (`run_models`).
+
+Cada `from_formula` do linearmodels reinterpreta a fórmula, remonta a matriz de
+regressores a partir do DataFrame inteiro, descarta missings e refaz a média por
+entidade, mesmo quando quase todos os regressores (`ln_renda_w`, `ln_ESC_w`,
+`sexo_dummy`, `idade_int`, dummies de região) se repetem entre as especificações.
+
+Aqui cada coluna vira um vetor float64 uma única vez e, para cada amostra (base
+inteira, alta renda, ...), ficam guardados os códigos de entidade, as somas por
+entidade, as colunas já centradas na média da entidade e os produtos cruzados
+entre colunas. Uma especificação nova só monta a matriz a partir dessas peças e
+resolve um sistema k x k; o erro-padrão agrupado por cliente custa uma passada.
+
+Os estimadores reproduzem os do linearmodels usados na dissertação (PooledOLS,
+PanelOLS com EntityEffects e RandomEffects, sem constante, `debiased=True`), com o
+mesmo quadro de resumo.
+
+Uso:
+    import modelos_painel as mp
+    espaco = mp.EspacoPainel(df, amostras={'alta_renda': df['renda'] > engenharia.LIMITE_FAIXA_RENDA})
+    fe = espaco.ajustar(mp.Especificacao('FE', 'fe', 'ln_diver_w', ['ln_renda_w', 'idade_int']))
+    print(fe.summary)
+"""
+from __future__ import annotations
+import datetime as dt
+import hashlib
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+ESTIMADORES = {'pooled': 'PooledOLS', 'fe': 'PanelOLS', 're': 'RandomEffects'}
+NOMES_COVARIANCIA = {'unadjusted': 'Unadjusted', 'robust': 'Robust', 'clustered': 'Clustered'}
+
+
+class Especificacao(NamedTuple):
+    """Uma linha da bateria de modelos."""
+    nome: str                      # rótulo no sumário (ex.: 'H1/H1a')
+    estimador: str                 # 'pooled', 'fe' ou 're'
+    dependente: str
+    regressores: Tuple[str, ...]
+    amostra: Optional[str] = None  # nome de uma amostra registrada no espaço (None = base inteira)
+    cov_type: str = 'clustered'    # 'unadjusted', 'robust' ou 'clustered' (por entidade)
+
+    def formula(self) -> str:
+        """Fórmula equivalente para o `from_formula` do linearmodels."""
+        termos = ' + '.join(self.regressores)
+        if self.estimador == 'fe':
+            termos += ' + EntityEffects'
+        return f'{self.dependente} ~ {termos}'
+
+
+def ajustar_linearmodels(esp: Especificacao, df: pd.DataFrame, amostras: Optional[Dict[str, pd.Series]] = None):
+    """Caminho de referência: a mesma especificação estimada pelo `from_formula` do linearmodels."""
+    from linearmodels.panel import PanelOLS, RandomEffects, PooledOLS
+
+    dados = df if esp.amostra is None else df[amostras[esp.amostra]]
+    modelo = {'pooled': PooledOLS, 'fe': PanelOLS, 're': RandomEffects}[esp.estimador]
+    opcoes = {'cluster_entity': True} if esp.cov_type == 'clustered' else {}
+    return modelo.from_formula(esp.formula(), data=dados).fit(cov_type=esp.cov_type, **opcoes)
+
+
+def _estrutura(ids: np.ndarray) -> pd.Series:
+    """Observações por grupo (média, mediana, máximo, mínimo e total de grupos)."""
+    contagem = np.bincount(ids)
+    contagem = contagem[contagem > 0]
+    return pd.Series([contagem.mean(), np.median(contagem), contagem.max(), contagem.min(), contagem.shape[0]],
+                     index=['mean', 'median', 'max', 'min', 'total'])
+
+
+class _Amostra:
+    """Peças reaproveitáveis de uma amostra (linhas válidas): entidades, somas, colunas centradas, produtos."""
+
+    def __init__(self, linhas: np.ndarray, entidades: np.ndarray, tempos: np.ndarray):
+        self.linhas = linhas
+        self.n = len(linhas)
+        # códigos compactos (0..G-1) das entidades presentes na amostra
+        _, self.grupos = np.unique(entidades[linhas], return_inverse=True)
+        self.contagem = np.bincount(self.grupos).astype(np.float64)
+        self.n_grupos = len(self.contagem)
+        self.tempos = tempos[linhas]
+        self.brutas: Dict[str, np.ndarray] = {}
+        self.somas: Dict[str, np.ndarray] = {}
+        self.centradas: Dict[str, np.ndarray] = {}
+        self.produtos: Dict[tuple, float] = {}
+
+    def bruta(self, nome: str, coluna: np.ndarray) -> np.ndarray:
+        if nome not in self.brutas:
+            self.brutas[nome] = coluna[self.linhas] if self.n < len(coluna) else coluna
+        return self.brutas[nome]
+
+    def media_entidade(self, nome: str, coluna: np.ndarray) -> np.ndarray:
+        if nome not in self.somas:
+            self.somas[nome] = np.bincount(self.grupos, weights=self.bruta(nome, coluna), minlength=self.n_grupos)
+        return self.somas[nome] / self.contagem
+
+    def centrada(self, nome: str, coluna: np.ndarray) -> np.ndarray:
+        if nome not in self.centradas:
+            self.centradas[nome] = self.bruta(nome, coluna) - self.media_entidade(nome, coluna)[self.grupos]
+        return self.centradas[nome]
+
+    def produto(self, tipo: str, a: str, b: str, va: np.ndarray, vb: np.ndarray) -> float:
+        chave = (tipo,) + tuple(sorted((a, b)))
+        if chave not in self.produtos:
+            self.produtos[chave] = float(va @ vb)
+        return self.produtos[chave]
+
+
+class ResultadoPainel:
+    """Resultado de uma especificação, com os mesmos atributos usados do linearmodels."""
+
+    def __init__(self, esp: Especificacao, params: np.ndarray, cov: np.ndarray, info: dict):
+        nomes = list(esp.regressores)
+        self.especificacao = esp
+        self.name = ESTIMADORES[esp.estimador]
+        self.params = pd.Series(params, index=nomes, name='parameter')
+        self.cov = pd.DataFrame(cov, index=nomes, columns=nomes)
+        self.std_errors = pd.Series(np.sqrt(np.diag(cov)), index=nomes, name='std_error')
+        self.tstats = pd.Series(params / self.std_errors.to_numpy(), index=nomes, name='tstat')
+        self.cov_type = NOMES_COVARIANCIA[esp.cov_type]
+        self.debiased = True
+        self._datetime = dt.datetime.now()
+        for chave, valor in info.items():
+            setattr(self, chave, valor)
+        from scipy import stats  # importado só ao ajustar (o notebook define o módulo sem rodar modelos)
+        self.pvalues = pd.Series(2 * (1 - stats.t.cdf(np.abs(self.tstats.to_numpy()), self.df_resid)),
+                                 index=nomes, name='pvalue')
+
+    def conf_int(self, level: float = 0.95) -> pd.DataFrame:
+        from scipy import stats
+        q = stats.t.ppf([(1 - level) / 2, 1 - (1 - level) / 2], self.df_resid)
+        ic = self.params.to_numpy()[:, None] + self.std_errors.to_numpy()[:, None] * q[None, :]
+        return pd.DataFrame(ic, index=self.params.index, columns=['lower', 'upper'])
+
+    @property
+    def summary(self):
+        """Quadro no formato do `summary` do linearmodels."""
+        from linearmodels.compat.statsmodels import Summary
+        from linearmodels.shared.io import _str, pval_format
+        from statsmodels.iolib.summary import SimpleTable, fmt_2cols, fmt_params
+
+        def _f(teste):
+            valido = np.isfinite(teste[0])
+            return ((_str(teste[0]), pval_format(teste[1]), teste[2]) if valido else ('--', '--', '--'))
+
+        f_stat, f_pval, f_dist = _f(self.f_statistic)
+        f_rob, f_rob_pval, f_rob_dist = _f(self.f_statistic_robust)
+        esquerda = [
+            ("Dep. Variable:", self.especificacao.dependente),
+            ("Estimator:", self.name),
+            ("No. Observations:", self.nobs),
+            ("Date:", self._datetime.strftime("%a, %b %d %Y")),
+            ("Time:", self._datetime.strftime("%H:%M:%S")),
+            ("Cov. Estimator:", self.cov_type),
+            ("", ""),
+            ("Entities:", str(int(self.entity_info["total"]))),
+            ("Avg Obs:", _str(self.entity_info["mean"])),
+            ("Min Obs:", _str(self.entity_info["min"])),
+            ("Max Obs:", _str(self.entity_info["max"])),
+            ("", ""),
+            ("Time periods:", str(int(self.time_info["total"]))),
+            ("Avg Obs:", _str(self.time_info["mean"])),
+            ("Min Obs:", _str(self.time_info["min"])),
+            ("Max Obs:", _str(self.time_info["max"])),
+            ("", ""),
+        ]
+        direita = [
+            ("R-squared:", _str(self.rsquared)),
+            ("R-squared (Between):", _str(self.rsquared_between)),
+            ("R-squared (Within):", _str(self.rsquared_within)),
+            ("R-squared (Overall):", _str(self.rsquared_overall)),
+            ("Log-likelihood", _str(self.loglik)),
+            ("", ""),
+            ("F-statistic:", f_stat),
+            ("P-value", f_pval),
+            ("Distribution:", f_dist),
+            ("", ""),
+            ("F-statistic (robust):", f_rob),
+            ("P-value", f_rob_pval),
+            ("Distribution:", f_rob_dist),
+            ("", ""), ("", ""), ("", ""), ("", ""),
+        ]
+        tabela = SimpleTable([[v] for _, v in esquerda], txt_fmt=fmt_2cols,
+                             title=self.name + " Estimation Summary", stubs=[k for k, _ in esquerda])
+        fmt = fmt_2cols
+        fmt["data_fmts"][1] = "%18s"
+        direita = [("%-21s" % ("  " + k), v) for k, v in direita]
+        tabela.extend_right(SimpleTable([[v] for _, v in direita], stubs=[k for k, _ in direita]))
+        resumo = Summary()
+        resumo.tables.append(tabela)
+
+        dados = np.c_[self.params.to_numpy()[:, None], self.std_errors.to_numpy()[:, None],
+                      self.tstats.to_numpy()[:, None], self.pvalues.to_numpy()[:, None],
+                      self.conf_int().to_numpy()]
+        linhas = [[pval_format(v) if i == 3 else _str(v) for i, v in enumerate(linha)] for linha in dados]
+        resumo.tables.append(SimpleTable(linhas, stubs=list(self.params.index), txt_fmt=fmt_params,
+                                         headers=["Parameter", "Std. Err.", "T-stat", "P-value",
+                                                  "Lower CI", "Upper CI"],
+                                         title="Parameter Estimates"))
+        if self.especificacao.estimador == 'fe':
+            extra = []
+            if np.isfinite(self.f_pooled[0]):
+                extra += [f"F-test for Poolability: {_str(self.f_pooled[0])}",
+                          f"P-value: {pval_format(self.f_pooled[1])}",
+                          f"Distribution: {self.f_pooled[2]}", ""]
+            extra.append("Included effects: Entity")
+            resumo.add_extra_txt(extra)
+        return resumo
+
+
+def _teste_f(estatistica: float, gl_num: int, gl_den: int) -> tuple:
+    """(estatística, p-valor, rótulo da distribuição) de um teste F."""
+    from scipy import stats
+    return (estatistica, float(stats.f.sf(estatistica, gl_num, gl_den)), f"F({gl_num},{gl_den})")
+
+
+class EspacoPainel:
+    """
+    Dados numéricos do painel montados uma vez, com cache por amostra das médias
+    por entidade, colunas centradas e produtos cruzados.
+
+    `df` deve ter o MultiIndex (entidade, tempo) do `prepare_engineer`; `amostras`
+    mapeia nomes para máscaras booleanas alinhadas a `df` (ex.: alta renda).
+    """
+
+    def __init__(self, df: pd.DataFrame, amostras: Optional[Dict[str, pd.Series]] = None):
+        self._df = df
+        self.entidades = pd.factorize(df.index.get_level_values(0), sort=True)[0]
+        self.tempos = pd.factorize(df.index.get_level_values(1), sort=True)[0]
+        self.n = len(df)
+        self.colunas: Dict[str, np.ndarray] = {}
+        self.amostras: Dict[Optional[str], np.ndarray] = {None: np.ones(self.n, dtype=bool)}
+        for nome, mascara in (amostras or {}).items():
+            self.definir_amostra(nome, mascara)
+        self._cache: Dict[str, _Amostra] = {}
+
+    @classmethod
+    def de_arrays(cls, colunas: Dict[str, np.ndarray], entidades: np.ndarray, tempos: np.ndarray,
+                  amostras: Optional[Dict[str, np.ndarray]] = None) -> 'EspacoPainel':
+        """Espaço sobre vetores já prontos (ex.: em memória compartilhada), sem DataFrame."""
+        espaco = cls.__new__(cls)
+        espaco._df = None
+        espaco.entidades, espaco.tempos = entidades, tempos
+        espaco.n = len(entidades)
+        espaco.colunas = dict(colunas)
+        espaco.amostras = {None: np.ones(espaco.n, dtype=bool)}
+        for nome, mascara in (amostras or {}).items():
+            espaco.definir_amostra(nome, mascara)
+        espaco._cache = {}
+        return espaco
+
+    def definir_amostra(self, nome: str, mascara) -> None:
+        self.amostras[nome] = np.asarray(mascara, dtype=bool)
+
+    def coluna(self, nome: str) -> np.ndarray:
+        """Vetor float64 da coluna (convertido uma única vez)."""
+        if nome not in self.colunas:
+            if self._df is None:
+                raise KeyError(f"Coluna '{nome}' não foi carregada no espaço.")
+            self.colunas[nome] = np.asarray(self._df[nome], dtype=np.float64)
+        return self.colunas[nome]
+
+    def _amostra(self, esp: Especificacao) -> _Amostra:
+        """Peças da amostra válida da especificação (amostra pedida e sem missing nas variáveis)."""
+        valida = self.amostras[esp.amostra].copy()
+        for nome in (esp.dependente,) + tuple(esp.regressores):
+            valida &= np.isfinite(self.coluna(nome))
+        chave = hashlib.sha1(np.packbits(valida).tobytes()).hexdigest()
+        if chave not in self._cache:
+            self._cache[chave] = _Amostra(np.flatnonzero(valida), self.entidades, self.tempos)
+        return self._cache[chave]
+
+    def _sistema(self, a: _Amostra, tipo: str, y: str, xs: Sequence[str], vetor) -> Tuple[np.ndarray, np.ndarray]:
+        """X'X e X'y a partir dos produtos cruzados em cache."""
+        k = len(xs)
+        xtx = np.empty((k, k))
+        for i in range(k):
+            for j in range(i, k):
+                xtx[i, j] = xtx[j, i] = a.produto(tipo, xs[i], xs[j], vetor(xs[i]), vetor(xs[j]))
+        xty = np.array([a.produto(tipo, x, y, vetor(x), vetor(y)) for x in xs])
+        return xtx, xty
+
+    @staticmethod
+    def _posto(r: np.ndarray, n: int) -> int:
+        """Posto a partir do fator R de uma QR (mesma tolerância do `matrix_rank` sobre a matriz n x k)."""
+        if r.size == 0:
+            return 0
+        sv = np.linalg.svd(r, compute_uv=False)
+        return int((sv > sv.max() * max(n, r.shape[1]) * np.finfo(np.float64).eps).sum())
+
+    def _constante(self, a: _Amostra, xs: Sequence[str], xb: np.ndarray) -> Tuple[bool, int]:
+        """
+        Se os regressores contêm (ou geram) uma constante, como o `has_constant` do
+        linearmodels: as dummies de região junto com as variáveis regionais costumam gerar.
+        Também barra regressores colineares, como o `check_rank` na criação do modelo.
+        """
+        n, k = xb.shape
+        uns = np.all(xb == 1, axis=0)
+        fixas = (np.ptp(xb, axis=0) == 0) & ~np.all(xb == 0, axis=0)
+        # fator R de [X, 1]: o bloco k x k dá o posto de X e o fator inteiro, o de [X, 1]
+        r = np.linalg.qr(np.column_stack([xb, np.ones(n)]), mode='r')
+        posto = self._posto(r[:k, :k], n)
+        if posto < k:
+            raise ValueError("exog does not have full column rank (regressores colineares: "
+                             + ", ".join(xs) + ").")
+        if uns.any() or fixas.any():
+            return True, int(np.flatnonzero(uns if uns.any() else fixas)[0])
+        tem = self._posto(r, n) == posto and n > k
+        return bool(tem), int(np.argmin(xb.var(0) / np.abs(xb).max(0))) if tem else -1
+
+    def _verificar_absorcao(self, xt: np.ndarray, nomes: Sequence[str]) -> None:
+        """Falha, como o `check_absorbed` do linearmodels, se algum regressor foi absorvido pelos efeitos."""
+        k = xt.shape[1]
+        posto = self._posto(np.linalg.qr(xt, mode='r'), xt.shape[0])
+        if posto == k:
+            return
+        autovalores, autovetores = np.linalg.eigh(xt.T @ xt)
+        envolvidas = set()
+        for i in np.argsort(autovalores)[:k - posto]:
+            v = np.abs(autovetores[:, i])
+            envolvidas.update(np.flatnonzero(v > v.max() * np.finfo(np.float64).eps * len(v)))
+        raise ValueError("Variáveis absorvidas pelos efeitos de entidade: "
+                         + ", ".join(nomes[i] for i in sorted(envolvidas)))
+
+    def _covariancia(self, esp: Especificacao, a: _Amostra, x: np.ndarray, e: np.ndarray,
+                     xtx_inv: np.ndarray, escala: float) -> np.ndarray:
+        if esp.cov_type == 'unadjusted':
+            out = escala * float(e @ e) / a.n * xtx_inv
+        elif esp.cov_type == 'robust':
+            xe = x * e[:, None]
+            out = escala * xtx_inv @ (xe.T @ xe) @ xtx_inv
+        elif esp.cov_type == 'clustered':
+            # scores somados por entidade: uma bincount por regressor
+            s = np.column_stack([np.bincount(a.grupos, weights=x[:, j] * e, minlength=a.n_grupos)
+                                 for j in range(x.shape[1])])
+            out = escala * xtx_inv @ (s.T @ s) @ xtx_inv
+        else:
+            raise ValueError(f"cov_type não suportado: '{esp.cov_type}'")
+        return (out + out.T) / 2
+
+    def ajustar(self, esp: Especificacao) -> ResultadoPainel:
+        """Estima uma especificação reaproveitando as peças em cache da amostra."""
+        if esp.estimador not in ESTIMADORES:
+            raise ValueError(f"Estimador desconhecido: '{esp.estimador}'")
+        a = self._amostra(esp)
+        y, xs = esp.dependente, list(esp.regressores)
+        k, n = len(xs), a.n
+        bruta = lambda nome: a.bruta(nome, self.coluna(nome))
+        centrada = lambda nome: a.centrada(nome, self.coluna(nome))
+        yb = bruta(y)
+        xb = np.column_stack([bruta(c) for c in xs])
+        ymed = a.media_entidade(y, self.coluna(y))
+        xmed = np.column_stack([a.media_entidade(c, self.coluna(c)) for c in xs])
+        # médias gerais a partir das somas por entidade já guardadas
+        yg = float(a.somas[y].sum()) / n
+        xg = np.array([a.somas[c].sum() for c in xs]) / n
+        constante, pos_constante = self._constante(a, xs, xb)
+        yw = centrada(y)
+        xw = np.column_stack([centrada(c) for c in xs])
+        # within (com a média geral devolvida quando há constante, como no linearmodels)
+        xtx_w, xty_w = self._sistema(a, 'centrada', y, xs, centrada)
+        if constante:
+            xtx_w = xtx_w + n * np.outer(xg, xg)
+            xty_w = xty_w + n * xg * yg
+        info = {}
+
+        if esp.estimador == 'fe':
+            yt, xt = (yw + yg, xw + xg) if constante else (yw, xw)
+            self._verificar_absorcao(xt, xs)
+            params = np.linalg.solve(xtx_w, xty_w)
+            xtx = xtx_w
+            efeitos = a.n_grupos - constante
+            df_resid = n - k - efeitos
+            extra_df = 0 if esp.cov_type == 'clustered' else efeitos  # entidades aninhadas nos clusters
+            total_ss = float(yw @ yw)
+        else:
+            df_resid, extra_df = n - k, 0
+            if esp.estimador == 'pooled':
+                yt, xt = yb, xb
+                xtx, xty = self._sistema(a, 'bruta', y, xs, bruta)
+                params = np.linalg.solve(xtx, xty)
+            else:
+                # componentes de variância (Swamy-Arora) a partir das peças within e between
+                ec = (yw - xw @ np.linalg.solve(xtx_w, xty_w)) if not constante else \
+                    (yw + yg) - (xw + xg) @ np.linalg.solve(xtx_w, xty_w)
+                sigma2_e = float(ec @ ec) / (n - k - a.n_grupos + 1)
+                u = ymed - xmed @ np.linalg.lstsq(xmed, ymed, rcond=None)[0]
+                t_bar = a.n_grupos / (1.0 / a.contagem).sum()
+                sigma2_u = max(0.0, float(u @ u) / (a.n_grupos - k) - sigma2_e / t_bar)
+                theta = 1.0 - np.sqrt(sigma2_e / (a.contagem * sigma2_u + sigma2_e))
+                yt = yb - (theta * ymed)[a.grupos]
+                xt = xb - (theta[:, None] * xmed)[a.grupos]
+                params = np.linalg.lstsq(xt, yt, rcond=None)[0]
+                xtx = xt.T @ xt
+                info.update(sigma2_eps=sigma2_e, sigma2_effects=sigma2_u,
+                            rho=sigma2_u / (sigma2_u + sigma2_e), theta=theta)
+            yc = yt - yt.mean() if constante else yt
+            total_ss = float(yc @ yc)
+
+        e = yt - xt @ params
+        rss = float(e @ e)
+        escala = n / (n - extra_df - k)
+        cov = self._covariancia(esp, a, xt, e, np.linalg.inv(xtx), escala)
+
+        # R² alternativos (between, within, overall), com média só quando há constante
+        eb = ymed - xmed @ params
+        tb = ymed - ymed.mean() if constante else ymed
+        eo = yb - xb @ params
+        to = yb - yg if constante else yb
+        ew = yw - xw @ params
+        sigma2 = rss / n
+        # F homocedástico e F robusto (Wald), ambos sem o parâmetro da constante
+        gl = k - constante
+        fc = yt - yt.mean() if constante else yt
+        sel = np.ones(k, dtype=bool)
+        if constante:
+            sel[pos_constante] = False
+        wald = float(params[sel] @ np.linalg.solve(cov[np.ix_(sel, sel)], params[sel])) / gl if gl else np.nan
+        info.update(
+            nobs=n, df_resid=df_resid, df_model=k + (efeitos if esp.estimador == 'fe' else 0),
+            has_constant=constante, resid_ss=rss, total_ss=total_ss,
+            rsquared=1 - rss / total_ss if total_ss > 0 else 0.0,
+            rsquared_between=1 - float(eb @ eb) / float(tb @ tb) if float(tb @ tb) > 0 else 0.0,
+            rsquared_overall=1 - float(eo @ eo) / float(to @ to) if float(to @ to) > 0 else 0.0,
+            rsquared_within=1 - float(ew @ ew) / float(yw @ yw) if float(yw @ yw) > 0 else 0.0,
+            loglik=-0.5 * n * (np.log(2 * np.pi) + np.log(sigma2) + 1) if sigma2 > 0 else np.nan,
+            f_statistic=_teste_f(((float(fc @ fc) - rss) / gl) / (rss / df_resid) if rss > 0 and gl else np.nan,
+                                 gl, df_resid),
+            f_statistic_robust=_teste_f(wald, gl, df_resid),
+            entity_info=_estrutura(a.grupos), time_info=_estrutura(a.tempos),
+        )
+        if esp.estimador == 'fe':
+            # F de poolability: pooled com média geral contra o modelo com efeitos
+            xtx_b, xty_b = self._sistema(a, 'bruta', y, xs, bruta)
+            xtx_p = xtx_b - n * np.outer(xg, xg)
+            xty_p = xty_b - n * xg * yg
+            yty_p = a.produto('bruta', y, y, yb, yb) - n * yg * yg
+            rss_p = yty_p - float(xty_p @ np.linalg.lstsq(xtx_p, xty_p, rcond=None)[0])
+            gl_p = a.n_grupos - 1
+            info['f_pooled'] = _teste_f((rss_p - rss) / gl_p / (rss / df_resid), gl_p, df_resid)
+        return ResultadoPainel(esp, params, cov, info)
+
+    def ajustar_todas(self, especificacoes: Sequence[Especificacao]) -> List[ResultadoPainel]:
+        return [self.ajustar(esp) for esp in especificacoes]
+
+
+# ------------------------------
+# Execução paralela
+# ------------------------------
+class _MemoriaCompartilhada:
+    """Copia vetores numpy para blocos de memória compartilhada; os processos só recebem os nomes."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        from multiprocessing import shared_memory
+        self.blocos = []
+        self.descritores = {}
+        for chave, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            bloco = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=bloco.buf)[...] = arr
+            self.blocos.append(bloco)
+            self.descritores[chave] = (bloco.name, arr.shape, arr.dtype.str)
+
+    def __enter__(self):
+        return self.descritores
+
+    def __exit__(self, *exc):
+        for bloco in self.blocos:
+            bloco.close()
+            bloco.unlink()
+
+
+_ESPACO_TRABALHADOR: Optional[EspacoPainel] = None
+_DIMENSOES_TRABALHADOR: Dict[str, np.ndarray] = {}
+_BLOCOS_TRABALHADOR: list = []
+
+
+def _iniciar_trabalhador(descritores: dict) -> None:
+    """Initializer do pool: monta o espaço do processo sobre a memória compartilhada (sem cópia)."""
+    from multiprocessing import shared_memory
+    global _ESPACO_TRABALHADOR
+    arrays = {}
+    for chave, (nome, forma, tipo) in descritores.items():
+        bloco = shared_memory.SharedMemory(name=nome)
+        _BLOCOS_TRABALHADOR.append(bloco)  # mantém o mapeamento vivo enquanto o processo existir
+        arrays[chave] = np.ndarray(forma, dtype=np.dtype(tipo), buffer=bloco.buf)
+    colunas = {c[4:]: v for c, v in arrays.items() if c.startswith('col:')}
+    amostras = {c[8:]: v for c, v in arrays.items() if c.startswith('amostra:')}
+    _DIMENSOES_TRABALHADOR.update({c[4:]: v for c, v in arrays.items() if c.startswith('dim:')})
+    _ESPACO_TRABALHADOR = EspacoPainel.de_arrays(colunas, arrays['entidades'], arrays['tempos'], amostras)
+
+
+def _ajustar_no_trabalhador(esp: Especificacao) -> ResultadoPainel:
+    return _ESPACO_TRABALHADOR.ajustar(esp)
+
+
+def _arrays_compartilhados(espaco: EspacoPainel, especificacoes: Sequence[Especificacao]) -> Dict[str, np.ndarray]:
+    """Vetores que os trabalhadores precisam para as especificações (chaves lidas por `_iniciar_trabalhador`)."""
+    variaveis = sorted({v for esp in especificacoes for v in (esp.dependente,) + tuple(esp.regressores)})
+    arrays = {f'col:{v}': espaco.coluna(v) for v in variaveis}
+    arrays['entidades'] = espaco.entidades
+    arrays['tempos'] = espaco.tempos
+    for nome in {esp.amostra for esp in especificacoes if esp.amostra is not None}:
+        arrays[f'amostra:{nome}'] = espaco.amostras[nome]
+    return arrays
+
+
+def ajustar_em_paralelo(espaco: EspacoPainel, especificacoes: Sequence[Especificacao],
+                        n_processos: int) -> List[ResultadoPainel]:
+    """
+    Estima as especificações num pool de processos. Os vetores do painel ficam em
+    memória compartilhada (nada do painel é serializado para os processos) e os
+    resultados voltam na ordem de `especificacoes`, iguais aos da execução serial.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    especificacoes = list(especificacoes)
+    n_processos = min(n_processos, len(especificacoes))
+    if n_processos <= 1:
+        return espaco.ajustar_todas(especificacoes)
+    with _MemoriaCompartilhada(_arrays_compartilhados(espaco, especificacoes)) as descritores:
+        with ProcessPoolExecutor(max_workers=n_processos, initializer=_iniciar_trabalhador,
+                                 initargs=(descritores,)) as pool:
+            # chunksize=1: cada especificação vai para o primeiro processo livre
+            return list(pool.map(_ajustar_no_trabalhador, especificacoes))
+
+
+# ------------------------------
+# Wild cluster bootstrap
+# ------------------------------
+PESOS_BOOTSTRAP = ('rademacher', 'webb')
+_WEBB = np.array([-np.sqrt(1.5), -1.0, -np.sqrt(0.5), np.sqrt(0.5), 1.0, np.sqrt(1.5)])
+
+
+def _sortear_pesos(rng: np.random.Generator, tipo: str, forma: tuple) -> np.ndarray:
+    """Pesos por cluster: Rademacher (±1) ou Webb (seis pontos, melhor com poucos clusters)."""
+    if tipo == 'rademacher':
+        return rng.integers(0, 2, size=forma).astype(np.float64) * 2 - 1
+    if tipo == 'webb':
+        return _WEBB[rng.integers(0, 6, size=forma)]
+    raise ValueError(f"Pesos de bootstrap desconhecidos: '{tipo}' (use {PESOS_BOOTSTRAP})")
+
+
+def _lote_bootstrap(pecas: dict, semente, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    `n` réplicas de uma vez, só com quantidades por cluster (nada de n_obs):
+    beta* - beta = A S' v e os scores da réplica são v_g s_g - H_g (beta* - beta).
+    Retorna |t*| restrito (WCR, um por coeficiente) e t* irrestrito (WCU), ambos n x k.
+    """
+    a, h, escala = pecas['A'], pecas['H'], pecas['escala']
+    v = _sortear_pesos(np.random.default_rng(semente), pecas['pesos'], (n, h.shape[0]))
+    k = a.shape[0]
+
+    def _t(s: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        delta = (v @ s) @ a                                                   # n x k
+        scores = v[:, :, None] * s[None] - np.einsum('gjm,bm->bgj', h, delta)  # n x G x k
+        var = escala * np.square(scores @ a).sum(axis=1)                      # diagonal do sanduíche
+        return delta, np.sqrt(var)
+
+    delta_u, ep_u = _t(pecas['S'])
+    t_wcr = np.empty((n, k))
+    for j in range(k):
+        # nula beta_j = 0 imposta: beta*_j = delta_j
+        delta_r, ep_r = _t(pecas['S_restrito'][j])
+        t_wcr[:, j] = np.abs(delta_r[:, j] / ep_r[:, j])
+    return t_wcr, delta_u / ep_u
+
+
+def bootstrap_selvagem(espaco: EspacoPainel, esp: Especificacao, n_replicas: int = 9999,
+                       pesos: str = 'rademacher', nivel: float = 0.95, semente: int = 12345,
+                       n_processos: int = 1, memoria_lote: float = 64e6) -> pd.DataFrame:
+    """
+    Wild cluster bootstrap (clusters = entidades) de uma especificação FE, sobre as
+    colunas já centradas do espaço. P-valores pelo bootstrap-t restrito (WCR, nula
+    imposta coeficiente a coeficiente) e IC pelo bootstrap-t irrestrito (WCU,
+    simétrico). As réplicas saem em lotes de produtos matriciais; os lotes têm
+    sementes próprias, então o resultado não depende de `n_processos`.
+    """
+    if esp.estimador != 'fe':
+        raise ValueError("O wild cluster bootstrap está implementado para especificações FE.")
+    res = espaco.ajustar(esp)
+    a = espaco._amostra(esp)
+    xs, y = list(esp.regressores), esp.dependente
+    xt = np.column_stack([a.centrada(c, espaco.coluna(c)) for c in xs])
+    yt = a.centrada(y, espaco.coluna(y))
+    if res.has_constant:
+        xt = xt + np.array([a.somas[c].sum() for c in xs]) / a.n
+        yt = yt + float(a.somas[y].sum()) / a.n
+    k, g = len(xs), a.n_grupos
+    params = res.params.to_numpy()
+    xtx = xt.T @ xt
+    soma_cluster = lambda w: np.bincount(a.grupos, weights=w, minlength=g)
+
+    h = np.empty((g, k, k))
+    for j in range(k):
+        for m in range(j, k):
+            h[:, j, m] = h[:, m, j] = soma_cluster(xt[:, j] * xt[:, m])
+    e = yt - xt @ params
+    s = np.column_stack([soma_cluster(xt[:, j] * e) for j in range(k)])
+    s_restrito = np.empty((k, g, k))
+    for j in range(k):
+        livres = [m for m in range(k) if m != j]
+        beta = np.linalg.solve(xtx[np.ix_(livres, livres)], xt[:, livres].T @ yt) if livres else np.empty(0)
+        e_r = yt - xt[:, livres] @ beta
+        s_restrito[j] = np.column_stack([soma_cluster(xt[:, m] * e_r) for m in range(k)])
+    extra_df = 0 if esp.cov_type == 'clustered' else a.n_grupos - res.has_constant
+    pecas = {'A': np.linalg.inv(xtx), 'H': h, 'S': s, 'S_restrito': s_restrito,
+             'escala': a.n / (a.n - extra_df - k), 'pesos': pesos}
+
+    tamanho = max(1, min(n_replicas, int(memoria_lote // (8 * g * k * 3))))
+    lotes = [min(tamanho, n_replicas - i) for i in range(0, n_replicas, tamanho)]
+    sementes = np.random.SeedSequence(semente).spawn(len(lotes))
+    if n_processos > 1 and len(lotes) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(n_processos, len(lotes))) as pool:
+            partes = list(pool.map(_lote_bootstrap, [pecas] * len(lotes), sementes, lotes))
+    else:
+        partes = [_lote_bootstrap(pecas, sm, n) for sm, n in zip(sementes, lotes)]
+    t_wcr = np.vstack([p[0] for p in partes])
+    t_wcu = np.vstack([p[1] for p in partes])
+
+    t = np.abs(res.tstats.to_numpy())
+    q = np.quantile(np.abs(t_wcu), nivel, axis=0)
+    ep = res.std_errors.to_numpy()
+    saida = pd.DataFrame({
+        'pvalue': res.pvalues.to_numpy(),
+        'pvalue_boot': (t_wcr >= t[None, :]).mean(axis=0),
+        'lower': res.conf_int(nivel)['lower'].to_numpy(),
+        'upper': res.conf_int(nivel)['upper'].to_numpy(),
+        'lower_boot': params - q * ep,
+        'upper_boot': params + q * ep,
+    }, index=xs)
+    saida.attrs.update(n_replicas=n_replicas, pesos=pesos, nivel=nivel, n_clusters=g, semente=semente)
+    return saida
+
+
+def texto_bootstrap(tabela: pd.DataFrame) -> str:
+    """Quadro do bootstrap para acompanhar o sumário do modelo (analítico ao lado do bootstrap)."""
+    from linearmodels.shared.io import _str, pval_format
+
+    at = tabela.attrs
+    nivel = int(round(at['nivel'] * 100))
+    titulo = (f"Wild cluster bootstrap ({at['n_replicas']} réplicas, pesos {at['pesos']}, "
+              f"{at['n_clusters']} clusters; p-valor WCR, IC {nivel}% WCU)")
+    largura = max(len(str(i)) for i in tabela.index) + 2
+    cab = ["P-value", "P (boot)", "Lower CI", "Upper CI", "Lower (boot)", "Upper (boot)"]
+    cabecalho = " " * largura + "".join(f"{c:>13}" for c in cab)
+    regua = max(len(titulo), len(cabecalho))
+    linhas = [titulo, "=" * regua, cabecalho, "-" * regua]
+    for nome, r in tabela.iterrows():
+        valores = [pval_format(r['pvalue']), pval_format(r['pvalue_boot']), _str(r['lower']),
+                   _str(r['upper']), _str(r['lower_boot']), _str(r['upper_boot'])]
+        linhas.append(f"{nome:<{largura}}" + "".join(f"{v.strip():>13}" for v in valores))
+    linhas.append("=" * regua)
+    return "\n".join(linhas)
+
+
+# ------------------------------
+# Grade de subgrupos
+# ------------------------------
+TODOS = 'Todos'                # rótulo de uma dimensão que não foi fixada na célula
+SEM_RECORTE = 'amostra_completa'
+MIN_OBS_CELULA = 100           # células menores são registradas sem estimar
+_CELULA = '__celula__'         # amostra temporária do espaço durante o ajuste de uma célula
+COLUNAS_GRADE = ('modelo', 'dimensoes', 'variavel', 'coef', 'erro_padrao', 'p_valor',
+                 'n_obs', 'n_entidades', 'status')
+
+
+def _codificar_dimensoes(dimensoes: Dict[str, pd.Series]) -> Tuple[Dict[str, np.ndarray], Dict[str, list]]:
+    """Códigos inteiros (-1 = sem rótulo: a linha só entra nas células em que a dimensão não é fixada) e rótulos."""
+    codigos, rotulos = {}, {}
+    for nome, valores in dimensoes.items():
+        c, r = pd.factorize(pd.Series(valores).to_numpy(), sort=True)
+        codigos[nome] = c.astype(np.int16)
+        rotulos[nome] = [str(v) for v in r]
+    return codigos, rotulos
+
+
+def celulas_grade(codigos: Dict[str, np.ndarray], max_dimensoes: Optional[int] = None) -> List[tuple]:
+    """
+    Células observadas da grade: a amostra completa (tupla vazia) e cada combinação de
+    valores de 1 a `max_dimensoes` dimensões, como tuplas ((dimensão, código), ...).
+    """
+    from itertools import combinations
+    nomes = list(codigos)
+    celulas = [()]
+    for k in range(1, min(max_dimensoes or len(nomes), len(nomes)) + 1):
+        for combo in combinations(nomes, k):
+            # a combinação vira um inteiro só (base = nº de rótulos de cada dimensão) e sai de um np.unique
+            bases = [int(codigos[d].max()) + 1 for d in combo]
+            if min(bases) <= 0:
+                continue
+            chave = np.zeros(len(codigos[combo[0]]), dtype=np.int64)
+            presentes = np.ones(len(chave), dtype=bool)
+            for d, b in zip(combo, bases):
+                chave = chave * b + codigos[d]
+                presentes &= codigos[d] >= 0
+            for valor in np.unique(chave[presentes]):
+                partes = []
+                for d, b in zip(reversed(combo), reversed(bases)):
+                    valor, c = divmod(int(valor), b)
+                    partes.append((d, c))
+                celulas.append(tuple(reversed(partes)))
+    return celulas
+
+
+def _estimar_na_celula(espaco: EspacoPainel, esp: Especificacao, mascara: np.ndarray, min_obs: int) -> List[tuple]:
+    """Linhas (modelo, variável, coef, ep, p, n, entidades, status) de uma especificação restrita à célula."""
+    valida = mascara & espaco.amostras[esp.amostra]
+    for nome in (esp.dependente,) + tuple(esp.regressores):
+        valida &= np.isfinite(espaco.coluna(nome))
+    n = int(valida.sum())
+    if n < min_obs:
+        n_ent = len(np.unique(espaco.entidades[valida]))
+        return [(esp.nome, x, np.nan, np.nan, np.nan, n, n_ent, 'poucas observações') for x in esp.regressores]
+    espaco.definir_amostra(_CELULA, valida)
+    base = esp._replace(amostra=_CELULA)
+    a = espaco._amostra(base)
+    # regressores sem variação na célula (ex.: a dummy e as variáveis regionais dentro de uma região;
+    # no FE, sem variação dentro do cliente) saem da especificação em vez de derrubar o ajuste
+    mantidos, sem_variacao = [], []
+    for x in esp.regressores:
+        bruta = a.bruta(x, espaco.coluna(x))
+        v = a.centrada(x, espaco.coluna(x)) if esp.estimador == 'fe' else bruta - bruta[0]
+        (mantidos if np.abs(v).max() > 1e-10 * max(np.abs(bruta).max(), 1.0) else sem_variacao).append(x)
+    linhas = [(esp.nome, x, np.nan, np.nan, np.nan, a.n, a.n_grupos, 'sem variação na célula') for x in sem_variacao]
+    gl = a.n - len(mantidos) - (a.n_grupos if esp.estimador == 'fe' else 0)
+    status = None
+    if not mantidos:
+        status = 'sem regressores com variação'
+    elif gl <= 0:
+        status = 'sem graus de liberdade'
+    else:
+        try:
+            with np.errstate(all='ignore'):
+                res = espaco.ajustar(base._replace(regressores=tuple(mantidos)))
+        except (ValueError, np.linalg.LinAlgError) as e:
+            status = f'não estimado: {e}'
+    if status is not None:
+        return [(esp.nome, x, np.nan, np.nan, np.nan, a.n, a.n_grupos, status) for x in mantidos] + linhas
+    return [(esp.nome, x, float(res.params[x]), float(res.std_errors[x]), float(res.pvalues[x]),
+             a.n, a.n_grupos, 'ok') for x in mantidos] + linhas
+
+
+def _ajustar_celula(espaco: EspacoPainel, codigos: Dict[str, np.ndarray], especificacoes: Sequence[Especificacao],
+                    celula: tuple, min_obs: int) -> List[tuple]:
+    """
+    Todas as especificações numa célula. Especificações com a mesma amostra válida
+    reaproveitam as colunas centradas e os produtos cruzados da célula, que são
+    descartados ao final (a memória não cresce com o número de células).
+    """
+    mascara = np.ones(espaco.n, dtype=bool)
+    for nome, codigo in celula:
+        mascara &= codigos[nome] == codigo
+    try:
+        return [linha for esp in especificacoes for linha in _estimar_na_celula(espaco, esp, mascara, min_obs)]
+    finally:
+        espaco._cache.clear()
+        espaco.amostras.pop(_CELULA, None)
+
+
+def _ajustar_celula_no_trabalhador(especificacoes: Sequence[Especificacao], min_obs: int,
+                                   celula: tuple) -> List[tuple]:
+    return _ajustar_celula(_ESPACO_TRABALHADOR, _DIMENSOES_TRABALHADOR, especificacoes, celula, min_obs)
+
+
+def estimar_grade(espaco: EspacoPainel, especificacoes: Sequence[Especificacao], dimensoes: Dict[str, pd.Series],
+                  n_processos: int = 1, max_dimensoes: Optional[int] = None,
+                  min_obs: int = MIN_OBS_CELULA) -> pd.DataFrame:
+    """
+    Estima as especificações em cada célula da grade de subgrupos (`dimensoes` mapeia o
+    nome da dimensão para os rótulos por linha, alinhados ao espaço; sem rótulo = NaN).
+    Com `n_processos` > 1 as células são repartidas num pool de processos, com o painel
+    e os códigos das dimensões em memória compartilhada.
+
+    Retorna uma tabela longa: uma linha por célula, modelo e regressor, com os rótulos
+    das dimensões (`TODOS` quando não fixadas), coeficiente, erro-padrão, p-valor, N,
+    número de entidades e `status` ('ok' ou o motivo de não haver estimativa).
+    """
+    from functools import partial
+
+    especificacoes = list(especificacoes)
+    codigos, rotulos = _codificar_dimensoes(dimensoes)
+    celulas = celulas_grade(codigos, max_dimensoes)
+    n_processos = min(n_processos, len(celulas))
+    if n_processos <= 1:
+        resultados = [_ajustar_celula(espaco, codigos, especificacoes, c, min_obs) for c in celulas]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        arrays = _arrays_compartilhados(espaco, especificacoes)
+        arrays.update({f'dim:{d}': c for d, c in codigos.items()})
+        with _MemoriaCompartilhada(arrays) as descritores:
+            with ProcessPoolExecutor(max_workers=n_processos, initializer=_iniciar_trabalhador,
+                                     initargs=(descritores,)) as pool:
+                resultados = list(pool.map(partial(_ajustar_celula_no_trabalhador, especificacoes, min_obs), celulas))
+
+    registros = []
+    for celula, linhas in zip(celulas, resultados):
+        fixas = dict(celula)
+        recorte = '+'.join(fixas) or SEM_RECORTE
+        valores = {d: rotulos[d][fixas[d]] if d in fixas else TODOS for d in codigos}
+        for modelo, variavel, coef, ep, p, n, n_ent, status in linhas:
+            registros.append({'modelo': modelo, 'dimensoes': recorte, **valores, 'variavel': variavel,
+                              'coef': coef, 'erro_padrao': ep, 'p_valor': p,
+                              'n_obs': n, 'n_entidades': n_ent, 'status': status})
+    ordem = ['modelo', 'dimensoes', *codigos, *COLUNAS_GRADE[2:]]
+    return pd.DataFrame.from_records(registros, columns=ordem)
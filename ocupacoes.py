@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+ocupacoes.py
+------------
+Classificação de `DS_OCUPACAO` em grupos de ocupação, compartilhada pelo notebook
+(`prepare_engineer`) e pelo `preparar_dados_app.py` (`tratar_dados`).
+
+A classificação é feita uma vez por valor distinto (poucos milhares de textos), não
+por linha: todos os grupos são testados numa única passada (autômato Aho-Corasick
+quando o pacote `pyahocorasick` está disponível) e o resultado volta para a coluna
+inteira com um `take` sobre os códigos. Vale a mesma precedência do laço original
+com `str.contains`: quando mais de um grupo casa, vence o último do mapa.
+
+Um cache persistente (texto -> grupo) evita reclassificar, nas rodadas mensais,
+ocupações já vistas antes.
+
+Uso:
+    import ocupacoes
+    df['grupo_ocupacao'] = ocupacoes.classificar(df['DS_OCUPACAO'], ocupacoes.OCUP_MAP)
+"""
+from __future__ import annotations
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import gravacao
+
+# opcional (autômato em C); sem ele, cai no teste por regex sobre os valores distintos
+try:
+    import ahocorasick
+except Exception:
+    ahocorasick = None
+
+# Mapa do notebook (nomes sem acento, usados nas dummies oc_*)
+OCUP_MAP = {
+    'Administracao': r'ADMINISTRADOR|CONTADOR|ANALISTA|CONSULTOR|ECONOMISTA',
+    'Servidor_Publico': r'SERVIDOR PUBLICO|DEPUTADO|PREFEITO|SECRETARIO|MAGISTRADO|PROCURADOR',
+    'Saude': r'MEDICO|ENFERMEIRO|FISIOTERAPEUTA|ODONTOLOGO|FARMACEUTICO|NUTRICIONISTA|FONOAUDIOLOGO|PSICOLOGO|TERAPEUTA',
+    'Educacao': r'PROFESSOR|ESTUDANTE|ESTAGIARIO|BOLSISTA|PEDAGOGO',
+    'Autonomo_Comercio': r'COMERCIANTE|AMBULANTE|TAXISTA|VENDEDOR|FEIRANTE|REPRESENTANTE COMERCIAL',
+    'Agropecuaria': r'AGRICULTOR|PECUARISTA|PESCADOR|AVICULTOR|RURAL|FLORICULTOR|AGRONOMO|AGROPECUARISTA',
+    'Industrial': r'MECANICO|ELETRICISTA|OPERADOR|CONSTRUCAO|MARCENEIRO|INDUSTRIARIO|SERRALHEIRO|TECNIC',
+    'Justica': r'ADVOGADO|DELEGADO|DEFENSOR|PROMOTOR|JUIZ|OFICIAL DE JUSTICA|TABELIAO|CARTORIO',
+    'Seguranca': r'POLICIAL|MILITAR|VIGILANTE|SEGURANCA|BOMBEIRO',
+    'Cultura_Comunicacao': r'MUSICO|ATOR|ARTESAO|JORNALISTA|ESCULTOR|PUBLICITARIO|FOTOGRAFO|LOCUTOR'
+}
+
+# Rótulos exibidos no app (mesmos padrões, mesma ordem)
+ROTULOS_APP = {
+    'Administracao': 'Administração',
+    'Servidor_Publico': 'Servidor Público',
+    'Saude': 'Saúde',
+    'Educacao': 'Educação',
+    'Autonomo_Comercio': 'Autônomo/Comércio',
+    'Agropecuaria': 'Agropecuária',
+    'Industrial': 'Industrial',
+    'Justica': 'Justiça',
+    'Seguranca': 'Segurança',
+    'Cultura_Comunicacao': 'Cultura/Comunicação',
+}
+OCUP_MAP_APP = {ROTULOS_APP[k]: v for k, v in OCUP_MAP.items()}
+
+DIRETORIO_CACHE = Path(__file__).parent / "cache" / "ocupacoes"
+_LITERAL = re.compile(r'^[\w ]+$')
+
+
+class ClassificadorOcupacao:
+    """
+    Classifica textos de ocupação segundo `mapa` (grupo -> regex), com `padrao`
+    para quem não casa com nenhum grupo (ou é nulo).
+    """
+
+    def __init__(self, mapa: Dict[str, str], padrao: str = 'Outros', usar_cache: bool = True,
+                 diretorio_cache=None):
+        self.mapa = dict(mapa)
+        self.grupos: List[str] = list(self.mapa)
+        self.padrao = padrao
+        self.conhecidos: Dict[str, str] = {}
+        self._automato = self._montar_automato()
+        self._regex = [re.compile(p, re.IGNORECASE) for p in self.mapa.values()]
+        self._caminho_cache = None
+        if usar_cache:
+            chave = json.dumps([list(self.mapa.items()), padrao], ensure_ascii=False)
+            digest = hashlib.sha256(chave.encode('utf-8')).hexdigest()[:16]
+            pasta = Path(diretorio_cache) if diretorio_cache is not None else DIRETORIO_CACHE
+            self._caminho_cache = pasta / f"ocupacoes_{digest}.json"
+            if self._caminho_cache.exists():
+                with open(self._caminho_cache, 'r', encoding='utf-8') as f:
+                    self.conhecidos = json.load(f)
+
+    def _montar_automato(self):
+        """Autômato único com todos os termos de todos os grupos (só quando os padrões são literais)."""
+        if ahocorasick is None:
+            return None
+        termos = [(t, i) for i, p in enumerate(self.mapa.values()) for t in p.split('|')]
+        if not all(_LITERAL.match(t) for t, _ in termos):
+            return None
+        automato = ahocorasick.Automaton()
+        for termo, i in termos:
+            termo = termo.upper()
+            anteriores = automato.get(termo, ())
+            automato.add_word(termo, tuple(anteriores) + (i,))
+        automato.make_automaton()
+        return automato
+
+    def _classificar_texto(self, texto: str) -> str:
+        if self._automato is not None:
+            indices = [i for _, grupos in self._automato.iter(texto.upper()) for i in grupos]
+            return self.grupos[max(indices)] if indices else self.padrao
+        # último grupo que casa vence: testa de trás para frente e para no primeiro acerto
+        for i in range(len(self._regex) - 1, -1, -1):
+            if self._regex[i].search(texto):
+                return self.grupos[i]
+        return self.padrao
+
+    def classificar_valores(self, valores: Sequence) -> List[str]:
+        """Classifica valores distintos, consultando e alimentando o cache."""
+        novos = {}
+        saida = []
+        for v in valores:
+            if not isinstance(v, str):
+                saida.append(self.padrao)
+                continue
+            g = self.conhecidos.get(v)
+            if g is None:
+                g = novos[v] = self._classificar_texto(v)
+            saida.append(g)
+        if novos:
+            self.conhecidos.update(novos)
+            self._salvar_cache()
+        return saida
+
+    def _salvar_cache(self) -> None:
+        if self._caminho_cache is None:
+            return
+        # notebook, preparar_dados_app e processos do pipeline podem gravar ao mesmo tempo
+        gravacao.gravar_json(self._caminho_cache, self.conhecidos)
+
+    def classificar(self, serie: pd.Series) -> pd.Series:
+        """
+        Classifica a coluna inteira trabalhando só com os valores distintos.
+        Retorna uma Series categórica (categorias observadas, em ordem alfabética).
+        """
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos = serie.cat.codes.to_numpy()
+            distintos = serie.cat.categories
+        else:
+            codigos, distintos = pd.factorize(serie, use_na_sentinel=True)
+        rotulos = self.classificar_valores(list(distintos))
+
+        categorias = sorted(set(rotulos) | {self.padrao})
+        posicao = {c: i for i, c in enumerate(categorias)}
+        # última posição da tabela = nulos (código -1 do factorize)
+        tabela = np.array([posicao[r] for r in rotulos] + [posicao[self.padrao]], dtype=np.int16)
+        codigos_grupo = np.take(tabela, codigos)  # -1 indexa a última posição (padrão)
+        resultado = pd.Categorical.from_codes(codigos_grupo, categories=categorias)
+        return pd.Series(resultado, index=serie.index, name=serie.name).cat.remove_unused_categories()
+
+
+_classificadores: Dict[tuple, ClassificadorOcupacao] = {}
+
+
+def classificar(serie: pd.Series, mapa: Optional[Dict[str, str]] = None, padrao: str = 'Outros') -> pd.Series:
+    """Atalho com um classificador reaproveitado por (mapa, padrão) dentro do processo."""
+    mapa = OCUP_MAP if mapa is None else mapa
+    chave = (tuple(mapa.items()), padrao)
+    if chave not in _classificadores:
+        _classificadores[chave] = ClassificadorOcupacao(mapa, padrao=padrao)
+    return _classificadores[chave].classificar(serie)
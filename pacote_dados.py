@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+pacote_dados.py
+---------------
+Pacote único e versionado com as tabelas agregadas do app (`app_data/pacote_app.arrow`).
+
+Antes o `preparar_dados_app.py` gravava sete CSVs soltos e o `app.py` os reinterpretava
+a cada carga a frio (`pd.read_csv` + `pd.to_datetime` em `anomes`), sem esquema nem
+versão. O pacote guarda as sete tabelas num só arquivo:
+
+* cada tabela é um stream Arrow IPC sem compressão, com tipos fixos: textos como
+  dicionários (category no pandas), `anomes` como data e números como estão;
+* no fim do arquivo vai um manifesto JSON com a versão do esquema, o hash SHA-256 do
+  conteúdo das tabelas e a posição de cada uma;
+* o arquivo é escrito num temporário e publicado com `os.replace`: o app nunca lê um
+  pacote pela metade nem mistura tabelas de duas execuções.
+
+A leitura mapeia o arquivo em memória (`pa.memory_map`) e as colunas numéricas sem
+nulos chegam ao pandas sem cópia. O app usa o hash do manifesto como chave do cache:
+os dados só são relidos quando o conteúdo muda.
+
+Layout: [stream 1] ... [stream N] [manifesto JSON] [tamanho do manifesto: 8 bytes] [ASSINATURA]
+
+Uso:
+    pacote_dados.gravar_pacote({'dados_mapa_uf': agg_mapa, ...}, caminho)
+    manifesto = pacote_dados.ler_manifesto(caminho)      # barato: só o fim do arquivo
+    tabelas = pacote_dados.ler_pacote(caminho)            # {nome: DataFrame}
+
+    python pacote_dados.py --de-csv app_data              # monta o pacote a partir dos CSVs antigos
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import struct
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+import pandas as pd
+
+import gravacao
+
+try:
+    import pyarrow as pa
+except Exception:
+    pa = None
+
+VERSAO_ESQUEMA = 1
+NOME_ARQUIVO = "pacote_app.arrow"
+ASSINATURA = b"PACOTE01"
+# Tabelas do app, na ordem em que `carregar_dados_agregados` as devolve (nome = nome do antigo CSV)
+TABELAS = (
+    'dados_agregados_filtros',
+    'dados_mapa_uf',
+    'distribuicao_diversificacao',
+    'evolucao_temporal_regional',
+    'perfil_investidor_agregado',
+    'ocupacao_agregado',
+    'interacao_renda_complex_agregado',
+)
+COLUNAS_DATA = ('anomes',)
+# Estimativas por subgrupo (grade do notebook): pacote à parte, regravado só quando a grade é reestimada
+NOME_GRADE = "estimativas_subgrupos.arrow"
+TABELA_GRADE = 'estimativas_subgrupos'
+
+
+def _exigir_pyarrow():
+    if pa is None:
+        raise ImportError("O pacote de dados do app requer pyarrow (pip install pyarrow).")
+
+
+def tipar(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipos fixos do pacote: textos viram category, colunas de data viram datetime64 e o índice é descartado."""
+    df = df.reset_index(drop=True)
+    for col in df.columns:
+        if col in COLUNAS_DATA and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col])
+        elif df[col].dtype == object:
+            df[col] = df[col].astype('category')
+    return df
+
+
+def _stream(df: pd.DataFrame) -> bytes:
+    tabela = pa.Table.from_pandas(tipar(df), preserve_index=False)
+    saida = pa.BufferOutputStream()
+    with pa.ipc.new_stream(saida, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+    return saida.getvalue().to_pybytes()
+
+
+def gravar_pacote(tabelas: Mapping[str, pd.DataFrame], caminho) -> Dict:
+    """
+    Grava as tabelas (na ordem de `TABELAS`, seguidas de eventuais extras) num único
+    arquivo, publicado atomicamente. Retorna o manifesto gravado.
+    """
+    _exigir_pyarrow()
+    caminho = Path(caminho)
+    nomes = [n for n in TABELAS if n in tabelas] + [n for n in tabelas if n not in TABELAS]
+    conteudo = hashlib.sha256()
+    conteudo.update(f"esquema={VERSAO_ESQUEMA}".encode())
+
+    def escrever(temporario: str) -> Dict:
+        indice, posicao = {}, 0
+        with open(temporario, 'wb') as f:
+            for nome in nomes:
+                dados = _stream(tabelas[nome])
+                conteudo.update(nome.encode() + b"\0" + dados)
+                f.write(dados)
+                indice[nome] = {'inicio': posicao, 'tamanho': len(dados), 'linhas': int(len(tabelas[nome]))}
+                posicao += len(dados)
+            manifesto = {
+                'versao_esquema': VERSAO_ESQUEMA,
+                'hash': conteudo.hexdigest(),
+                'criado_em': datetime.now().isoformat(timespec='seconds'),
+                'tabelas': indice,
+            }
+            bruto = json.dumps(manifesto, ensure_ascii=False).encode('utf-8')
+            f.write(bruto)
+            f.write(struct.pack('<Q', len(bruto)))
+            f.write(ASSINATURA)
+            f.flush()
+            os.fsync(f.fileno())
+        return manifesto
+
+    # o notebook e o preparar_dados_app.py podem publicar ao mesmo tempo
+    return gravacao.substituir(caminho, escrever)
+
+
+def ler_manifesto(caminho) -> Dict:
+    """Manifesto do pacote (lê só o fim do arquivo). ValueError se o arquivo não for um pacote válido."""
+    with open(caminho, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        total = f.tell()
+        fim = len(ASSINATURA) + 8
+        if total < fim:
+            raise ValueError(f"'{caminho}' não é um pacote de dados do app.")
+        f.seek(total - fim)
+        rodape = f.read(fim)
+        if rodape[8:] != ASSINATURA:
+            raise ValueError(f"'{caminho}' não é um pacote de dados do app.")
+        (tamanho,) = struct.unpack('<Q', rodape[:8])
+        f.seek(total - fim - tamanho)
+        manifesto = json.loads(f.read(tamanho).decode('utf-8'))
+    if manifesto.get('versao_esquema') != VERSAO_ESQUEMA:
+        raise ValueError(f"Pacote '{caminho}' na versão de esquema {manifesto.get('versao_esquema')}; "
+                         f"esperada {VERSAO_ESQUEMA}. Rode o preparar_dados_app.py de novo.")
+    return manifesto
+
+
+def versao(caminho) -> Optional[str]:
+    """Hash do conteúdo do pacote (None se o arquivo não existir)."""
+    caminho = Path(caminho)
+    return ler_manifesto(caminho)['hash'] if caminho.exists() else None
+
+
+def ler_pacote(caminho, tabelas=None) -> Dict[str, pd.DataFrame]:
+    """
+    Tabelas do pacote (todas ou só `tabelas`) como DataFrames. O arquivo é mapeado em
+    memória; colunas numéricas sem nulos apontam para o mapa, sem cópia (e são só leitura).
+    """
+    _exigir_pyarrow()
+    manifesto = ler_manifesto(caminho)
+    mapa = pa.memory_map(str(caminho), 'r')
+    buffer = mapa.read_buffer()
+    resultado = {}
+    for nome, info in manifesto['tabelas'].items():
+        if tabelas is not None and nome not in tabelas:
+            continue
+        leitor = pa.ipc.open_stream(buffer.slice(info['inicio'], info['tamanho']))
+        resultado[nome] = leitor.read_all().to_pandas(split_blocks=True)
+    return resultado
+
+
+def pacote_de_csv(pasta, caminho=None) -> Dict:
+    """Monta o pacote a partir dos sete CSVs de uma pasta `app_data` no formato antigo."""
+    pasta = Path(pasta)
+    tabelas = {nome: pd.read_csv(pasta / f"{nome}.csv") for nome in TABELAS}
+    return gravar_pacote(tabelas, caminho or pasta / NOME_ARQUIVO)
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Pacote de dados do app (Arrow IPC versionado).")
+    parser.add_argument('caminho', nargs='?', type=Path, default=Path(__file__).parent / "app_data" / NOME_ARQUIVO,
+                        help="pacote a inspecionar (ou a gravar, com --de-csv)")
+    parser.add_argument('--de-csv', type=Path, metavar='PASTA',
+                        help="monta o pacote a partir dos CSVs da pasta")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = _argumentos(argv)
+    if args.de_csv is not None:
+        pacote_de_csv(args.de_csv, args.caminho)
+        print(f"Pacote gravado em: {args.caminho}")
+    try:
+        manifesto = ler_manifesto(args.caminho)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"ERRO: {e}")
+        return 1
+    print(f"Esquema v{manifesto['versao_esquema']}, hash {manifesto['hash'][:16]}, criado em {manifesto['criado_em']}")
+    for nome, info in manifesto['tabelas'].items():
+        print(f"  {nome}: {info['linhas']:,} linhas, {info['tamanho'] / 2**10:,.1f} KB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,562 @@
+# -*- coding: utf-8 -*-
+"""
+pipeline.py
+-----------
+Fluxo do notebook (`dados.ipynb`) em etapas nomeadas, com cache endereçado por conteúdo.
+
+O `main()` do notebook sempre refaz tudo: leitura, engenharia, todos os modelos e todas
+as figuras, mesmo quando só uma fórmula ou um gráfico mudou. Aqui cada etapa tem uma
+chave calculada antes de executar qualquer coisa, a partir de:
+
+* o hash da base de entrada (o SHA-256 do arquivo é reaproveitado enquanto tamanho e
+  mtime não mudarem, como no armazém);
+* o código da etapa: as funções do notebook que ela chama (com as funções do notebook
+  que estas usam) e os módulos do repositório de que depende;
+* os parâmetros de configuração que alteram o resultado, mais o valor em uso de toda
+  atribuição de nível superior do notebook que essas funções leem (`CONTROLES`,
+  `REGRESSORES_BASE`...), e as versões das bibliotecas;
+* as chaves das etapas de cima.
+
+Etapas (e o que fica guardado em `cache/etapas/<etapa>/<chave>/`):
+
+    dados        load_data                       (nada: só o hash da base entra nas chaves)
+    engenharia   prepare_engineer                painel.pkl, colunas.json e estatisticas.parquet
+    correlacao   grafico_correlacao              matriz_correlacao.png
+    modelos      ajustar_modelos, um por modelo  resultado.pkl (cada especificação tem a sua chave)
+    descritivas  estatisticas_descritivas        estatisticas_descritivas.csv
+    graficos     graficos_distribuicao           dispersão e boxplots (.png)
+    grade        estimar_grade_subgrupos         estimativas_subgrupos.csv e .arrow (republicado em app_data/)
+
+Uma etapa com a chave já no cache é pulada e seus arquivos são copiados para a pasta de
+resultados; a engenharia (e a leitura) só roda se alguma etapa abaixo precisar do
+painel. Com `MOTOR_ESTATISTICAS = 'blocos'`, descritivas e correlação saem da cópia
+colunar das suas variáveis (`estatisticas.parquet`), resumida por grupos de linhas em
+`N_PROCESSOS_ESTATISTICAS` processos: o painel não é carregado para elas.
+Mudar uma especificação em `especificacoes_modelos` reajusta só aquele modelo.
+O `sumarios_modelos.txt` é sempre remontado a partir das partes. `--force etapa` refaz
+a etapa e todas as que dependem dela. A `grade` (modelos por subgrupo) só entra nas etapas
+padrão com `GRADE_SUBGRUPOS = True`; `--etapas grade` a pede explicitamente. Com
+`AGREGADOS_APP = True` a engenharia também grava o pacote do app em PASTA_APP (ver
+engenharia.py); como a opção entra na chave, ligá-la refaz a engenharia uma vez.
+
+Uso:
+    python pipeline.py                                  # configuração do notebook
+    python pipeline.py --entrada dados_sinteticos.csv --resultados ./resultados_python
+    python pipeline.py --etapas modelos                 # só os modelos (e o que eles precisam)
+    python pipeline.py --etapas grade --definir N_PROCESSOS_MODELOS=4
+    python pipeline.py --force engenharia               # refaz a engenharia e tudo abaixo dela
+    python pipeline.py --definir WINSOR_GRUPOS="'ano'" --definir BOOTSTRAP_REPLICAS=199
+    python pipeline.py --plano                          # chaves e acertos, sem executar nada
+"""
+from __future__ import annotations
+import argparse
+import ast
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+from importlib import metadata
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+import armazem
+import carregamento
+import estatisticas
+import instrumentacao
+import memoria
+from desempenho import carregar_notebook
+
+DIRETORIO = Path(__file__).parent
+DIRETORIO_CACHE = DIRETORIO / "cache" / "etapas"
+ARQUIVO_HASHES = DIRETORIO_CACHE / "hashes_entrada.json"
+NOTEBOOK = DIRETORIO / "dados.ipynb"
+
+ETAPAS = ('dados', 'engenharia', 'correlacao', 'modelos', 'descritivas', 'graficos', 'grade')
+ACIMA = {
+    'dados': (),
+    'engenharia': ('dados',),
+    'correlacao': ('engenharia',),
+    'modelos': ('engenharia',),
+    'descritivas': ('engenharia',),
+    'graficos': ('engenharia',),
+    'grade': ('engenharia',),
+}
+# funções do notebook chamadas pela etapa e módulos do repositório de que ela depende
+CODIGO = {
+    'dados': (('load_data',), ('carregamento.py', 'armazem.py')),
+    'engenharia': (('prepare_engineer',), ('engenharia.py', 'estatisticas.py', 'memoria.py', 'ocupacoes.py')),
+    'correlacao': (('grafico_correlacao', 'bibliotecas_graficos'), ('memoria.py', 'estatisticas.py')),
+    'modelos': (('ajustar_modelos',), ('modelos_painel.py', 'memoria.py', 'engenharia.py')),
+    'descritivas': (('estatisticas_descritivas',), ('memoria.py', 'estatisticas.py')),
+    'graficos': (('graficos_distribuicao',), ('memoria.py', 'graficos.py')),
+    'grade': (('estimar_grade_subgrupos',), ('modelos_painel.py', 'memoria.py', 'pacote_dados.py', 'engenharia.py')),
+}
+# configurações do notebook que mudam o resultado (N_PROCESSOS_* só mudam o tempo); as
+# globais lidas pelas funções da etapa entram na chave sem precisar estar listadas aqui
+PARAMETROS = {
+    'dados': ('TAMANHO_BLOCO', 'USAR_ARMAZEM'),
+    'engenharia': ('WINSOR_GRUPOS', 'LAYOUT_COMPACTO', 'AGREGADOS_APP'),
+    'correlacao': ('MOTOR_ESTATISTICAS', 'VARIAVEIS_CORRELACAO'),
+    'modelos': ('MOTOR_MODELOS',),
+    'descritivas': ('MOTOR_ESTATISTICAS', 'VARIAVEIS_DESCRITIVAS'),
+    'graficos': ('MODO_GRAFICOS',),
+    'grade': ('DIMENSOES_GRADE', 'CONTROLES'),
+}
+BIBLIOTECAS = {
+    'dados': ('pandas', 'numpy', 'pyreadstat', 'pyarrow'),
+    'engenharia': ('pandas', 'numpy'),
+    'correlacao': ('pandas', 'numpy', 'pyarrow', 'matplotlib', 'seaborn'),
+    'modelos': ('pandas', 'numpy', 'scipy', 'linearmodels', 'statsmodels'),
+    'descritivas': ('pandas', 'numpy', 'pyarrow'),
+    'graficos': ('pandas', 'numpy', 'matplotlib', 'seaborn'),
+    'grade': ('pandas', 'numpy', 'scipy', 'pyarrow'),
+}
+# arquivos que cada etapa grava em RESULTS_DIR (os que existirem vão para o cache)
+# configurações do wild bootstrap: só os modelos FE o usam, então entram só na chave deles
+PARAMETROS_FE = ('BOOTSTRAP_REPLICAS', 'BOOTSTRAP_PESOS')
+# globais do notebook que não mudam o resultado (caminhos e número de processos)
+FORA_DA_CHAVE = ('INPUT_PATH', 'RESULTS_DIR', 'PASTA_APP')
+ARQUIVOS = {
+    'correlacao': ('matriz_correlacao.png',),
+    'descritivas': ('estatisticas_descritivas.csv',),
+    'graficos': ('scatter_diver_vs_renda.png', 'boxplot_diver_ocupacao.png', 'boxplot_diver_perfil.png'),
+    'grade': ('estimativas_subgrupos.csv', 'estimativas_subgrupos.arrow'),
+}
+
+
+# ------------------------------
+# Chaves
+# ------------------------------
+def _hash_texto(*partes) -> str:
+    return hashlib.sha256(json.dumps(partes, sort_keys=True, default=repr).encode('utf-8')).hexdigest()
+
+
+def hash_entrada(caminho: str) -> str:
+    """SHA-256 da base, reaproveitado enquanto tamanho e mtime do arquivo não mudarem."""
+    caminho = os.path.abspath(caminho)
+    st = os.stat(caminho)
+    try:
+        with open(ARQUIVO_HASHES, 'r', encoding='utf-8') as f:
+            hashes = json.load(f)
+    except Exception:
+        hashes = {}
+    anterior = hashes.get(caminho)
+    if anterior and anterior['tamanho'] == st.st_size and anterior['mtime_ns'] == st.st_mtime_ns:
+        return anterior['sha256']
+    sha = armazem.hash_arquivo(caminho)
+    hashes[caminho] = {'tamanho': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': sha}
+    ARQUIVO_HASHES.parent.mkdir(parents=True, exist_ok=True)
+    with open(ARQUIVO_HASHES, 'w', encoding='utf-8') as f:
+        json.dump(hashes, f, indent=2)
+    return sha
+
+
+def definicoes_notebook(caminho=NOTEBOOK) -> Dict[str, ast.stmt]:
+    """Funções e atribuições (a um nome) de nível superior das células de código do notebook."""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        celulas = json.load(f)['cells']
+    fonte = "\n".join(''.join(c['source']) for c in celulas if c['cell_type'] == 'code')
+    definicoes = {}
+    for n in ast.parse(fonte).body:
+        if isinstance(n, ast.FunctionDef):
+            definicoes[n.name] = n
+        elif isinstance(n, (ast.Assign, ast.AnnAssign)):
+            for alvo in (n.targets if isinstance(n, ast.Assign) else [n.target]):
+                if isinstance(alvo, ast.Name):
+                    definicoes[alvo.id] = n
+    return definicoes
+
+
+def codigo_funcoes(definicoes: Dict[str, ast.stmt], nomes: Sequence[str]) -> Tuple[str, List[str]]:
+    """
+    Código normalizado (ast.dump) das funções pedidas e das funções do notebook que elas
+    chamam, e os nomes das atribuições de nível superior que elas leem (o valor destas
+    entra na chave pelo namespace do notebook, já com os `--definir` aplicados).
+    """
+    pendentes, vistas, globais = list(nomes), {}, set()
+    while pendentes:
+        nome = pendentes.pop()
+        if nome in vistas or nome not in definicoes:
+            continue
+        if not isinstance(definicoes[nome], ast.FunctionDef):
+            globais.add(nome)
+            continue
+        vistas[nome] = ast.dump(definicoes[nome])  # ignora comentários e formatação
+        pendentes += [n.id for n in ast.walk(definicoes[nome]) if isinstance(n, ast.Name) and n.id in definicoes]
+    globais = [g for g in sorted(globais) if g not in FORA_DA_CHAVE and not g.startswith('N_PROCESSOS_')]
+    return "\n".join(vistas[n] for n in sorted(vistas)), globais
+
+
+def _versao(biblioteca: str) -> Optional[str]:
+    try:
+        return metadata.version(biblioteca)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+class Plano:
+    """Chaves de todas as etapas (e de cada modelo), calculadas sem executar nenhuma delas."""
+
+    def __init__(self, nb: dict, entrada: str, definicoes: Dict[str, ast.stmt]):
+        self.chaves: Dict[str, str] = {}
+        for etapa in ETAPAS:
+            funcoes, modulos = CODIGO[etapa]
+            codigo, globais = codigo_funcoes(definicoes, funcoes)
+            for modulo in modulos:
+                codigo += (DIRETORIO / modulo).read_text(encoding='utf-8')
+            partes = {
+                'etapa': etapa,
+                'codigo': hashlib.sha256(codigo.encode('utf-8')).hexdigest(),
+                'parametros': {p: nb[p] for p in sorted({*PARAMETROS.get(etapa, ()), *globais} - set(PARAMETROS_FE))},
+                'bibliotecas': {b: _versao(b) for b in BIBLIOTECAS[etapa]},
+                'acima': [self.chaves[a] for a in ACIMA[etapa]],
+            }
+            if etapa == 'dados':
+                partes['entrada'] = hash_entrada(entrada)
+            self.chaves[etapa] = _hash_texto(partes)
+        self.bootstrap = {p: nb[p] for p in PARAMETROS_FE}
+
+    def chave_modelo(self, esp) -> str:
+        """Chave de um modelo: a da etapa `modelos` mais a própria especificação (e o bootstrap, nos FE)."""
+        if esp.estimador == 'fe':
+            return _hash_texto(self.chaves['modelos'], tuple(esp), self.bootstrap)
+        return _hash_texto(self.chaves['modelos'], tuple(esp))
+
+
+def abaixo(etapas: Sequence[str]) -> set:
+    """As etapas pedidas e todas as que dependem delas."""
+    resultado = set(etapas)
+    mudou = True
+    while mudou:
+        novas = {e for e in ETAPAS if e not in resultado and any(a in resultado for a in ACIMA[e])}
+        resultado |= novas
+        mudou = bool(novas)
+    return resultado
+
+
+# ------------------------------
+# Armazenamento
+# ------------------------------
+def _pasta(etapa: str, chave: str) -> Path:
+    return DIRETORIO_CACHE / etapa / chave
+
+
+def _publicar(etapa: str, chave: str, preencher) -> Path:
+    """Monta a entrada do cache num diretório temporário e a publica de uma vez."""
+    destino = _pasta(etapa, chave)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temporario = Path(tempfile.mkdtemp(prefix=f".{chave[:12]}_", dir=destino.parent))
+    try:
+        preencher(temporario)
+    except BaseException:
+        shutil.rmtree(temporario, ignore_errors=True)  # sem diretórios ocultos órfãos no cache
+        raise
+    if destino.exists():
+        shutil.rmtree(destino)
+    os.replace(temporario, destino)
+    return destino
+
+
+def _gravar_pickle(obj, caminho: Path) -> None:
+    with open(caminho, 'wb') as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _ler_pickle(caminho: Path):
+    with open(caminho, 'rb') as f:
+        return pickle.load(f)
+
+
+def _gravar_textos(pasta: Path, textos: List[str], resultados: str) -> None:
+    with open(pasta / 'textos.json', 'w', encoding='utf-8') as f:
+        json.dump({'textos': textos, 'resultados': resultados}, f, ensure_ascii=False)
+
+
+def _ler_textos(pasta: Path, resultados: str) -> List[str]:
+    """Linhas do sumário gravadas pela etapa, com os caminhos apontando para a pasta de resultados atual."""
+    with open(pasta / 'textos.json', 'r', encoding='utf-8') as f:
+        dados = json.load(f)
+    return [t.replace(dados['resultados'], resultados) for t in dados['textos']]
+
+
+# ------------------------------
+# Execução
+# ------------------------------
+class Pipeline:
+    def __init__(self, nb: dict, entrada: str, forcar: Sequence[str] = ()):
+        self.nb = nb
+        self.entrada = entrada
+        self.plano = Plano(nb, entrada, definicoes_notebook())
+        self.forcadas = abaixo(forcar)
+        self.situacao: Dict[str, str] = {}
+        self._painel = None
+        self._resumo = None
+
+    def _em_cache(self, etapa: str) -> bool:
+        return etapa not in self.forcadas and _pasta(etapa, self.plano.chaves[etapa]).exists()
+
+    def painel(self):
+        """Painel da engenharia: do cache ou (só agora) lendo a base e rodando o prepare_engineer."""
+        if self._painel is not None:
+            return self._painel
+        chave = self.plano.chaves['engenharia']
+        if self._em_cache('engenharia'):
+            with instrumentacao.etapa('engenharia') as etapa:
+                self._painel = _ler_pickle(_pasta('engenharia', chave) / 'painel.pkl')
+                etapa.saida(self._painel)
+            self.situacao['engenharia'] = 'cache'
+            return self._painel
+        nb = self.nb
+        with instrumentacao.etapa('dados') as etapa:
+            df = nb['load_data'](self.entrada, tamanho_bloco=nb['TAMANHO_BLOCO'],
+                                 n_processos=nb['N_PROCESSOS_LEITURA'], usar_armazem=nb['USAR_ARMAZEM'])
+            etapa.saida(df)
+        self.situacao['dados'] = 'executada'
+        with instrumentacao.etapa('engenharia', entrada=df) as etapa:
+            self._painel = nb['prepare_engineer'](df, agregados_app=nb['AGREGADOS_APP'])
+            etapa.saida(self._painel)
+        del df
+
+        def preencher(pasta):
+            _gravar_pickle(self._painel, pasta / 'painel.pkl')
+            with open(pasta / 'colunas.json', 'w', encoding='utf-8') as f:
+                json.dump([str(c) for c in self._painel.columns], f)
+            self._gravar_colunar(pasta)
+        _publicar('engenharia', chave, preencher)
+        self.situacao['engenharia'] = 'executada'
+        return self._painel
+
+    def _variaveis_resumo(self) -> List[str]:
+        return list(dict.fromkeys(self.nb['VARIAVEIS_DESCRITIVAS'] + self.nb['VARIAVEIS_CORRELACAO']))
+
+    def _gravar_colunar(self, pasta: Path) -> None:
+        """
+        Cópia colunar (Parquet, grupos de `LINHAS_BLOCO` linhas) das variáveis das descritivas
+        e da correlação, para resumi-las depois sem carregar o painel.
+        """
+        pedidas = self._variaveis_resumo()
+        colunas = [c for c in pedidas if c in memoria.nomes(self._painel)]
+        memoria.selecionar(self._painel, colunas).reset_index(drop=True).to_parquet(
+            pasta / 'estatisticas.parquet', index=False, row_group_size=estatisticas.LINHAS_BLOCO)
+        with open(pasta / 'estatisticas.json', 'w', encoding='utf-8') as f:
+            json.dump({'pedidas': pedidas, 'colunas': colunas}, f, ensure_ascii=False)
+
+    def resumo(self) -> estatisticas.ResumoColunas:
+        """
+        Resumo das variáveis das descritivas e da correlação. Com a engenharia no cache, vem
+        da cópia colunar (em `N_PROCESSOS_ESTATISTICAS` processos) e o painel não é lido.
+        """
+        if self._resumo is not None:
+            return self._resumo
+        pasta = _pasta('engenharia', self.plano.chaves['engenharia'])
+        info = None
+        if self._painel is None and self._em_cache('engenharia') and (pasta / 'estatisticas.json').exists():
+            with open(pasta / 'estatisticas.json', 'r', encoding='utf-8') as f:
+                info = json.load(f)
+        if info is not None and set(self._variaveis_resumo()) <= set(info['pedidas']):
+            with instrumentacao.etapa('resumo'):
+                self._resumo = estatisticas.resumir_parquet(
+                    pasta / 'estatisticas.parquet', info['colunas'], n_processos=self.nb['N_PROCESSOS_ESTATISTICAS'])
+            self.situacao.setdefault('engenharia', 'cache')
+        else:
+            painel = self.painel()  # cópia colunar ausente (entrada antiga) ou sem alguma variável pedida
+            with instrumentacao.etapa('resumo', entrada=painel):
+                self._resumo = self.nb['resumo_painel'](painel)
+        return self._resumo
+
+    def colunas_painel(self) -> List[str]:
+        """Colunas do painel, sem carregá-lo quando a engenharia está no cache."""
+        if self._painel is None and self._em_cache('engenharia'):
+            with open(_pasta('engenharia', self.plano.chaves['engenharia']) / 'colunas.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return list(self.painel().columns)
+
+    def _etapa_com_arquivos(self, etapa: str, executar, usa_painel: bool = True) -> List[str]:
+        """Etapa cujo produto são arquivos em RESULTS_DIR e linhas do sumário (`executar` recebe o painel, ou None)."""
+        resultados = self.nb['RESULTS_DIR']
+        chave = self.plano.chaves[etapa]
+        if self._em_cache(etapa):
+            pasta = _pasta(etapa, chave)
+            for nome in ARQUIVOS[etapa]:
+                if (pasta / nome).exists():
+                    shutil.copy2(pasta / nome, os.path.join(resultados, nome))
+            self.situacao[etapa] = 'cache'
+            return _ler_textos(pasta, resultados)
+        painel = self.painel() if usa_painel else None
+        with instrumentacao.etapa(etapa, entrada=painel):
+            textos = executar(painel)
+
+        def preencher(pasta):
+            for nome in ARQUIVOS[etapa]:
+                if os.path.exists(os.path.join(resultados, nome)):
+                    shutil.copy2(os.path.join(resultados, nome), pasta / nome)
+            _gravar_textos(pasta, textos, resultados)
+        _publicar(etapa, chave, preencher)
+        self.situacao[etapa] = 'executada'
+        return textos
+
+    def correlacao(self) -> List[str]:
+        # matplotlib/seaborn só são importados se a etapa de fato rodar
+        if self.nb['MOTOR_ESTATISTICAS'] == 'blocos':
+            return self._etapa_com_arquivos('correlacao', lambda _: self.nb['grafico_correlacao'](
+                None, *self.nb['bibliotecas_graficos'](), resumo=self.resumo()), usa_painel=False)
+        return self._etapa_com_arquivos('correlacao', lambda df: self.nb['grafico_correlacao'](
+            df, *self.nb['bibliotecas_graficos']()))
+
+    def descritivas(self) -> List[str]:
+        if self.nb['MOTOR_ESTATISTICAS'] == 'blocos':
+            return self._etapa_com_arquivos('descritivas', lambda _: self.nb['estatisticas_descritivas'](
+                None, resumo=self.resumo()), usa_painel=False)
+        return self._etapa_com_arquivos('descritivas', self.nb['estatisticas_descritivas'])
+
+    def graficos(self) -> List[str]:
+        return self._etapa_com_arquivos('graficos', lambda df: self.nb['graficos_distribuicao'](
+            df, instrumentacao.voltas('graficos', df)))
+
+    def grade(self) -> List[str]:
+        textos = self._etapa_com_arquivos('grade', self.nb['estimar_grade_subgrupos'])
+        if self.situacao['grade'] == 'cache':
+            self.nb['publicar_grade_app']()  # o app lê de app_data/, não da pasta de resultados
+        return textos
+
+    def modelos(self) -> List[str]:
+        """Ajusta só as especificações sem resultado no cache; as linhas do sumário saem de todas."""
+        nb = self.nb
+        # as especificações só olham as colunas do painel: um quadro vazio com elas basta
+        especificacoes = nb['especificacoes_modelos'](pd.DataFrame(columns=self.colunas_painel()))
+        chaves = [self.plano.chave_modelo(esp) for esp in especificacoes]
+        faltam = [i for i, chave in enumerate(chaves) if not self._em_cache_modelo(chave)]
+        ajustados: List = [None] * len(especificacoes)
+        bootstraps: Dict[str, str] = {}
+        for i, chave in enumerate(chaves):
+            if i not in faltam:
+                pasta = _pasta('modelos', chave)
+                ajustados[i] = _ler_pickle(pasta / 'resultado.pkl')
+                with open(pasta / 'textos.json', 'r', encoding='utf-8') as f:
+                    boot = json.load(f)['bootstrap']
+                if boot is not None:
+                    bootstraps[especificacoes[i].nome] = boot
+        if faltam:
+            painel = self.painel()
+            novas = [especificacoes[i] for i in faltam]
+            with instrumentacao.etapa('modelos', entrada=painel):
+                resultados, novos_boots = nb['ajustar_modelos'](painel, novas, instrumentacao.voltas('modelos', painel))
+            for i, esp, res in zip(faltam, novas, resultados):
+                ajustados[i] = res
+                boot = novos_boots.get(esp.nome)
+                if boot is not None:
+                    bootstraps[esp.nome] = boot
+
+                def preencher(pasta, res=res, boot=boot):
+                    _gravar_pickle(res, pasta / 'resultado.pkl')
+                    with open(pasta / 'textos.json', 'w', encoding='utf-8') as f:
+                        json.dump({'especificacao': repr(esp), 'bootstrap': boot}, f, ensure_ascii=False)
+                _publicar('modelos', chaves[i], preencher)
+        self.situacao['modelos'] = (f"{len(faltam)} de {len(especificacoes)} ajustados"
+                                    if faltam else 'cache')
+        return nb['textos_modelos'](especificacoes, ajustados, bootstraps)
+
+    def _em_cache_modelo(self, chave: str) -> bool:
+        return 'modelos' not in self.forcadas and _pasta('modelos', chave).exists()
+
+    def executar(self, etapas: Sequence[str] = ETAPAS) -> Optional[str]:
+        """Produz as etapas pedidas; com `modelos`, regrava o sumarios_modelos.txt. Retorna o caminho do sumário."""
+        os.makedirs(self.nb['RESULTS_DIR'], exist_ok=True)
+        prints = []
+        if 'correlacao' in etapas:
+            prints += self.correlacao()
+        if 'modelos' in etapas:
+            prints += self.modelos()
+        if 'descritivas' in etapas:
+            prints += self.descritivas()
+        if 'graficos' in etapas:
+            prints += self.graficos()
+        if 'grade' in etapas:
+            prints += self.grade()
+        if 'engenharia' in etapas and 'engenharia' not in self.situacao:
+            if self._em_cache('engenharia'):
+                self.situacao['engenharia'] = 'cache'  # o painel já está guardado; não é preciso lê-lo
+            else:
+                self.painel()
+        for etapa in ETAPAS:
+            self.situacao.setdefault(etapa, 'não necessária' if etapa in ('dados', 'engenharia') else 'não pedida')
+        if 'modelos' not in etapas:
+            return None
+        return self.nb['salvar_sumarios'](prints)
+
+
+# ------------------------------
+# Linha de comando
+# ------------------------------
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Fluxo do notebook em etapas com cache endereçado por conteúdo.")
+    parser.add_argument('--entrada', help="base de entrada (padrão: INPUT_PATH do notebook)")
+    parser.add_argument('--resultados', help="pasta de resultados (padrão: RESULTS_DIR do notebook)")
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS,
+                        help="etapas a produzir (as de cima rodam só se precisarem; padrão: todas, "
+                             "com a grade só se GRADE_SUBGRUPOS)")
+    parser.add_argument('--force', nargs='+', choices=ETAPAS, default=[], metavar='ETAPA',
+                        help="refaz a etapa e todas as que dependem dela")
+    parser.add_argument('--definir', action='append', default=[], metavar='NOME=VALOR',
+                        help="sobrescreve uma configuração do notebook (valor em sintaxe Python)")
+    parser.add_argument('--plano', action='store_true', help="mostra chaves e acertos sem executar")
+    parser.add_argument('--limpar', action='store_true', help="apaga o cache de etapas antes de rodar")
+    return parser.parse_args(argv)
+
+
+def configurar(argv=None):
+    """Notebook carregado com as configurações da linha de comando aplicadas."""
+    args = _argumentos(argv)
+    nb = carregar_notebook()
+    for definicao in args.definir:
+        nome, _, valor = definicao.partition('=')
+        if nome not in nb:
+            raise SystemExit(f"Configuração desconhecida no notebook: {nome}")
+        nb[nome] = ast.literal_eval(valor)
+    if args.etapas is None:
+        args.etapas = [e for e in ETAPAS if e != 'grade' or nb['GRADE_SUBGRUPOS']]
+    if args.entrada:
+        nb['INPUT_PATH'] = args.entrada
+    if args.resultados:
+        nb['RESULTS_DIR'] = args.resultados
+    if not nb['TAMANHO_BLOCO'] and not str(nb['INPUT_PATH']).lower().endswith('.sas7bdat'):
+        # o load_data inteiro só lê .sas7bdat; .dta e .csv passam pela leitura em blocos
+        nb['TAMANHO_BLOCO'] = carregamento.TAMANHO_BLOCO_PADRAO
+    return args, nb
+
+
+def main(argv=None) -> int:
+    args, nb = configurar(argv)
+    if args.limpar:
+        shutil.rmtree(DIRETORIO_CACHE, ignore_errors=True)
+    pipeline = Pipeline(nb, nb['INPUT_PATH'], forcar=args.force)
+    if args.plano:
+        for etapa in ETAPAS:
+            if etapa == 'dados':
+                estado = 'só hash'
+            elif etapa == 'modelos' and not pipeline._em_cache('engenharia'):
+                estado = 'a executar (depois da engenharia)'
+            elif etapa == 'modelos':
+                especificacoes = nb['especificacoes_modelos'](pd.DataFrame(columns=pipeline.colunas_painel()))
+                prontos = sum(pipeline._em_cache_modelo(pipeline.plano.chave_modelo(e)) for e in especificacoes)
+                estado = f"{prontos} de {len(especificacoes)} no cache"
+            else:
+                estado = 'no cache' if pipeline._em_cache(etapa) else 'a executar'
+            print(f"{etapa:<12} {pipeline.plano.chaves[etapa][:16]}  {estado}")
+        return 0
+    with instrumentacao.execucao('pipeline') as execucao:
+        caminho = pipeline.executar(args.etapas)
+    print(execucao.texto())
+    print("Etapas: " + ", ".join(f"{e} ({pipeline.situacao[e]})" for e in ETAPAS))
+    if caminho:
+        print(f"Sumários: {caminho}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
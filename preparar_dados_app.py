@@ -3,177 +3,445 @@
 import pandas as pd
 import numpy as np
 import os
+import tempfile
 from pathlib import Path # <--- MUDANÇA: Importa a biblioteca Path
 
+import armazem
+import carregamento
+import engenharia
+import esbocos
+import incremental
+import instrumentacao
+import pacote_dados
+
 # --- CONFIGURAÇÃO ---
 # ATENÇÃO: O caminho agora aponta para o arquivo .dta que você converteu no Stata
 CAMINHO_DADOS_CONVERTIDOS = "/Users/macvini/Library/CloudStorage/OneDrive-Pessoal/Mestrado/base_final_mestrado_convertida.dta"
 
+# Leitura em blocos: None lê o .dta inteiro com pd.read_stata (comportamento original);
+# um inteiro (ex.: 500_000) lê em blocos, só com as colunas usadas e tipos reduzidos.
+TAMANHO_BLOCO = None
+N_PROCESSOS_LEITURA = 1
+# Armazém colunar compartilhado com o notebook (Parquet por anomes, reconvertido só se o hash da origem mudar)
+USAR_ARMAZEM = False
+# Modo streaming: trata e agrega uma partição anomes (com o armazém) ou um bloco de linhas por vez,
+# com memória limitada a uma partição. Sem armazém, usa TAMANHO_BLOCO (ou o padrão do carregamento).
+MODO_STREAMING = False
+# Atualização incremental (ver incremental.py): só os meses do armazém que ainda não estão no cubo guardado
+# em cache/incremental/app são tratados; os arquivos do app saem do cubo acumulado
+MODO_INCREMENTAL = False
+# Arquivos com os meses novos (ou corrigidos), no formato da base: entram no armazém partição a partição,
+# sem reconverter CAMINHO_DADOS_CONVERTIDOS
+ARQUIVOS_MESES = ()
+
 # --- MUDANÇA: Define os caminhos de forma robusta, relativa à localização deste script ---
 DIRETORIO_ATUAL = Path(__file__).parent
 PASTA_SAIDA_APP = DIRETORIO_ATUAL / "app_data"
+# Relatório JSON de tempo/CPU/memória por etapa (execucao_preparar_dados_app_<data>.json); PERFILAR_ETAPA
+# (ex.: 'tratar_dados/derivar' ou 'salvar_agregados/temporal') grava o perfil por amostragem da etapa
+PASTA_RELATORIOS = DIRETORIO_ATUAL / "resultados_python"
+PERFILAR_ETAPA = None
+# As tabelas do app vão para um pacote único (app_data/pacote_app.arrow, ver pacote_dados.py);
+# True também grava os sete CSVs antigos, para inspeção
+GRAVAR_CSV_APP = False
 
 # Garante que a pasta de saída exista
 os.makedirs(PASTA_SAIDA_APP, exist_ok=True)
 
 
-def tratar_dados(df: pd.DataFrame) -> pd.DataFrame:
-    """Aplica todo o tratamento e engenharia de variáveis da dissertação."""
-    print("Iniciando tratamento e engenharia de variáveis...")
+def tratar_dados(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """
+    Aplica o tratamento e a engenharia de variáveis da dissertação (as mesmas contas do
+    `prepare_engineer`, em engenharia.py) e devolve as colunas do cubo com os rótulos do app.
+    """
+    if verbose:
+        print("Iniciando tratamento e engenharia de variáveis...")
+    voltas = instrumentacao.voltas('tratar_dados', df)
 
-    # Cria variável 'perfil_grupo'
-    if 'CD_PRFL_API' in df.columns:
-        df['prfl_codigo'] = df['CD_PRFL_API'].replace(0, 5).fillna(5).astype(int)
-        perfil_map = {1: 'Conservador', 2: 'Moderado', 3: 'Arrojado', 4: 'Agressivo', 5: 'Não Respondeu'}
-        df['perfil_grupo'] = df['prfl_codigo'].map(perfil_map)
-    else:
-        df['perfil_grupo'] = 'Não Informado'
-    
-    # Cria variável 'grupo_ocupacao'
-    if 'DS_OCUPACAO' in df.columns:
-        ocup_map = {
-            'Administração': r'ADMINISTRADOR|CONTADOR|ANALISTA|CONSULTOR|ECONOMISTA',
-            'Servidor Público': r'SERVIDOR PUBLICO|DEPUTADO|PREFEITO|SECRETARIO|MAGISTRADO|PROCURADOR',
-            'Saúde': r'MEDICO|ENFERMEIRO|FISIOTERAPEUTA|ODONTOLOGO|FARMACEUTICO|NUTRICIONISTA|FONOAUDIOLOGO|PSICOLOGO|TERAPEUTA',
-            'Educação': r'PROFESSOR|ESTUDANTE|ESTAGIARIO|BOLSISTA|PEDAGOGO',
-            'Autônomo/Comércio': r'COMERCIANTE|AMBULANTE|TAXISTA|VENDEDOR|FEIRANTE|REPRESENTANTE COMERCIAL',
-            'Agropecuária': r'AGRICULTOR|PECUARISTA|PESCADOR|AVICULTOR|RURAL|FLORICULTOR|AGRONOMO|AGROPECUARISTA',
-            'Industrial': r'MECANICO|ELETRICISTA|OPERADOR|CONSTRUCAO|MARCENEIRO|INDUSTRIARIO|SERRALHEIRO|TECNIC',
-            'Justiça': r'ADVOGADO|DELEGADO|DEFENSOR|PROMOTOR|JUIZ|OFICIAL DE JUSTICA|TABELIAO|CARTORIO',
-            'Segurança': r'POLICIAL|MILITAR|VIGILANTE|SEGURANCA|BOMBEIRO',
-            'Cultura/Comunicação': r'MUSICO|ATOR|ARTESAO|JORNALISTA|ESCULTOR|PUBLICITARIO|FOTOGRAFO|LOCUTOR'
-        }
-        df['grupo_ocupacao'] = 'Outros' # Define 'Outros' como padrão
-        for grupo, regex in ocup_map.items():
-            df.loc[df['DS_OCUPACAO'].str.contains(regex, case=False, na=False), 'grupo_ocupacao'] = grupo
-    else:
-        df['grupo_ocupacao'] = 'Não Informado'
-
-    df = df.dropna(subset=['cliente'])
-    df = df[df['cliente'] != '']
-    df['id_cliente'] = df.groupby('cliente').ngroup()
-
-    df['DT_NASCIMENTO'] = pd.to_datetime(df['DT_NASCIMENTO'])
-    df['idade_int'] = (pd.to_datetime('2025-01-01') - df['DT_NASCIMENTO']).dt.days / 365.25
-    df['idade_int'] = df['idade_int'].astype(int)
-
-    colunas_invest_ext = ['INVEST_EXT_RENDA_VARIAVEL', 'INVEST_NO_EXTERIOR', 'INVEST_EXTERIOR', 'INVEST_EXT_RENDA_FIXA']
-    df['investimento_exterior'] = df[colunas_invest_ext].sum(axis=1, skipna=True)
-
-    regioes = {
-        'Norte': ["AC", "AP", "AM", "PA", "RO", "RR", "TO"],
-        'Nordeste': ["AL", "BA", "CE", "MA", "PB", "PE", "PI", "RN", "SE"],
-        'Sudeste': ["ES", "MG", "RJ", "SP"],
-        'Sul': ["PR", "RS", "SC"],
-        'Centro-Oeste': ["DF", "GO", "MT", "MS"],
-    }
-    conditions = [df['UF_CADASTRO'].isin(ufs) for ufs in regioes.values()]
-    df['regiao'] = np.select(conditions, list(regioes.keys()), default='Não Identificada')
-
-    soma_complex_cols = ['MULTIMERCADOS', 'RENDA_VARIAVEL', 'INVEST_ALTERNATIVOS', 'investimento_exterior']
-    soma_total_cols   = ['RENDA_FIXA_POS_CDI', 'RENDA_FIXA_PRE', 'RENDA_FIXA_INFLACAO'] + soma_complex_cols
-    df['soma_complex'] = df[soma_complex_cols].sum(axis=1, skipna=True)
-    df['soma_total']   = df[soma_total_cols].sum(axis=1, skipna=True)
-    df['diver'] = (df['soma_complex'] / df['soma_total']).replace([np.inf, -np.inf], 0).fillna(0).clip(upper=1.0)
-    df['complex'] = (df['soma_complex'] > 0).astype(int)
-    
-    df['faixa_renda'] = pd.cut(df['renda'], bins=[0, 20000, np.inf], labels=['Até 20k', 'Acima de 20k'], right=False)
-    
-    df['anomes'] = pd.to_datetime(df['anomes'].astype(int).astype(str), format='%Y%m')
-    df['ano'] = df['anomes'].dt.year
+    df = engenharia.derivar(df)
+    voltas.marcar('derivar', df)
+    df = engenharia.visao_app(df)
+    voltas.marcar('rotulos_app', df)
 
-    print("Tratamento concluído.")
+    if verbose:
+        print("Tratamento concluído.")
     return df
 
-def main():
-    """Função principal que orquestra o carregamento, tratamento e agregação dos dados."""
-    print("--- INICIANDO SCRIPT DE PRÉ-PROCESSAMENTO LOCAL ---")
-    try:
-        df = pd.read_stata(CAMINHO_DADOS_CONVERTIDOS)
-        print(f"Base de dados convertida (.dta) carregada com sucesso. {len(df)} linhas.")
-    except Exception as e:
-        print(f"ERRO: Não foi possível ler o arquivo de dados convertido em '{CAMINHO_DADOS_CONVERTIDOS}'.")
-        print("Verifique se você executou a conversão no Stata primeiro.")
-        print(f"Detalhe do erro: {e}")
-        return
+# --- CUBO DE AGREGAÇÃO ---
+# Dimensões e métricas aditivas do cubo. Todos os CSVs do app saem de "roll-ups" do cubo,
+# que tem uma linha por combinação observada das dimensões (bem menor que a base).
+DIMENSOES_CUBO = ['regiao', 'UF_CADASTRO', 'faixa_renda', 'perfil_grupo', 'grupo_ocupacao', 'complex', 'anomes']
+METRICAS_CUBO = ['diver', 'renda', 'idade_int', 'complex']
+# Dimensões usadas nas contagens de clientes distintos (sem UF e mês, para a tabela ficar pequena)
+DIMENSOES_CLIENTES = ['regiao', 'faixa_renda', 'perfil_grupo', 'grupo_ocupacao', 'complex']
+# Dimensões dos esboços HyperLogLog (os filtros do app); um esboço por combinação observada
+DIMENSOES_ESBOCO = ['regiao', 'faixa_renda', 'perfil_grupo', 'grupo_ocupacao']
+PRECISAO_ESBOCO = esbocos.PRECISAO_PADRAO
 
-    df_tratado = tratar_dados(df)
 
-    print("Iniciando cálculo e salvamento dos arquivos agregados...")
+def _fatorar(serie: pd.Series):
+    """Códigos inteiros (-1 = nulo) e valores distintos de uma dimensão; categóricas usam os próprios códigos."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.cat.codes.to_numpy(np.int64), serie.cat.categories
+    codigos, valores = pd.factorize(serie)
+    return codigos.astype(np.int64), valores
+
+
+def _celulas(codigos: list, tamanhos: list):
+    """Índice compacto de célula (0..n_celulas-1) por linha e o código de cada dimensão por célula."""
+    plano = np.ravel_multi_index([c + 1 for c in codigos], [t + 1 for t in tamanhos])  # +1: nulo vira 0
+    celula, chaves = pd.factorize(plano)
+    codigos_celula = [c - 1 for c in np.unravel_index(chaves, [t + 1 for t in tamanhos])]
+    return celula, codigos_celula
+
+
+def _rotulos(serie: pd.Series, valores, codigos: np.ndarray):
+    """Reconstrói a coluna de rótulos a partir dos códigos, preservando o tipo original."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(codigos, dtype=serie.dtype)
+    if (codigos < 0).any():
+        # sem fill_value, o Index.take lê o -1 como "último valor" e o nulo viraria a última UF/rótulo
+        return valores.take(codigos, allow_fill=True, fill_value=np.nan)
+    return valores.take(codigos)
+
+
+def construir_cubo(df: pd.DataFrame):
+    """
+    Fatora as dimensões uma única vez e acumula soma/contagem das métricas por célula com
+    bincount (uma passada vetorizada). Retorna o cubo e a tabela de pares (célula, cliente)
+    usada para contar clientes distintos nos roll-ups e montar os esboços.
+    """
+    fatorados = {d: _fatorar(df[d]) for d in DIMENSOES_CUBO}
+    celula, codigos_celula = _celulas([fatorados[d][0] for d in DIMENSOES_CUBO],
+                                      [len(fatorados[d][1]) for d in DIMENSOES_CUBO])
+    n_celulas = len(codigos_celula[0])
+
+    cubo = pd.DataFrame({d: _rotulos(df[d], fatorados[d][1], c) for d, c in zip(DIMENSOES_CUBO, codigos_celula)})
+    cubo['n_linhas'] = np.bincount(celula, minlength=n_celulas)
+    for m in METRICAS_CUBO:
+        valores = df[m].to_numpy(dtype=np.float64)
+        validos = ~np.isnan(valores)
+        cubo[f'soma_{m}'] = np.bincount(celula, weights=np.where(validos, valores, 0.0), minlength=n_celulas)
+        cubo[f'n_{m}'] = np.bincount(celula, weights=validos, minlength=n_celulas)
+
+    # Pares distintos (célula sem UF/mês, cliente): cada cliente aparece em poucas células
+    celula_cli, codigos_cli = _celulas([fatorados[d][0] for d in DIMENSOES_CLIENTES],
+                                       [len(fatorados[d][1]) for d in DIMENSOES_CLIENTES])
+    pares = pd.DataFrame({'celula': celula_cli, 'id_cliente': df['id_cliente'].to_numpy()}).drop_duplicates()
+    posicoes = pares.index.to_numpy()  # primeira linha de cada par
+    clientes = pd.DataFrame({d: _rotulos(df[d], fatorados[d][1], c[pares['celula'].to_numpy()])
+                             for d, c in zip(DIMENSOES_CLIENTES, codigos_cli)})
+    clientes['id_cliente'] = pares['id_cliente'].to_numpy()
+    # hash do identificador original: estável entre execuções e entre blocos/partições
+    clientes['hash_cliente'] = esbocos.hash_clientes(df['cliente'].to_numpy()[posicoes])
+    return cubo, clientes
+
+
+def combinar_cubos(cubos: list) -> pd.DataFrame:
+    """Soma cubos parciais (de blocos ou partições diferentes) célula a célula."""
+    cubo = pd.concat(cubos, ignore_index=True)
+    metricas = [c for c in cubo.columns if c not in DIMENSOES_CUBO]
+    resultado = cubo.groupby(DIMENSOES_CUBO, observed=True, dropna=False, sort=False)[metricas].sum().reset_index()
+    # o groupby perde o `ordered` das categóricas (ex.: faixa_renda); restaura o tipo comum aos cubos
+    for d in DIMENSOES_CUBO:
+        tipos = {c[d].dtype for c in cubos}
+        if len(tipos) == 1 and isinstance(cubos[0][d].dtype, pd.CategoricalDtype):
+            resultado[d] = resultado[d].astype(cubos[0][d].dtype)
+    return resultado
+
+
+def combinar_clientes(tabelas: list) -> pd.DataFrame:
+    """
+    União das tabelas de pares (célula, cliente). Os `id_cliente` de cada bloco são locais,
+    então o hash do cliente passa a ser o identificador.
+    """
+    clientes = pd.concat(tabelas, ignore_index=True)
+    clientes['id_cliente'] = clientes['hash_cliente']
+    return clientes.drop_duplicates(subset=DIMENSOES_CLIENTES + ['id_cliente'], ignore_index=True)
+
+
+def construir_esbocos(clientes: pd.DataFrame):
+    """
+    Um esboço HyperLogLog de clientes distintos por combinação de DIMENSOES_ESBOCO,
+    a partir da tabela de pares (célula, cliente), que já é pequena.
+    """
+    celula, dimensoes = pd.MultiIndex.from_frame(clientes[DIMENSOES_ESBOCO]).factorize()
+    registros = esbocos.construir_registros(celula, clientes['hash_cliente'].to_numpy(),
+                                            len(dimensoes), precisao=PRECISAO_ESBOCO)
+    return dimensoes.to_frame(index=False, name=DIMENSOES_ESBOCO), registros
+
+
+def agregar_cubo(cubo: pd.DataFrame, clientes: pd.DataFrame, chaves: list, medias: dict,
+                 total_clientes: bool = False, observed: bool = True) -> pd.DataFrame:
+    """
+    Roll-up do cubo: médias (soma/contagem) por `chaves` e, opcionalmente, clientes distintos.
+    `medias` mapeia nome da coluna de saída -> métrica do cubo. `observed=False` reproduz o
+    produto cartesiano que o groupby do pandas faz com dimensões categóricas (faixa_renda).
+    """
+    metricas = sorted(set(medias.values()))
+    colunas = [f'soma_{m}' for m in metricas] + [f'n_{m}' for m in metricas]
+    somas = cubo.groupby(chaves, observed=observed, sort=True)[colunas].sum()
+    resultado = pd.DataFrame(index=somas.index)
+    for nome, m in medias.items():
+        resultado[nome] = somas[f'soma_{m}'] / somas[f'n_{m}']
+    if total_clientes:
+        resultado['total_clientes'] = clientes.groupby(chaves, observed=observed, sort=True)['id_cliente'].nunique()
+    return resultado.reset_index()
+
+
+def _bordas_histograma(mn: float, mx: float, bins: int):
+    """Rótulos e bordas que `value_counts(bins=...)` usaria (só dependem de mínimo e máximo)."""
+    faixas, bordas = pd.cut(np.array([mn, mx]), bins, include_lowest=True, retbins=True)
+    return faixas.categories, bordas
+
+
+def _contar_histograma(valores: np.ndarray, bordas: np.ndarray, bins: int) -> np.ndarray:
+    """Contagem por faixa (intervalos fechados à direita, primeiro inclusivo), como no pd.cut."""
+    valores = valores[~np.isnan(valores)]
+    codigos = np.clip(np.searchsorted(bordas, valores, side='left') - 1, 0, bins - 1)
+    return np.bincount(codigos, minlength=bins)
+
 
+def _tabela_histograma(faixas, contagem: np.ndarray) -> pd.DataFrame:
+    dist = pd.DataFrame({'faixa_diversificacao': faixas.astype(str), 'percentual': contagem / contagem.sum()})
+    return dist
+
+
+def histograma_diver(diver: pd.Series, bins: int = 50) -> pd.DataFrame:
+    """
+    Equivalente a `value_counts(bins=50, normalize=True).sort_index()`: as bordas vêm do
+    próprio pd.cut; a contagem é um searchsorted + bincount.
+    """
+    valores = diver.to_numpy(dtype=np.float64)
+    faixas, bordas = _bordas_histograma(np.nanmin(valores), np.nanmax(valores), bins)
+    return _tabela_histograma(faixas, _contar_histograma(valores, bordas, bins))
+
+
+def iterar_particoes():
+    """
+    Fonte do modo streaming: uma partição `anomes` por vez quando o armazém está ativo,
+    ou blocos de linhas lidos direto do arquivo de origem.
+    """
+    if USAR_ARMAZEM:
+        destino = armazem.garantir_armazem(CAMINHO_DADOS_CONVERTIDOS,
+                                           tamanho_bloco=TAMANHO_BLOCO or carregamento.TAMANHO_BLOCO_PADRAO,
+                                           n_processos=N_PROCESSOS_LEITURA)
+        for anomes in armazem.ler_manifesto(destino)['particoes']:
+            yield armazem.ler_armazem(destino, colunas=carregamento.COLUNAS_USADAS,
+                                      filtros=[('anomes', '==', anomes)], otimizar=True)
+    else:
+        yield from carregamento.iterar_blocos(CAMINHO_DADOS_CONVERTIDOS,
+                                              tamanho_bloco=TAMANHO_BLOCO or carregamento.TAMANHO_BLOCO_PADRAO,
+                                              n_processos=N_PROCESSOS_LEITURA)
+
+
+def processar_em_streaming(particoes, bins: int = 50):
+    """
+    Trata e agrega uma partição (ou bloco) por vez e combina os resultados parciais.
+    A memória fica limitada a uma partição mais o cubo e a tabela de pares. Os valores de
+    `diver` de cada partição vão para arquivos temporários, porque as faixas do histograma
+    dependem do mínimo e do máximo da base inteira.
+    """
+    cubos, tabelas_clientes, arquivos_diver = [], [], []
+    mn, mx = np.inf, -np.inf
+    with tempfile.TemporaryDirectory(prefix="diver_") as pasta_temp:
+        for i, bloco in enumerate(particoes):
+            if bloco.empty:
+                continue
+            tratado = tratar_dados(bloco, verbose=False)
+            cubo, clientes = construir_cubo(tratado)
+            cubos.append(cubo)
+            tabelas_clientes.append(clientes)
+            if len(tabelas_clientes) >= 8:
+                # consolida periodicamente para a lista de pares não crescer com o número de partições
+                tabelas_clientes = [combinar_clientes(tabelas_clientes)]
+                cubos = [combinar_cubos(cubos)]
+
+            diver = tratado['diver'].to_numpy(dtype=np.float64)
+            if np.isfinite(diver).any():
+                mn, mx = min(mn, np.nanmin(diver)), max(mx, np.nanmax(diver))
+            caminho = os.path.join(pasta_temp, f"diver_{i:05d}.npy")
+            np.save(caminho, diver)
+            arquivos_diver.append(caminho)
+            print(f"  partição {i + 1}: {len(tratado)} linhas processadas")
+            del bloco, tratado, diver
+
+        if not cubos:
+            return None
+        faixas, bordas = _bordas_histograma(mn, mx, bins)
+        contagem = sum(_contar_histograma(np.load(c), bordas, bins) for c in arquivos_diver)
+
+    return combinar_cubos(cubos), combinar_clientes(tabelas_clientes), _tabela_histograma(faixas, contagem)
+
+
+def _guardar_tabela(tabelas: dict, nome: str, df: pd.DataFrame) -> None:
+    """Reserva a tabela para o pacote do app (e grava o CSV antigo se GRAVAR_CSV_APP)."""
+    tabelas[nome] = df
+    if GRAVAR_CSV_APP:
+        df.to_csv(PASTA_SAIDA_APP / f'{nome}.csv', index=False)
+        print(f"-> Salvo: {PASTA_SAIDA_APP / f'{nome}.csv'}")
+
+
+def salvar_agregados(cubo: pd.DataFrame, clientes: pd.DataFrame, dist_diver: pd.DataFrame) -> None:
+    """Gera e grava os arquivos do app a partir do cubo, da tabela de pares e do histograma."""
     # --- MUDANÇA: A forma de salvar os arquivos foi atualizada ---
     # Padrão antigo: os.path.join(PASTA_SAIDA_APP, 'nome.csv')
     # Padrão novo: PASTA_SAIDA_APP / 'nome.csv'
+    voltas = instrumentacao.voltas('salvar_agregados', cubo, encadear=False)
+    tabelas = {}
+
+    # Esboços de clientes distintos (o app une os esboços dos filtros selecionados)
+    dim_esbocos, registros = construir_esbocos(clientes)
+    esbocos.salvar(PASTA_SAIDA_APP / 'esbocos_clientes.npz', dim_esbocos, registros, precisao=PRECISAO_ESBOCO)
+    print(f"-> Salvo: {PASTA_SAIDA_APP / 'esbocos_clientes.npz'} ({len(dim_esbocos)} esboços)")
+    voltas.marcar('esbocos', registros)
 
     # 1. Agregado para filtros principais (KPIs)
-    agg_filtros = df_tratado.groupby(['regiao', 'faixa_renda']).agg(
-        diversificacao_media=('diver', 'mean'),
-        renda_media=('renda', 'mean'),
-        idade_media=('idade_int', 'mean'),
-        proporcao_complex=('complex', 'mean'),
-        total_clientes=('id_cliente', 'nunique')
-    ).reset_index()
-    agg_filtros.to_csv(PASTA_SAIDA_APP / 'dados_agregados_filtros.csv', index=False)
-    print(f"-> Salvo: {PASTA_SAIDA_APP / 'dados_agregados_filtros.csv'}")
+    agg_filtros = agregar_cubo(cubo, clientes, ['regiao', 'faixa_renda'], {
+        'diversificacao_media': 'diver',
+        'renda_media': 'renda',
+        'idade_media': 'idade_int',
+        'proporcao_complex': 'complex',
+    }, total_clientes=True, observed=False)
+    _guardar_tabela(tabelas, 'dados_agregados_filtros', agg_filtros)
+    voltas.marcar('filtros', agg_filtros)
 
     # 2. Agregado para o mapa por UF (com filtro de segurança)
-    df_mapa_filtrado = df_tratado[df_tratado['UF_CADASTRO'].notna() & (df_tratado['UF_CADASTRO'] != '')]
-    
-    agg_mapa = df_mapa_filtrado.groupby('UF_CADASTRO').agg(
-        diversificacao_media=('diver', 'mean'),
-        renda_media=('renda', 'mean')
-    ).reset_index()
-    agg_mapa.to_csv(PASTA_SAIDA_APP / 'dados_mapa_uf.csv', index=False)
-    print(f"-> Salvo: {PASTA_SAIDA_APP / 'dados_mapa_uf.csv'}")
+    cubo_mapa = cubo[cubo['UF_CADASTRO'].notna() & (cubo['UF_CADASTRO'] != '')]
+    agg_mapa = agregar_cubo(cubo_mapa, clientes, ['UF_CADASTRO'], {
+        'diversificacao_media': 'diver',
+        'renda_media': 'renda',
+    })
+    _guardar_tabela(tabelas, 'dados_mapa_uf', agg_mapa)
+    voltas.marcar('mapa_uf', agg_mapa)
 
     # 3. Agregado para o gráfico de distribuição
-    dist_diver = df_tratado['diver'].value_counts(bins=50, normalize=True).sort_index().reset_index()
-    dist_diver.columns = ['faixa_diversificacao', 'percentual']
-    dist_diver['faixa_diversificacao'] = dist_diver['faixa_diversificacao'].astype(str)
-    dist_diver.to_csv(PASTA_SAIDA_APP / 'distribuicao_diversificacao.csv', index=False)
-    print(f"-> Salvo: {PASTA_SAIDA_APP / 'distribuicao_diversificacao.csv'}")
+    _guardar_tabela(tabelas, 'distribuicao_diversificacao', dist_diver)
+    voltas.marcar('distribuicao', dist_diver)
 
     # 4. Agregado para a evolução temporal
-    agg_temporal = df_tratado.groupby(['anomes', 'regiao'])['diver'].mean().reset_index()
-    agg_temporal.to_csv(PASTA_SAIDA_APP / 'evolucao_temporal_regional.csv', index=False)
-    print(f"-> Salvo: {PASTA_SAIDA_APP / 'evolucao_temporal_regional.csv'}")
+    agg_temporal = agregar_cubo(cubo, clientes, ['anomes', 'regiao'], {'diver': 'diver'})
+    _guardar_tabela(tabelas, 'evolucao_temporal_regional', agg_temporal)
+    voltas.marcar('temporal', agg_temporal)
 
     # 5. Agregado para análise por Perfil de Investidor
-    agg_perfil = df_tratado.groupby('perfil_grupo').agg(
-        diversificacao_media=('diver', 'mean'),
-        proporcao_complex=('complex', 'mean'),
-        total_clientes=('id_cliente', 'nunique')
-    ).reset_index().sort_values(by='diversificacao_media', ascending=False)
-    
-    # Salva o novo arquivo CSV na pasta de dados do app
-    agg_perfil.to_csv(PASTA_SAIDA_APP / 'perfil_investidor_agregado.csv', index=False)
-    print(f"-> Salvo: {PASTA_SAIDA_APP / 'perfil_investidor_agregado.csv'}")
+    agg_perfil = agregar_cubo(cubo, clientes, ['perfil_grupo'], {
+        'diversificacao_media': 'diver',
+        'proporcao_complex': 'complex',
+    }, total_clientes=True).sort_values(by='diversificacao_media', ascending=False)
+
+    # Reserva a tabela para o pacote do app
+    _guardar_tabela(tabelas, 'perfil_investidor_agregado', agg_perfil)
+    voltas.marcar('perfil', agg_perfil)
 
      # 6. Agregado para análise por Grupo de Ocupação
-    agg_ocupacao = df_tratado.groupby('grupo_ocupacao').agg(
-        diversificacao_media=('diver', 'mean'),
-        proporcao_complex=('complex', 'mean'),
-        total_clientes=('id_cliente', 'nunique')
-    ).reset_index().sort_values(by='diversificacao_media', ascending=False)
+    agg_ocupacao = agregar_cubo(cubo, clientes, ['grupo_ocupacao'], {
+        'diversificacao_media': 'diver',
+        'proporcao_complex': 'complex',
+    }, total_clientes=True).sort_values(by='diversificacao_media', ascending=False)
     
-    # Salva o novo arquivo CSV
-    agg_ocupacao.to_csv(PASTA_SAIDA_APP / 'ocupacao_agregado.csv', index=False)
-    print(f"-> Salvo: {PASTA_SAIDA_APP / 'ocupacao_agregado.csv'}")
+    # Reserva a tabela para o pacote do app
+    _guardar_tabela(tabelas, 'ocupacao_agregado', agg_ocupacao)
+    voltas.marcar('ocupacao', agg_ocupacao)
     
     print("\n--- SCRIPT CONCLUÍDO COM SUCESSO! ---")
 
     # 7. Agregado para a análise de interação Renda x Complexidade
-    agg_interacao = df_tratado.groupby(['faixa_renda', 'complex']).agg(
-        diversificacao_media=('diver', 'mean'),
-        total_clientes=('id_cliente', 'nunique')
-    ).reset_index()
+    agg_interacao = agregar_cubo(cubo, clientes, ['faixa_renda', 'complex'], {
+        'diversificacao_media': 'diver',
+    }, total_clientes=True, observed=False)
     
     # Mapeia 0 e 1 para rótulos mais claros para o gráfico
     agg_interacao['complex'] = agg_interacao['complex'].map({0: 'Apenas Ativos Simples', 1: 'Possui Ativos Complexos'})
 
-    # Salva o novo arquivo CSV
-    agg_interacao.to_csv(PASTA_SAIDA_APP / 'interacao_renda_complex_agregado.csv', index=False)
-    print(f"-> Salvo: {PASTA_SAIDA_APP / 'interacao_renda_complex_agregado.csv'}")
+    # Reserva a tabela para o pacote do app
+    _guardar_tabela(tabelas, 'interacao_renda_complex_agregado', agg_interacao)
+    voltas.marcar('interacao', agg_interacao)
+
+    # Pacote único com as sete tabelas, publicado de uma vez (o app o relê só quando o hash muda)
+    caminho_pacote = PASTA_SAIDA_APP / pacote_dados.NOME_ARQUIVO
+    manifesto = pacote_dados.gravar_pacote(tabelas, caminho_pacote)
+    print(f"-> Salvo: {caminho_pacote} ({len(tabelas)} tabelas, hash {manifesto['hash'][:12]})")
+    voltas.marcar('pacote')
+
+
+def main():
+    """Função principal que orquestra o carregamento, tratamento e agregação dos dados."""
+    with instrumentacao.execucao('preparar_dados_app', perfilar=PERFILAR_ETAPA) as execucao:
+        executar()
+    print(execucao.texto())
+    print(f"Relatório de execução salvo em: {execucao.salvar(PASTA_RELATORIOS)}")
+
+
+def executar():
+    """Carregamento, tratamento e agregação, com cada etapa medida na execução ativa."""
+    print("--- INICIANDO SCRIPT DE PRÉ-PROCESSAMENTO LOCAL ---")
+
+    if MODO_INCREMENTAL:
+        print("Modo incremental: tratamento e agregação só dos meses novos...")
+        try:
+            with instrumentacao.etapa('incremental'):
+                fonte = incremental.fonte_armazem(CAMINHO_DADOS_CONVERTIDOS, ARQUIVOS_MESES,
+                                                  tamanho_bloco=TAMANHO_BLOCO or carregamento.TAMANHO_BLOCO_PADRAO,
+                                                  n_processos=N_PROCESSOS_LEITURA, otimizar=True)
+                resultado = incremental.atualizar_app(fonte)
+        except Exception as e:
+            print(f"ERRO: Falha na atualização incremental a partir de '{CAMINHO_DADOS_CONVERTIDOS}'.")
+            print(f"Detalhe do erro: {e}")
+            return
+        if resultado is None:
+            print("ERRO: Nenhuma linha encontrada na base de origem.")
+            return
+        cubo, clientes, dist_diver = resultado
+    elif MODO_STREAMING:
+        # Uma partição por vez: a base inteira nunca fica em memória
+        print("Modo streaming: tratamento e agregação por partição...")
+        try:
+            with instrumentacao.etapa('streaming'):
+                resultado = processar_em_streaming(iterar_particoes())
+        except Exception as e:
+            print(f"ERRO: Falha ao processar '{CAMINHO_DADOS_CONVERTIDOS}' em streaming.")
+            print(f"Detalhe do erro: {e}")
+            return
+        if resultado is None:
+            print("ERRO: Nenhuma linha encontrada na base de origem.")
+            return
+        cubo, clientes, dist_diver = resultado
+    else:
+        try:
+            with instrumentacao.etapa('leitura') as etapa:
+                if USAR_ARMAZEM:
+                    destino = armazem.garantir_armazem(CAMINHO_DADOS_CONVERTIDOS,
+                                                       tamanho_bloco=TAMANHO_BLOCO or carregamento.TAMANHO_BLOCO_PADRAO,
+                                                       n_processos=N_PROCESSOS_LEITURA)
+                    df = armazem.ler_armazem(destino, colunas=carregamento.COLUNAS_USADAS, otimizar=bool(TAMANHO_BLOCO))
+                elif TAMANHO_BLOCO:
+                    df = carregamento.carregar_em_blocos(CAMINHO_DADOS_CONVERTIDOS, tamanho_bloco=TAMANHO_BLOCO,
+                                                         n_processos=N_PROCESSOS_LEITURA)
+                else:
+                    df = pd.read_stata(CAMINHO_DADOS_CONVERTIDOS)
+                etapa.saida(df)
+            print(f"Base de dados convertida (.dta) carregada com sucesso. {len(df)} linhas.")
+        except Exception as e:
+            print(f"ERRO: Não foi possível ler o arquivo de dados convertido em '{CAMINHO_DADOS_CONVERTIDOS}'.")
+            print("Verifique se você executou a conversão no Stata primeiro.")
+            print(f"Detalhe do erro: {e}")
+            return
+
+        with instrumentacao.etapa('tratar_dados', entrada=df) as etapa:
+            df_tratado = tratar_dados(df)
+            etapa.saida(df_tratado)
+
+        # Cubo: uma única passada sobre a base; os agregados são roll-ups dele
+        with instrumentacao.etapa('construir_cubo', entrada=df_tratado) as etapa:
+            cubo, clientes = construir_cubo(df_tratado)
+            dist_diver = histograma_diver(df_tratado['diver'])
+            etapa.saida(cubo)
+
+    print("Iniciando cálculo e salvamento dos arquivos agregados...")
+    print(f"Cubo de agregação: {len(cubo)} células, {len(clientes)} pares célula-cliente.")
+    with instrumentacao.etapa('salvar_agregados', entrada=cubo):
+        salvar_agregados(cubo, clientes, dist_diver)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+test_equivalencia.py
+--------------------
+Confere os núcleos que substituem as bibliotecas da dissertação contra as próprias
+bibliotecas, num painel sintético:
+
+* `modelos_painel.EspacoPainel` (Pooled, FE e RE, com as três covariâncias e amostra
+  restrita) contra o `from_formula` do linearmodels: coeficientes, erros-padrão, p-valores,
+  R², testes F e o quadro do `summary`;
+* `estatisticas.winsorizar` contra `scipy.stats.mstats.winsorize` (o caminho original do
+  notebook, que winsoriza só os valores não nulos): cortes idênticos bit a bit.
+
+Uso:
+    python -m pytest -q test_equivalencia.py
+"""
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import estatisticas
+import modelos_painel as mp
+
+pytest.importorskip('linearmodels')
+mstats = pytest.importorskip('scipy.stats.mstats')
+
+
+@pytest.fixture(scope='module')
+def painel() -> pd.DataFrame:
+    """Painel desbalanceado: 80 clientes, até 12 meses, efeito fixo correlacionado com x1."""
+    rng = np.random.default_rng(20240601)
+    n_ent, n_t = 80, 12
+    ent = np.repeat(np.arange(n_ent), n_t)
+    tempo = np.tile(pd.date_range('2023-01-01', periods=n_t, freq='MS'), n_ent)
+    efeito = rng.normal(size=n_ent)[ent]
+    x1 = rng.normal(size=ent.size) + 0.5 * efeito
+    x2 = rng.normal(size=ent.size)
+    z = rng.normal(size=n_ent)[ent]  # constante no tempo (só Pooled e RE)
+    renda = np.exp(rng.normal(9, 1, size=ent.size))
+    y = 1.0 + 0.8 * x1 - 0.3 * x2 + 0.2 * z + efeito + rng.normal(size=ent.size)
+    df = pd.DataFrame({'id_cliente': ent, 'anomes': tempo, 'y': y, 'x1': x1, 'x2': x2, 'z': z,
+                       'const': 1.0, 'renda': renda})
+    df = df[rng.random(len(df)) > 0.15]  # desbalanceado
+    return df.set_index(['id_cliente', 'anomes'])
+
+
+ESPECIFICACOES = [
+    mp.Especificacao('Pooled', 'pooled', 'y', ('const', 'x1', 'x2', 'z')),
+    mp.Especificacao('Pooled robusto', 'pooled', 'y', ('const', 'x1', 'x2', 'z'), cov_type='robust'),
+    mp.Especificacao('FE', 'fe', 'y', ('x1', 'x2')),
+    mp.Especificacao('FE sem ajuste', 'fe', 'y', ('x1', 'x2'), cov_type='unadjusted'),
+    mp.Especificacao('FE alta renda', 'fe', 'y', ('x1', 'x2'), amostra='alta_renda'),
+    mp.Especificacao('RE', 're', 'y', ('const', 'x1', 'x2', 'z')),
+]
+
+
+def _sem_data(summary) -> str:
+    return "\n".join(l for l in str(summary).splitlines() if 'Date:' not in l and 'Time:' not in l)
+
+
+@pytest.mark.parametrize('esp', ESPECIFICACOES, ids=lambda e: e.nome)
+def test_espaco_painel_igual_ao_linearmodels(painel, esp):
+    amostras = {'alta_renda': painel['renda'] > np.median(painel['renda'])}
+    nosso = mp.EspacoPainel(painel, amostras=amostras).ajustar(esp)
+    ref = mp.ajustar_linearmodels(esp, painel, amostras)
+
+    for atributo in ('params', 'std_errors', 'tstats', 'pvalues'):
+        np.testing.assert_allclose(getattr(nosso, atributo).to_numpy(),
+                                   getattr(ref, atributo).reindex(list(esp.regressores)).to_numpy(),
+                                   rtol=1e-8, atol=1e-12, err_msg=atributo)
+    np.testing.assert_allclose(nosso.conf_int().to_numpy(), ref.conf_int().to_numpy(), rtol=1e-8)
+    assert nosso.nobs == ref.nobs
+    assert nosso.df_resid == ref.df_resid
+    for atributo in ('rsquared', 'rsquared_within', 'rsquared_between', 'rsquared_overall'):
+        np.testing.assert_allclose(getattr(nosso, atributo), getattr(ref, atributo), rtol=1e-8, atol=1e-12,
+                                   err_msg=atributo)
+    estatistica, p_valor, _ = nosso.f_statistic  # (estatística, p-valor, distribuição)
+    np.testing.assert_allclose([estatistica, p_valor], [ref.f_statistic.stat, ref.f_statistic.pval],
+                               rtol=1e-8, atol=1e-12)
+    assert _sem_data(nosso.summary) == _sem_data(ref.summary)
+
+
+@pytest.mark.parametrize('limites', [(0.01, 0.01), (0.05, 0.1), (0.0, 0.02), (None, 0.05)])
+def test_winsorizar_igual_ao_mstats(limites):
+    rng = np.random.default_rng(7)
+    matriz = rng.standard_t(3, size=(2_003, 3))
+    matriz[rng.random(matriz.shape) < 0.1] = np.nan
+    matriz[:40, 2] = 5.0  # empates na cauda
+
+    nosso = estatisticas.winsorizar(matriz.copy(), limites=limites)
+    for j in range(matriz.shape[1]):
+        validos = ~np.isnan(matriz[:, j])
+        esperado = matriz[:, j].copy()
+        esperado[validos] = np.asarray(mstats.winsorize(matriz[validos, j], limits=limites), dtype=float)
+        np.testing.assert_array_equal(nosso[:, j], esperado)
+
+
+def test_winsorizar_por_grupo_igual_ao_mstats_em_cada_grupo():
+    rng = np.random.default_rng(11)
+    valores = rng.lognormal(size=3_000)
+    valores[rng.random(valores.size) < 0.05] = np.nan
+    regiao = rng.choice(['N', 'S', None], size=valores.size)
+    ano = rng.choice([2022.0, 2023.0, np.nan], size=valores.size)
+
+    codigos, _ = estatisticas.codificar_grupos(regiao, ano)
+    nosso = estatisticas.winsorizar(valores.copy(), limites=(0.05, 0.05), codigos=codigos)
+    chaves = pd.DataFrame({'regiao': regiao, 'ano': ano})
+    for _, linhas in chaves.groupby(['regiao', 'ano'], dropna=False).indices.items():
+        grupo = valores[linhas]
+        validos = ~np.isnan(grupo)
+        esperado = grupo.copy()
+        esperado[validos] = np.asarray(mstats.winsorize(grupo[validos], limits=(0.05, 0.05)), dtype=float)
+        np.testing.assert_array_equal(nosso[linhas], esperado)